@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+"""
+Measure the duration and the peak memory of the provider and printer hot paths
+on synthetic clusters of increasing size. The kubectl output is passed through the
+_execute_kubectl_* methods, so no cluster is needed. The results are stored as JSON
+to compare them with the results of other commits.
+
+Run from the repository root: python -m benchmarks.cluster_benchmark
+Compare with a previous run: python -m benchmarks.cluster_benchmark --compare <results.json>
+"""
+
+from argparse import ArgumentParser
+from os.path import join
+from unittest import mock
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from benchmarks.synthetic_cluster import (
+    iter_pods,
+    render_compact_pod_chunks,
+    render_pod_list_chunks,
+    render_pod_metrics_chunks,
+)
+from kubecargoload import (
+    _parse_quantity_string,
+    KubernetesCargoLoadOverviewPrinter,
+    KubernetesCargoLoadOverviewProvider,
+    parse_quantity_as_integer,
+)
+
+
+# ruff: noqa: T201
+# pylint: disable=protected-access
+
+
+POD_COUNTS = (1000, 10000, 100000, 500000)
+RESULTS_DIRECTORY = join('benchmarks', 'results')
+REPEAT_DEFAULT = 3
+
+
+class _ClusterOutput:
+    """The kubectl output of a synthetic cluster, rendered before anything is measured"""
+
+    def __init__(self, pod_count):
+        self.pod_count = pod_count
+        self.pod_metrics_chunks = render_pod_metrics_chunks(pod_count)
+        self.pod_list_chunks = render_pod_list_chunks(pod_count)
+        self.compact_pod_chunks = render_compact_pod_chunks(pod_count)
+        self.quantities = [
+            quantity
+            for pod in iter_pods(pod_count)
+            for container in pod['spec']['containers']
+            for values in container['resources'].values()
+            for quantity in values.values()]
+        self.pods = _provide(self)
+
+
+def _factor_provider(compact=False):
+    return KubernetesCargoLoadOverviewProvider(namespace=None, compact=compact)
+
+
+def _fetch_pod_metrics_usage(cluster_output):
+    provider = _factor_provider()
+    with mock.patch.object(
+            provider,
+            '_execute_kubectl_get_pod_metrics',
+            return_value=cluster_output.pod_metrics_chunks):
+        provider._fetch_pod_metrics_usage(provider._execute_kubectl_get_pod_metrics())
+
+
+def _fetch_pod_data(cluster_output):
+    provider = _factor_provider()
+    with mock.patch.object(
+            provider, '_execute_kubectl_get_pods', return_value=cluster_output.pod_list_chunks):
+        provider._fetch_pod_data(provider._execute_kubectl_get_pods())
+
+
+def _fetch_pod_data_compact(cluster_output):
+    provider = _factor_provider(compact=True)
+    with mock.patch.object(
+            provider,
+            '_execute_kubectl_get_pods_compact',
+            return_value=cluster_output.compact_pod_chunks):
+        provider._fetch_pod_data_compact(provider._execute_kubectl_get_pods_compact())
+
+
+def _parse_quantity(cluster_output):
+    # start with empty caches like a fresh process
+    _parse_quantity_string.cache_clear()
+    parse_quantity_as_integer.cache_clear()
+    for quantity in cluster_output.quantities:
+        parse_quantity_as_integer(quantity)
+
+
+def _sort_by_name(cluster_output):
+    printer = KubernetesCargoLoadOverviewPrinter(cluster_output.pods, sort='namespace,name')
+    cluster_output.pods.get_sort_order(printer._parse_sort_keys())
+
+
+def _sort_by_ratio(cluster_output):
+    printer = KubernetesCargoLoadOverviewPrinter(cluster_output.pods, sort='ratio:desc,name')
+    cluster_output.pods.get_sort_order(printer._parse_sort_keys())
+
+
+def _print(cluster_output):
+    KubernetesCargoLoadOverviewPrinter(cluster_output.pods, output=io.StringIO()).print()
+
+
+def _provide(cluster_output):
+    provider = _factor_provider()
+    with mock.patch.object(
+            provider,
+            '_execute_kubectl_get_pod_metrics',
+            return_value=cluster_output.pod_metrics_chunks), \
+            mock.patch.object(
+                provider,
+                '_execute_kubectl_get_pods',
+                return_value=cluster_output.pod_list_chunks):
+        return provider.provide()
+
+
+BENCHMARKS = {
+    'fetch_pod_metrics_usage': _fetch_pod_metrics_usage,
+    'fetch_pod_data': _fetch_pod_data,
+    'fetch_pod_data_compact': _fetch_pod_data_compact,
+    'parse_quantity': _parse_quantity,
+    'sort_by_name': _sort_by_name,
+    'sort_by_ratio': _sort_by_ratio,
+    'print': _print,
+    'provide': _provide,
+}
+
+
+def _measure(function, cluster_output, repeat):
+    # measure time and memory separately as tracing the allocations slows everything down,
+    # the fastest run is the one least disturbed by other processes
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(cluster_output)
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function(cluster_output)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': min(durations), 'peak_bytes': peak}
+
+
+def _get_commit():
+    try:
+        process = subprocess.run(  # noqa: S603
+            ['git', 'rev-parse', '--short', 'HEAD'],  # noqa: S607
+            capture_output=True,
+            check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return process.stdout.decode('utf-8').strip()
+
+
+def _setup_options():
+    argument_parser = ArgumentParser()
+    argument_parser.add_argument(
+        '--sizes',
+        help='comma separated pod counts',
+        default=','.join(str(pod_count) for pod_count in POD_COUNTS))
+    argument_parser.add_argument(
+        '--benchmarks',
+        help=f'comma separated benchmarks out of {",".join(BENCHMARKS)}',
+        default=','.join(BENCHMARKS))
+    argument_parser.add_argument(
+        '--repeat',
+        type=int,
+        help='number of runs of each benchmark, the fastest is reported',
+        default=REPEAT_DEFAULT)
+    argument_parser.add_argument(
+        '--compare',
+        help='results file of a previous run to compare with')
+    argument_parser.add_argument(
+        '--save',
+        help=f'results file to write, defaults to {RESULTS_DIRECTORY}/<commit>.json')
+    return argument_parser.parse_args()
+
+
+def _print_result(name, pod_count, result, previous_results):
+    line = (f'{name:<24} {pod_count:>8} {result["seconds"]:>10.3f} s '
+            f'{result["peak_bytes"] / 1024 / 1024:>10.1f} Mi')
+    previous_result = previous_results.get(name, {}).get(str(pod_count))
+    if previous_result:
+        speedup = previous_result['seconds'] / result['seconds']
+        memory_ratio = result['peak_bytes'] / max(previous_result['peak_bytes'], 1)
+        line += f' {speedup:>8.2f}x {memory_ratio:>8.2f}x'
+    print(line, flush=True)
+
+
+def main():
+    options = _setup_options()
+    previous_results = {}
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as results_file:
+            previous_results = json.load(results_file)['results']
+
+    commit = _get_commit()
+    results = {}
+    header = f'{"Benchmark":<24} {"Pods":>8} {"Duration":>12} {"Peak memory":>13}'
+    if options.compare:
+        header += f'{"Speedup":>10}{"Memory":>10}'
+    print(header)
+    for pod_count in (int(size) for size in options.sizes.split(',')):
+        cluster_output = _ClusterOutput(pod_count)
+        for name in options.benchmarks.split(','):
+            result = _measure(BENCHMARKS[name], cluster_output, options.repeat)
+            results.setdefault(name, {})[str(pod_count)] = result
+            _print_result(name, pod_count, result, previous_results)
+
+    filename = options.save or join(RESULTS_DIRECTORY, f'{commit}.json')
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    with open(filename, 'w', encoding='utf-8') as results_file:
+        json.dump(
+            {'commit': commit, 'python': platform.python_version(), 'results': results},
+            results_file,
+            indent=2)
+    print(f'Results written to {filename}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+"""
+Compare the peak memory usage of decoding a PodList at once with json.loads
+and decoding it incrementally with PodListStreamParser.
+
+Run from the repository root: python -m benchmarks.pod_list_memory_benchmark
+"""
+
+import json
+import tracemalloc
+
+from kubecargoload import KUBECTL_OUTPUT_CHUNK_SIZE, PodListStreamParser
+
+
+# ruff: noqa: T201
+
+
+POD_COUNTS = (1000, 2500, 5000, 10000)
+
+
+def _generate_pod_list_chunks(pod_count):
+    with open('tests/test_data/pods_default.json', encoding='utf-8') as pods_f:
+        template = json.load(pods_f)['items'][0]
+
+    def generate():
+        yield '{"apiVersion": "v1", "items": ['
+        for index in range(pod_count):
+            template['metadata']['name'] = f'pod-{index}'
+            separator = ',' if index else ''
+            yield separator + json.dumps(template)
+        yield '], "kind": "List", "metadata": {"resourceVersion": ""}}'
+
+    # re-chunk the generated output like the kubectl output reader does
+    buffer = ''
+    for part in generate():
+        buffer += part
+        while len(buffer) >= KUBECTL_OUTPUT_CHUNK_SIZE:
+            yield buffer[:KUBECTL_OUTPUT_CHUNK_SIZE]
+            buffer = buffer[KUBECTL_OUTPUT_CHUNK_SIZE:]
+    yield buffer
+
+
+def _measure(function, pod_count):
+    tracemalloc.start()
+    function(_generate_pod_list_chunks(pod_count))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def _decode_at_once(chunks):
+    output = ''.join(chunks)
+    for _ in json.loads(output)['items']:
+        pass
+
+
+def _decode_streamed(chunks):
+    for _ in PodListStreamParser(chunks):
+        pass
+
+
+def main():
+    print(f'{"Pods":>8} {"json.loads":>14} {"streamed":>14}')
+    for pod_count in POD_COUNTS:
+        peak_at_once = _measure(_decode_at_once, pod_count)
+        peak_streamed = _measure(_decode_streamed, pod_count)
+        print(f'{pod_count:>8} {peak_at_once / 1024 / 1024:>11.1f} Mi '
+              f'{peak_streamed / 1024 / 1024:>11.1f} Mi')
+
+
+if __name__ == '__main__':
+    main()
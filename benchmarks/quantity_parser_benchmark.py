@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+"""
+Compare the cached quantity parser with the previous implementation which
+parsed every quantity from scratch.
+
+Run from the repository root: python -m benchmarks.quantity_parser_benchmark
+"""
+
+from decimal import Decimal, InvalidOperation
+import random
+import time
+
+from kubecargoload import parse_quantity
+
+
+# ruff: noqa: T201
+
+
+CONTAINER_COUNT = 100000
+QUANTITIES = (
+    '10Mi', '50Mi', '64Mi', '100Mi', '128Mi', '170Mi', '256Mi', '512Mi', '1Gi', '2Gi', '4Gi',
+    '1000000Ki', '500M', '1G', '134217728', '5m', '10m', '100m', '250m', '500m', '1', '2', '0.5',
+    '1500m', '123456789n', '2500u',
+)
+
+
+# pylint: disable=too-complex,raise-missing-from
+def _parse_quantity_uncached(quantity):  # noqa: C901
+    """The implementation before the parser was cached, for comparison"""
+    if isinstance(quantity, (int, float, Decimal)):
+        return Decimal(quantity)
+
+    exponents = {'n': -3, 'u': -2, 'm': -1, 'K': 1, 'k': 1, 'M': 2,
+                 'G': 3, 'T': 4, 'P': 5, 'E': 6}
+
+    quantity = str(quantity)
+    number = quantity
+    suffix = None
+    if len(quantity) >= 2 and quantity[-1] == 'i':
+        if quantity[-2] in exponents:
+            number = quantity[:-2]
+            suffix = quantity[-2:]
+    elif len(quantity) >= 1 and quantity[-1] in exponents:
+        number = quantity[:-1]
+        suffix = quantity[-1:]
+
+    try:
+        number = Decimal(number)  # pylint: disable=redefined-variable-type
+    except InvalidOperation as exc:
+        msg = f'Invalid number format: {number}'
+        raise ValueError(msg) from exc
+
+    if suffix is None:
+        return number
+
+    if suffix.endswith('i'):
+        base = 1024
+    elif len(suffix) == 1:
+        base = 1000
+    else:
+        msg = f'{quantity} has unknown suffix'
+        raise ValueError(msg)
+
+    # handly SI inconsistency
+    if suffix == 'ki':
+        msg = f'{quantity} has unknown suffix'
+        raise ValueError(msg)
+
+    if suffix[0] not in exponents:
+        msg = f'{quantity} has unknown suffix'
+        raise ValueError(msg)
+
+    exponent = Decimal(exponents[suffix[0]])
+    return number * (base ** exponent)
+
+
+def _generate_quantities():
+    random_generator = random.Random(42)  # noqa: S311
+    # requests and limits per container
+    return [random_generator.choice(QUANTITIES) for _ in range(CONTAINER_COUNT * 2)]
+
+
+def _measure(function, quantities):
+    start = time.perf_counter()
+    for quantity in quantities:
+        function(quantity)
+    return time.perf_counter() - start
+
+
+def main():
+    quantities = _generate_quantities()
+    # make sure both implementations agree before comparing them
+    for quantity in QUANTITIES:
+        assert parse_quantity(quantity) == _parse_quantity_uncached(quantity)  # noqa: S101
+
+    duration_uncached = _measure(_parse_quantity_uncached, quantities)
+    duration_cached = _measure(parse_quantity, quantities)
+    print(f'{len(quantities)} quantities of {CONTAINER_COUNT} containers')
+    print(f'uncached: {duration_uncached * 1000:8.1f} ms')
+    print(f'cached:   {duration_cached * 1000:8.1f} ms')
+    print(f'speedup:  {duration_uncached / duration_cached:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+"""
+Deterministic generator of synthetic clusters: the output of `kubectl get pods -o json`,
+of the compact jsonpath template and of the metrics API for any number of pods.
+The same seed and pod count always yield the same output.
+"""
+
+import json
+import random
+
+from kubecargoload import KUBECTL_OUTPUT_CHUNK_SIZE
+
+
+MEMORY_QUANTITIES = (
+    '64Mi', '100Mi', '128Mi', '256Mi', '512Mi', '1Gi', '2Gi', '1500Mi', '500M', '1G',
+    '262144Ki', '134217728', '2.5Gi', '8e8',
+)
+CPU_QUANTITIES = ('5m', '10m', '50m', '100m', '250m', '500m', '1', '2', '0.5', '1500m', '200000u')
+# workload kind, share of the pods
+WORKLOAD_MIX = (
+    ('Deployment', 60),
+    ('DaemonSet', 12),
+    ('StatefulSet', 10),
+    ('Job', 13),
+    (None, 5),  # bare pods without owner
+)
+NAMESPACE_COUNT = 40
+NODE_COUNT = 50
+
+
+def iter_pods(pod_count, seed=42):
+    """Yield the pods as dicts like the "items" of a PodList, they are not kept to save memory"""
+    random_generator = random.Random(seed)  # noqa: S311
+    workload_kinds = [kind for kind, _ in WORKLOAD_MIX]
+    workload_weights = [weight for _, weight in WORKLOAD_MIX]
+    for index in range(pod_count):
+        kind = random_generator.choices(workload_kinds, workload_weights)[0]
+        yield _generate_pod(random_generator, index, kind)
+
+
+def _generate_pod(random_generator, index, kind):
+    namespace = f'namespace-{random_generator.randrange(NAMESPACE_COUNT)}'
+    workload = f'workload-{random_generator.randrange(max(1, index // 4) + 1)}'
+    labels = {'app': workload}
+    owner_references = []
+    if kind == 'Deployment':
+        pod_template_hash = f'{random_generator.getrandbits(40):010x}'
+        labels['pod-template-hash'] = pod_template_hash
+        owner_references.append(
+            {'kind': 'ReplicaSet', 'name': f'{workload}-{pod_template_hash}', 'controller': True})
+    elif kind == 'Job':
+        labels['job-name'] = workload
+        owner_references.append({'kind': 'Job', 'name': workload, 'controller': True})
+    elif kind is not None:
+        owner_references.append({'kind': kind, 'name': workload, 'controller': True})
+
+    containers = [
+        _generate_container(random_generator, container_index)
+        for container_index in range(random_generator.choice((1, 1, 1, 2, 2, 3, 4)))]
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Pod',
+        'metadata': {
+            'name': f'{workload}-{index:08x}',
+            'namespace': namespace,
+            'labels': labels,
+            'ownerReferences': owner_references,
+            'uid': f'{random_generator.getrandbits(128):032x}',
+        },
+        'spec': {
+            'containers': containers,
+            'nodeName': f'node-{random_generator.randrange(NODE_COUNT)}',
+        },
+        'status': {'phase': 'Running'},
+    }
+
+
+def _generate_container(random_generator, container_index):
+    resources = {}
+    if random_generator.random() < 0.85:  # some containers have no resources at all
+        requests = {
+            'cpu': random_generator.choice(CPU_QUANTITIES),
+            'memory': random_generator.choice(MEMORY_QUANTITIES),
+        }
+        resources['requests'] = requests
+        if random_generator.random() < 0.6:
+            resources['limits'] = {
+                'cpu': random_generator.choice(CPU_QUANTITIES),
+                'memory': random_generator.choice(MEMORY_QUANTITIES),
+            }
+    return {
+        'name': f'container-{container_index}',
+        'image': f'registry.example.com/image-{container_index}:1.0',
+        'resources': resources,
+    }
+
+
+def render_pod_metrics_chunks(pod_count, seed=42, chunk_size=KUBECTL_OUTPUT_CHUNK_SIZE):
+    """Render the PodMetricsList JSON of `kubectl get --raw /apis/metrics.k8s.io/v1beta1/pods`"""
+    random_generator = random.Random(seed + 1)  # noqa: S311
+    parts = ['{"kind": "PodMetricsList", "apiVersion": "metrics.k8s.io/v1beta1", "items": [']
+    for pod in iter_pods(pod_count, seed):
+        if 'job-name' in pod['metadata']['labels'] and random_generator.random() < 0.8:
+            continue  # most jobs have completed
+        containers = [
+            {
+                'name': container['name'],
+                'usage': {
+                    'cpu': f'{random_generator.randrange(10 ** 9)}n',
+                    'memory': f'{random_generator.randrange(4 * 1024 * 1024)}Ki',
+                },
+            }
+            for container in pod['spec']['containers']]
+        pod_metrics = {
+            'metadata': {
+                'name': pod['metadata']['name'],
+                'namespace': pod['metadata']['namespace'],
+            },
+            'timestamp': '2024-01-01T00:00:00Z',
+            'window': '30s',
+            'containers': containers,
+        }
+        parts.append(f'{"," if len(parts) > 1 else ""}{json.dumps(pod_metrics)}')
+    parts.append('], "metadata": {}}')
+    return _rechunk(parts, chunk_size)
+
+
+def render_pod_list_chunks(pod_count, seed=42, chunk_size=KUBECTL_OUTPUT_CHUNK_SIZE):
+    """Render the PodList JSON, split into chunks like the kubectl output is read"""
+    parts = ['{"apiVersion": "v1", "items": [']
+    for index, pod in enumerate(iter_pods(pod_count, seed)):
+        parts.append(f'{"," if index else ""}{json.dumps(pod)}')
+    parts.append('], "kind": "List", "metadata": {"resourceVersion": ""}}')
+    return _rechunk(parts, chunk_size)
+
+
+def render_compact_pod_chunks(
+        pod_count, seed=42, chunk_size=KUBECTL_OUTPUT_CHUNK_SIZE, resource='memory'):
+    """Render the pods like kubectl prints the compact jsonpath template for a single resource"""
+    parts = []
+    for pod in iter_pods(pod_count, seed):
+        metadata = pod['metadata']
+        containers = ''.join(
+            f'{container["resources"].get("requests", {}).get(resource, "")},'
+            f'{container["resources"].get("limits", {}).get(resource, "")};'
+            for container in pod['spec']['containers'])
+        owner_kinds = ' '.join(owner['kind'] for owner in metadata['ownerReferences'])
+        parts.append(
+            f'{metadata["namespace"]}\t{metadata["name"]}\t{metadata["uid"]}\t'
+            f'{metadata.get("generation", "")}\t'
+            f'{metadata["labels"].get("job-name", "")}\t{owner_kinds}\t{containers}\n')
+    return _rechunk(parts, chunk_size)
+
+
+def _rechunk(parts, chunk_size):
+    output = ''.join(parts)
+    return [output[index:index + chunk_size] for index in range(0, len(output), chunk_size)]
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+"""
+Compare the rows per second of the buffered table rendering with the previous
+implementation which printed and formatted each row on its own.
+
+Run from the repository root: python -m benchmarks.table_rendering_benchmark
+"""
+
+import io
+import random
+import time
+
+from kubecargoload import _format_fraction, KubernetesCargoLoadOverviewPrinter, Pod
+
+
+# ruff: noqa: T201
+
+
+POD_COUNT = 50000
+MEMORY_VALUES = tuple(size * 1024 * 1024 for size in (0, 10, 50, 64, 100, 128, 170, 256, 512, 1024))
+
+
+class _PreviousPrinter(KubernetesCargoLoadOverviewPrinter):
+    """The rendering before it was buffered, for comparison"""
+
+    def _print_row(self, context, *columns):
+        if self._show_context:
+            columns = (context, *columns)
+
+        print(self._format_pattern.format(*columns, **self._column_widths), file=self._output)
+
+    def _write_line(self, line):
+        print(line, file=self._output)
+
+    def _humanize_bytes(self, bytes_, precision=1):
+        numerator, denominator = bytes_.as_integer_ratio()
+        suffixes = ['B', 'Ki', 'Mi', 'Gi', 'Ti']
+        suffix_index = 0
+        while suffix_index < len(suffixes) - 1 and \
+                numerator >= denominator * 1024 ** (suffix_index + 1):
+            suffix_index += 1
+
+        bytes_rounded = _format_fraction(numerator, denominator * 1024 ** suffix_index, precision)
+        return f'{bytes_rounded} {suffixes[suffix_index]:>2}'
+
+    def _get_memory_usage_ratio_formatted(self, maximum=None, use=None):
+        maximum, use = self._get_memory_usage_ratio_values(maximum, use)
+        if not maximum:
+            return f'{0:.2f} %'
+
+        ratio = _format_fraction(use * 100, maximum, 2)
+        return f'{ratio} %'
+
+
+def _generate_overview():
+    random_generator = random.Random(42)  # noqa: S311
+    overview = {}
+    for index in range(POD_COUNT):
+        namespace = f'namespace-{random_generator.randrange(50)}'
+        name = f'deployment-{random_generator.randrange(5000)}-{index:08x}'
+        limits = random_generator.choice(MEMORY_VALUES)
+        requests = random_generator.choice(MEMORY_VALUES)
+        usage = random_generator.randrange(2048) * 1024 * 1024  # kubectl top reports Mi
+        overview[(namespace, name)] = Pod(namespace, name, limits, requests, usage)
+    return overview
+
+
+def _measure(printer_class, overview):
+    output = io.StringIO()
+    start = time.perf_counter()
+    printer_class(overview, output=output).print()
+    return time.perf_counter() - start, output.getvalue()
+
+
+def main():
+    overview = _generate_overview()
+    duration_previous, output_previous = _measure(_PreviousPrinter, overview)
+    duration_buffered, output_buffered = _measure(KubernetesCargoLoadOverviewPrinter, overview)
+    assert output_previous == output_buffered  # noqa: S101
+
+    print(f'{POD_COUNT} rows')
+    print(f'previous: {POD_COUNT / duration_previous:10.0f} rows/s')
+    print(f'buffered: {POD_COUNT / duration_buffered:10.0f} rows/s')
+    print(f'speedup:  {duration_previous / duration_buffered:10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -8,80 +8,920 @@ List PODs of a specific namespace or all namespaces with their
 configured memory or cpu requests, limits and the current or cpu memory usage.
 """
 
-from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
-from decimal import Decimal, InvalidOperation
-from os.path import basename
+from abc import ABC, abstractmethod
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, ArgumentTypeError
+from array import array
+from collections.abc import MutableMapping
+from concurrent.futures import as_completed, Future, ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_CEILING
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import compress
+from operator import attrgetter
+from os.path import basename, dirname, expanduser, getmtime, getsize, join
 from typing import NamedTuple
+from urllib.parse import quote, urlencode, urlsplit
+import asyncio
+import base64
+import codecs
+import contextlib
+import copy
+import csv
+import functools
+import hashlib
+import heapq
+import http.client
+import io
 import json
+import math
+import os
+import random
+import sqlite3
+import ssl
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+
+
+try:
+    import numpy
+except ImportError:  # optional, speeds up the summaries and sorting of large pod tables
+    numpy = None
 
 
 VERSION = '1.2'
 KUBECTL_BIN = 'kubectl'
+KUBECTL_OUTPUT_CHUNK_SIZE = 64 * 1024
+KUBERNETES_API_TIMEOUT = 60  # per request, so a single unreachable cluster does not block others
+CHUNK_SIZE_DEFAULT = 500  # same as kubectl
+QUANTITY_CACHE_SIZE = 4096
+CPU_SCALE = 10 ** 9  # nanocores per core
+WATCH_INTERVAL_DEFAULT = 5
+WATCH_RETRY_DELAY = 5
+WATCH_TIMEOUT = 30 * 60  # let the API server close watches after a while, they are resumed
+CACHE_DIRECTORY = join(os.environ.get('XDG_CACHE_HOME') or join(expanduser('~'), '.cache'),
+                       'kubecargoload')
+CACHE_TTL_DEFAULT = 60
+USAGE_STORE_FILENAME = join(
+    os.environ.get('XDG_DATA_HOME') or join(expanduser('~'), '.local', 'share'),
+    'kubecargoload',
+    'usage.sqlite')
+RECORD_INTERVAL_DEFAULT = 60  # metrics-server scrapes the usage every 15 to 60 seconds
+QUERY_SINCE_DEFAULT = '1d'
+RECOMMEND_QUANTILE = 0.95  # of the usage the requests are recommended for
+RECOMMEND_HEADROOM_DEFAULT = 15  # percent added to the recommended requests and limits
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_MAX_BUCKETS = 1024
+SERVE_ADDRESS_DEFAULT = 'localhost:9723'
+SERVE_INTERVAL_DEFAULT = 30
+SERVE_JITTER = 0.1  # the refreshes are spread by up to this fraction of the interval
+CACHE_MAX_SIZE = 64 * 1024 * 1024
+PARALLEL_CONTEXTS_DEFAULT = 8
+PRINTER_BUFFER_LINES = 4096
+USAGE_RESOURCES = ('cpu', 'memory')  # the only resources reported by the metrics API
+METRICS_API_PREFIX = '/apis/metrics.k8s.io/v1beta1'
+BACKEND_KUBECTL = 'kubectl'
+BACKEND_API = 'api'
+GROUP_BY_NAMESPACE = 'namespace'
+GROUP_BY_OWNER = 'owner'
+GROUP_BY_NODE = 'node'
+GROUP_BY_LABEL_PREFIX = 'label='
+POD_PHASES_TERMINATED = ('Succeeded', 'Failed')  # e.g. evicted pods, they stay bound to a node
+OUTPUT_TABLE = 'table'
+OUTPUT_JSON = 'json'
+OUTPUT_NDJSON = 'ndjson'
+OUTPUT_CSV = 'csv'
+SORT_DEFAULT = 'namespace,name'
+NODE_SORT_DEFAULT = 'headroom:desc,name'  # nodes with the most unused allocatable first
 
 # ruff: noqa: T201
+# pylint: disable=too-many-lines  # keep everything in a single script for easy download
+
+
+class ResourceValues(NamedTuple):
+    requests: int
+    limits: int
+    usage: int
 
 
 class Pod(NamedTuple):
+    # resource values are integers: bytes for memory, nanocores for cpu
     namespace: str
     name: str
     memory_limits: int
     memory_requests: int
-    memory_usage: Decimal
+    memory_usage: int
+    context: str = None  # set only when the pods of multiple contexts are shown
+    # resource name to ResourceValues, set only when multiple resources are requested
+    resources: dict = None
+    group: str = None  # owner, node or label value, set only when pods are grouped by these
 
 
-class KubernetesCargoLoadOverviewProvider:
+class Node(NamedTuple):
+    # the requests and limits are the sums of the pods on the node
+    name: str
+    allocatable: int
+    requests: int = 0
+    limits: int = 0
+    usage: int = 0
+    pod_count: int = 0
+    headroom: int = 0  # allocatable left for the requests of further pods
 
-    def __init__(self, namespace, context=None, show_cpu_usage=False):
-        self._namespace = namespace
-        self._context = context
-        self._show_cpu_usage = show_cpu_usage
-        self._pod_usage_data = {}
-        self._pods = {}
-        self._pod_data = None
 
-    def provide(self):
-        self._fetch_pod_memory_usage()
-        self._fetch_pod_data()
+class UsageStatistics(NamedTuple):
+    # the usage recorded for a pod within a time window, requests and limits are the latest
+    namespace: str
+    name: str
+    requests: int
+    limits: int
+    samples: int
+    minimum: int
+    average: int
+    p95: int
+    maximum: int
 
-        return self._pods
 
-    def _fetch_pod_memory_usage(self):
-        top_pods_output = self._execute_kubectl_top_pods()
-        for line in top_pods_output.splitlines():
-            columns = line.strip().split()
-            if len(columns) > 3:
-                namespace, name, cpu_usage_pretty, memory_usage_pretty = columns
+class Recommendation(NamedTuple):
+    # the requests and limits of a workload per pod, the savings cover all its pods
+    namespace: str
+    name: str  # the owner, e.g. Deployment/web
+    pod_count: int
+    samples: int
+    requests: int
+    limits: int
+    quantile: int  # of the usage at RECOMMEND_QUANTILE
+    maximum: int
+    recommended_requests: int
+    recommended_limits: int
+    savings: int  # of the requests, negative if more should be requested
+
+
+def _factor_quantity_multipliers():
+    exponents = {'n': -3, 'u': -2, 'm': -1, 'K': 1, 'k': 1, 'M': 2,
+                 'G': 3, 'T': 4, 'P': 5, 'E': 6}
+    multipliers = {}
+    for suffix, exponent in exponents.items():
+        multipliers[suffix] = Decimal(1000) ** exponent
+        multipliers[f'{suffix}i'] = Decimal(1024) ** exponent
+    # handle SI inconsistency
+    multipliers['ki'] = None
+    return multipliers
+
+
+_QUANTITY_MULTIPLIERS = _factor_quantity_multipliers()
+_NO_VALUES = ResourceValues(0, 0, 0)
+
+
+def parse_quantity(quantity):
+    # Taken from
+    # https://github.com/kubernetes-client/python/blob/master/kubernetes/utils/quantity.py
+    """
+    Parse kubernetes canonical form quantity like 200Mi to a decimal number.
+    Supported SI suffixes:
+    base1024: Ki | Mi | Gi | Ti | Pi | Ei
+    base1000: n | u | m | "" | k | M | G | T | P | E
+    See https://github.com/kubernetes/apimachinery/blob/master/pkg/api/resource/quantity.go
+    Input:
+    quantity: string. kubernetes canonical form quantity
+    Returns:
+    Decimal
+    Raises:
+    ValueError on invalid or unknown input
+    """
+    if isinstance(quantity, (int, float, Decimal)):
+        return Decimal(quantity)
+
+    return _parse_quantity_string(str(quantity))
+
+
+# clusters use only a few distinct quantities, so cache the results (Decimals are immutable)
+@functools.lru_cache(maxsize=QUANTITY_CACHE_SIZE)
+def _parse_quantity_string(quantity):
+    # fast path for plain numbers
+    if quantity.isascii() and quantity.isdigit():
+        return Decimal(quantity)
+
+    number = quantity
+    suffix = None
+    if len(quantity) >= 2 and quantity[-1] == 'i':  # noqa: PLR2004
+        if quantity[-2:] in _QUANTITY_MULTIPLIERS:
+            number = quantity[:-2]
+            suffix = quantity[-2:]
+    elif len(quantity) >= 1 and quantity[-1] in _QUANTITY_MULTIPLIERS:
+        number = quantity[:-1]
+        suffix = quantity[-1:]
+
+    try:
+        number = Decimal(number)  # pylint: disable=redefined-variable-type
+    except InvalidOperation as exc:
+        msg = f'Invalid number format: {number}'
+        raise ValueError(msg) from exc
+
+    if suffix is None:
+        return number
+
+    multiplier = _QUANTITY_MULTIPLIERS[suffix]
+    if multiplier is None:
+        msg = f'{quantity} has unknown suffix'
+        raise ValueError(msg)
+
+    return number * multiplier
+
+
+@functools.lru_cache(maxsize=QUANTITY_CACHE_SIZE)
+def parse_quantity_as_integer(quantity, scale=1):
+    """
+    Parse kubernetes quantity like parse_quantity() to an integer number of
+    1/scale units (e.g. nanocores for scale CPU_SCALE), fractions are rounded up
+    like Kubernetes does.
+    """
+    value = parse_quantity(quantity) * scale
+    return int(value.to_integral_value(rounding=ROUND_CEILING))
+
+
+def _parse_timestamp(timestamp):
+    """Parse a RFC 3339 timestamp of the Kubernetes API into seconds since the epoch"""
+    # Python < 3.11 does not accept the Z suffix
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+
+
+def _format_fraction(numerator, denominator, precision):
+    """
+    Format numerator / denominator as fixed point number with the given precision
+    using only integer arithmetic, rounding half to even like Decimal does.
+    """
+    quotient, remainder = divmod(numerator * 10 ** precision, denominator)
+    if remainder * 2 > denominator or (remainder * 2 == denominator and quotient % 2):
+        quotient += 1
+
+    if not precision:
+        return str(quotient)
+
+    integral, fractional = divmod(quotient, 10 ** precision)
+    return f'{integral}.{fractional:0{precision}d}'
+
+
+class _StringPool:
+    """Keep each distinct string (or None) once and refer to it by its index"""
+
+    __slots__ = ('_indices', 'strings')
+
+    def __init__(self, strings=()):
+        self.strings = list(strings)
+        self._indices = {string: index for index, string in enumerate(self.strings)}
+
+    def add(self, string):
+        index = self._indices.get(string)
+        if index is None:
+            index = self._indices[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def get_ranks(self):
+        """The position of each string in sort order, None sorts like an empty string"""
+        sorted_strings = sorted({string or '' for string in self.strings})
+        rank_by_string = {string: rank for rank, string in enumerate(sorted_strings)}
+        return [rank_by_string[string or ''] for string in self.strings]
+
+
+class _Descending:
+    """Sort key of a value in descending order, for values which cannot be negated"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    __hash__ = None
+
+
+class PodTable(MutableMapping):
+    """
+    Columnar storage of pods for large clusters, accessible like the dict of pods.
+    Contexts, namespaces and groups are kept in string pools, the values in integer arrays.
+    Pods are created only when accessed, sums, ratios and sort orders are computed on the
+    columns directly, with NumPy if it is installed.
+    Removing a pod moves the last pod to its place, so the order of the pods changes.
+    """
+
+    def __init__(self, pods=None):
+        self._rows = {}  # key to row
+        self._keys = []
+        self._contexts = _StringPool()
+        self._context_ids = array('i')
+        self._namespaces = _StringPool()
+        self._namespace_ids = array('i')
+        self._names = []
+        self._groups = _StringPool()
+        self._group_ids = array('i')
+        self._values = self._factor_value_columns()  # the memory_* fields
+        self._resource_values = {}
+        if pods is not None:
+            self.update(pods)
+
+    def __getitem__(self, key):
+        return self.get_pod(self._rows[key])
+
+    def __setitem__(self, key, pod):
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self._keys)
+            self._keys.append(key)
+            self._names.append(None)
+            for column in self._iter_integer_columns():
+                column.append(0)
+
+        self._context_ids[row] = self._contexts.add(pod.context)
+        self._namespace_ids[row] = self._namespaces.add(pod.namespace)
+        self._names[row] = pod.name
+        self._group_ids[row] = self._groups.add(pod.group)
+        self._values.requests[row] = pod.memory_requests
+        self._values.limits[row] = pod.memory_limits
+        self._values.usage[row] = pod.memory_usage
+        resources = pod.resources or {}
+        for resource in resources:
+            if resource not in self._resource_values:
+                self._resource_values[resource] = self._factor_value_columns(len(self._keys))
+        for resource, resource_values in self._resource_values.items():
+            for column, value in zip(resource_values, resources.get(resource, _NO_VALUES)):
+                column[row] = value
+
+    def __delitem__(self, key):
+        row = self._rows.pop(key)
+        last_row = len(self._keys) - 1
+        last_key = self._keys.pop()
+        last_name = self._names.pop()
+        if row != last_row:
+            self._rows[last_key] = row
+            self._keys[row] = last_key
+            self._names[row] = last_name
+        for column in self._iter_integer_columns():
+            column[row] = column[last_row]
+            column.pop()
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({dict(self)!r})'
+
+    @property
+    def resources(self):
+        """The names of the resources of the pods besides the memory_* fields"""
+        return tuple(self._resource_values)
+
+    def copy(self):
+        """Copy the columns at once instead of pod by pod"""
+        # pylint: disable=protected-access
+        pod_table = PodTable()
+        pod_table._rows = dict(self._rows)
+        pod_table._keys = list(self._keys)
+        pod_table._contexts = _StringPool(self._contexts.strings)
+        pod_table._context_ids = array('i', self._context_ids)
+        pod_table._namespaces = _StringPool(self._namespaces.strings)
+        pod_table._namespace_ids = array('i', self._namespace_ids)
+        pod_table._names = list(self._names)
+        pod_table._groups = _StringPool(self._groups.strings)
+        pod_table._group_ids = array('i', self._group_ids)
+        pod_table._values = self._copy_value_columns(self._values)
+        pod_table._resource_values = {
+            resource: self._copy_value_columns(values)
+            for resource, values in self._resource_values.items()}
+        return pod_table
+
+    def get_pod(self, row):
+        resources = None
+        if self._resource_values:
+            resources = {
+                resource: ResourceValues(*(column[row] for column in values))
+                for resource, values in self._resource_values.items()}
+
+        return Pod(
+            self._namespaces.strings[self._namespace_ids[row]],
+            self._names[row],
+            self._values.limits[row],
+            self._values.requests[row],
+            self._values.usage[row],
+            self._contexts.strings[self._context_ids[row]],
+            resources,
+            self._groups.strings[self._group_ids[row]])
+
+    def get_rows_by_context(self):
+        rows_by_context_id = {}
+        for row, context_id in enumerate(self._context_ids):
+            rows_by_context_id.setdefault(context_id, []).append(row)
+        return {
+            self._contexts.strings[context_id]: rows
+            for context_id, rows in rows_by_context_id.items()}
+
+    def get_maximum_length(self, column):
+        """The length of the longest context, namespace or name"""
+        if column == 'name':
+            return max((len(name) for name in self._names), default=0)
+
+        pool, ids = self._get_pool_column(column)
+        return max((len(pool.strings[index] or '') for index in set(ids)), default=0)
+
+    def get_ratios(self, resource=None):
+        """The usage in percent of the limits for each row, 0 for rows without limits"""
+        values = self._get_value_columns(resource)
+        if numpy is not None:
+            limits = numpy.asarray(values.limits, dtype=numpy.int64)
+            usage = numpy.asarray(values.usage, dtype=numpy.int64)
+            ratios = numpy.zeros(len(limits))
+            numpy.divide(usage * 100, limits, out=ratios, where=limits != 0)
+            return ratios
+
+        return [
+            (use * 100) / maximum if maximum else 0
+            for use, maximum in zip(values.usage, values.limits)]
+
+    def get_sums(self, resource=None, rows=None):
+        """
+        Sum up the requests of all pods and the limits and usage of the pods with limits,
+        optionally only of the given rows
+        """
+        values = self._get_value_columns(resource)
+        if numpy is not None:
+            requests, limits, usage = (
+                numpy.asarray(column, dtype=numpy.int64) for column in values)
+            if rows is not None:
+                requests, limits, usage = requests[rows], limits[rows], usage[rows]
+            return ResourceValues(
+                int(requests.sum()),
+                int(limits.sum()),
+                int(usage[limits != 0].sum()))
+
+        if rows is not None:
+            values = ResourceValues(*([column[row] for row in rows] for column in values))
+        return ResourceValues(
+            sum(values.requests),
+            sum(values.limits),
+            sum(compress(values.usage, values.limits)))
+
+    def get_sort_order(self, sort_keys, limit=None):
+        """
+        Return the rows sorted by the sort keys, each a tuple of the column (context,
+        namespace, name, requests, limits, usage or ratio) and whether to sort descending.
+        Rows which are equal in all keys keep their order. Return only the first `limit` rows
+        if set, then only these are sorted.
+        """
+        if limit is not None and limit < len(self._keys):
+            order = self._sort_rows(self._select_first_rows(sort_keys, limit), sort_keys)
+            return order[:limit]
+        return self._sort_rows(list(range(len(self._keys))), sort_keys)
+
+    def _sort_rows(self, order, sort_keys):
+        # sort by each key from the last to the first, the stable sorts keep the order
+        # of the previous keys for equal values
+        for column, descending in reversed(sort_keys):
+            if numpy is None or column == 'name':
+                if not isinstance(order, list):
+                    order = order.tolist()
+                order.sort(key=self._get_sort_column(column).__getitem__, reverse=descending)
             else:
-                name, cpu_usage_pretty, memory_usage_pretty = columns
-                namespace = self._namespace
+                order = numpy.asarray(order, dtype=numpy.intp)
+                sort_column = self._get_numpy_sort_column(column)[order]
+                if descending:
+                    sort_column = -sort_column  # negated to keep the order of equal values
+                order = order[numpy.argsort(sort_column, kind='stable')]
 
-            usage_pretty = cpu_usage_pretty if self._show_cpu_usage else memory_usage_pretty
-            usage = self._parse_quantity(usage_pretty)
+        if not isinstance(order, list):
+            order = order.tolist()
+        return order
 
-            pod_key = (namespace, name)
-            self._pod_usage_data[pod_key] = usage
+    def _select_first_rows(self, sort_keys, limit):
+        """The rows of the first `limit` rows in sort order, in ascending row order"""
+        if not limit:
+            return []
 
-    def _execute_kubectl_top_pods(self):
-        return self._execute_kubectl('top', 'pods', '--no-headers=true')
+        column, descending = sort_keys[0]
+        if numpy is not None and column != 'name':
+            sort_column = self._get_numpy_sort_column(column)
+            if descending:
+                sort_column = -sort_column
+            # the rows up to the value of the last one, rows of equal values are left
+            # for the other sort keys
+            last_value = numpy.partition(sort_column, limit - 1)[limit - 1]
+            return numpy.flatnonzero(sort_column <= last_value).tolist()
 
-    def _execute_kubectl(self, *arguments):
-        command = [KUBECTL_BIN]
-        command.extend(arguments)
+        # compare all keys at once, the heap keeps the order of rows which are equal in all keys
+        columns = [
+            (self._get_sort_column(column), descending) for column, descending in sort_keys]
+        first_rows = heapq.nsmallest(limit, range(len(self._keys)), key=lambda row: tuple(
+            _Descending(values[row]) if descending else values[row]
+            for values, descending in columns))
+        return sorted(first_rows)
 
-        # context
+    def _get_numpy_sort_column(self, column):
+        if column in ('context', 'namespace'):
+            pool, ids = self._get_pool_column(column)
+            ranks = numpy.asarray(pool.get_ranks(), dtype=numpy.int64)
+            return ranks[numpy.asarray(ids, dtype=numpy.intp)]
+        if column == 'ratio':
+            return self.get_ratios()
+        return numpy.asarray(getattr(self._values, column), dtype=numpy.int64)
+
+    def _get_sort_column(self, column):
+        if column == 'name':
+            return self._names
+        if column == 'ratio':
+            return self.get_ratios()
+        if column in ('context', 'namespace'):
+            pool, ids = self._get_pool_column(column)
+            ranks = pool.get_ranks()
+            return [ranks[index] for index in ids]
+        return getattr(self._values, column)
+
+    def _get_pool_column(self, column):
+        if column == 'context':
+            return self._contexts, self._context_ids
+        return self._namespaces, self._namespace_ids
+
+    def _get_value_columns(self, resource):
+        if resource is None:
+            return self._values
+        return self._resource_values.get(resource) or self._factor_value_columns(len(self._keys))
+
+    def _iter_integer_columns(self):
+        yield self._context_ids
+        yield self._namespace_ids
+        yield self._group_ids
+        yield from self._values
+        for values in self._resource_values.values():
+            yield from values
+
+    def _factor_value_columns(self, length=0):  # pylint: disable=no-self-use
+        return ResourceValues(*(array('q', (0,)) * length for _ in range(3)))
+
+    def _copy_value_columns(self, values):  # pylint: disable=no-self-use
+        return ResourceValues(*(array('q', column) for column in values))
+
+
+_NEED_INPUT = object()  # yielded by the decoder of PodListStreamParser for the next chunk
+
+
+class PodListStreamParser:
+    """
+    Decode the "items" of a JSON list object (e.g. a PodList) incrementally from
+    an iterable of text chunks. Each item is yielded as soon as it is complete, so
+    only a single item and the current chunk need to be kept in memory.
+    All other members of the list object (like "metadata") are collected in `members`.
+    The chunks can also be an asynchronous iterable, then iterate with `async for`.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self.members = {}
+
+    def iter_values(self):
+        """
+        Decode a sequence of concatenated JSON values instead of a list object,
+        like the events of a watch
+        """
+        return self._feed(self._decode_values())
+
+    def __iter__(self):
+        return self._feed(self._decode_list())
+
+    def __aiter__(self):
+        return self._feed_async(self._decode_list())
+
+    # The decoding is written as generators which yield the decoded items and
+    # _NEED_INPUT whenever they need the next chunk, which is sent back in (None at the end).
+    # So the same decoder reads from iterables as well as asynchronous iterables.
+
+    def _feed(self, decoder):
+        chunks = iter(self._chunks)
+        with contextlib.suppress(StopIteration):
+            value = next(decoder)
+            while True:
+                if value is _NEED_INPUT:
+                    value = decoder.send(next(chunks, None))
+                else:
+                    yield value
+                    value = next(decoder)
+
+    async def _feed_async(self, decoder):
+        # pylint: disable=unnecessary-dunder-call  # aiter() and anext() need Python 3.10
+        chunks = self._chunks.__aiter__()
+        with contextlib.suppress(StopIteration):
+            value = next(decoder)
+            while True:
+                if value is _NEED_INPUT:
+                    try:
+                        chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        chunk = None
+                    value = decoder.send(chunk)
+                else:
+                    yield value
+                    value = next(decoder)
+
+    def _decode_values(self):
+        while (yield from self._peek()):
+            yield (yield from self._decode_value())
+
+    def _decode_list(self):
+        yield from self._expect('{')
+        if (yield from self._peek()) == '}':
+            self._position += 1
+        else:
+            yield from self._decode_object_members()
+
+        # consume the remaining output to let the producer finish and report errors
+        while (yield _NEED_INPUT) is not None:
+            pass
+
+    def _decode_object_members(self):
+        while True:
+            key = yield from self._decode_value()
+            yield from self._expect(':')
+            if key == 'items':
+                yield from self._decode_items()
+            else:
+                self.members[key] = yield from self._decode_value()
+
+            if (yield from self._expect(',', '}')) == '}':
+                break
+
+    def _decode_items(self):
+        yield from self._expect('[')
+        if (yield from self._peek()) == ']':
+            self._position += 1
+            return
+
+        while True:
+            yield (yield from self._decode_value())
+            if (yield from self._expect(',', ']')) == ']':
+                break
+
+    def _decode_value(self):
+        while True:
+            yield from self._peek()
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                # the value is probably incomplete, retry with at least twice as much data
+                # to keep the number of decoding attempts per value low
+                if not (yield from self._read_chunks(2 * (len(self._buffer) - self._position))):
+                    raise
+                continue
+            # numbers and literals at the end of the buffer might be truncated
+            if end == len(self._buffer) and not isinstance(value, (dict, list, str)) \
+                    and (yield from self._read_chunks(1)):
+                continue
+
+            self._position = end
+            return value
+
+    def _expect(self, *characters):
+        character = yield from self._peek()
+        if character not in characters:
+            msg = f'Unexpected character {character!r} in JSON input, expected {characters}'
+            raise ValueError(msg)
+
+        self._position += 1
+        return character
+
+    def _peek(self):
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position].isspace():
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not (yield from self._read_chunks(1)):
+                return ''
+
+    def _read_chunks(self, minimum_length):
+        # drop already decoded data
+        pending = [self._buffer[self._position:]]
+        pending_length = len(pending[0])
+        got_chunk = False
+        while pending_length < minimum_length or not got_chunk:
+            chunk = yield _NEED_INPUT
+            if chunk is None:
+                break
+            pending.append(chunk)
+            pending_length += len(chunk)
+            got_chunk = True
+
+        self._buffer = ''.join(pending)
+        self._position = 0
+        return got_chunk
+
+
+def _iter_lines(chunks):
+    """Split an iterable of text chunks into lines, without the line endings"""
+    remainder = ''
+    for chunk in chunks:
+        lines = (remainder + chunk).split('\n')
+        remainder = lines.pop()
+        yield from lines
+
+    if remainder:
+        yield remainder
+
+
+def _get_pods_fingerprint(pod_versions):
+    """Hash the versions of the pods, independent of the order the pods are listed in"""
+    pods_hash = hashlib.sha256()
+    for pod_version in sorted(pod_versions):
+        pods_hash.update(f'{pod_version}\n'.encode('utf-8'))
+    return pods_hash.hexdigest()
+
+
+async def _aiter_lines(chunks):
+    """Split an asynchronous iterable of text chunks into lines like _iter_lines()"""
+    remainder = ''
+    async for chunk in chunks:
+        lines = (remainder + chunk).split('\n')
+        remainder = lines.pop()
+        for line in lines:
+            yield line
+
+    if remainder:
+        yield remainder
+
+
+class _KubectlOutput:
+    """
+    Iterator over the decoded output of a kubectl process in chunks. Closing it stops the
+    process and closes its files, also if the output was never read.
+    """
+
+    def __init__(self, chunks, process, stderr_file):
+        self._chunks = chunks
+        self._process = process
+        self._stderr_file = stderr_file
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    def close(self):
+        self._chunks.close()
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._process.stdout.close()
+        self._stderr_file.close()
+
+
+@contextlib.contextmanager
+def _closing_output(output):
+    """Close the output of kubectl when leaving the context, outputs read already are strings"""
+    try:
+        yield output
+    finally:
+        if not isinstance(output, str):
+            output.close()
+
+
+class _KubectlOutputAsync:
+    """Asynchronous iterator over the output of a kubectl process like _KubectlOutput"""
+
+    def __init__(self, chunks, process, stderr_file):
+        self._chunks = chunks
+        self._process = process
+        self._stderr_file = stderr_file
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        # pylint: disable=unnecessary-dunder-call  # anext() needs Python 3.10
+        return await self._chunks.__anext__()
+
+    async def aclose(self):
+        await self._chunks.aclose()
+        if self._process.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                self._process.kill()
+            await self._process.wait()
+        self._stderr_file.close()
+
+
+@contextlib.asynccontextmanager
+async def _aclosing_output(output):
+    """Close the asynchronous output of kubectl when leaving the context"""
+    try:
+        yield output
+    finally:
+        await output.aclose()
+
+
+class KubernetesApiError(Exception):
+    pass
+
+
+class KubernetesApiClient:
+    """
+    Minimal client for the Kubernetes API which sends all requests over a single
+    keep-alive connection. The connection settings are read from the kubeconfig
+    using "kubectl config view" which handles merging and selecting kubeconfig files
+    the same way as all other kubectl commands and does not need any network access.
+    """
+
+    def __init__(self, context=None, timeout=KUBERNETES_API_TIMEOUT):
+        self._context = context
+        self._timeout = timeout
+        self._connection = None
+        self._base_path = ''
+        self._headers = {'Accept': 'application/json'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def get(self, path, query=None, accept=None):
+        """
+        Request the given path and return an iterator over the decoded response
+        body in chunks. The response must be consumed completely before the next request.
+        """
+        if self._connection is None:
+            self._connect()
+
+        url = f'{self._base_path}{path}'
+        if query:
+            url = f'{url}?{urlencode(query)}'
+
+        headers = self._headers
+        if accept is not None:
+            headers = {**headers, 'Accept': accept}
+        self._connection.request('GET', url, headers=headers)
+        response = self._connection.getresponse()
+        if response.status != 200:  # noqa: PLR2004
+            body = response.read().decode('utf-8', errors='replace')
+            msg = f'Kubernetes API request to {path} failed with status {response.status}: {body}'
+            raise KubernetesApiError(msg)
+
+        return self._read_response(response)
+
+    def _read_response(self, response):  # pylint: disable=no-self-use
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        while chunk := response.read(KUBECTL_OUTPUT_CHUNK_SIZE):
+            yield decoder.decode(chunk)
+
+        remainder = decoder.decode(b'', final=True)
+        if remainder:
+            yield remainder
+
+    def _connect(self):
+        kubeconfig = self._load_kubeconfig()
+        try:
+            cluster = kubeconfig['clusters'][0]['cluster']
+        except (KeyError, IndexError) as exc:
+            msg = 'No cluster configured in kubeconfig'
+            raise KubernetesApiError(msg) from exc
+        users = kubeconfig.get('users') or [{}]
+        user = users[0].get('user') or {}
+
+        server = urlsplit(cluster['server'])
+        self._base_path = server.path.rstrip('/')
+        if server.scheme == 'https':
+            self._connection = http.client.HTTPSConnection(
+                server.hostname,
+                server.port,
+                timeout=self._timeout,
+                context=self._factor_ssl_context(cluster, user))
+        else:
+            self._connection = http.client.HTTPConnection(
+                server.hostname,
+                server.port,
+                timeout=self._timeout)
+
+        self._setup_authorization(user)
+
+    def _load_kubeconfig(self):
+        command = [KUBECTL_BIN, 'config', 'view', '--raw', '--minify', '--flatten', '-o', 'json']
         if self._context is not None:
             command.append('--context')
             command.append(self._context)
 
-        # namespace
-        if self._namespace is None:
-            command.append('--all-namespaces')
-        else:
-            command.append('--namespace')
-            command.append(self._namespace)
-
         try:
             process = subprocess.run(  # noqa: S603
                 command,
@@ -91,297 +931,2842 @@ class KubernetesCargoLoadOverviewProvider:
             print(exc.stderr.decode('utf-8'))
             raise
 
-        return process.stdout.decode('utf-8')
+        return json.loads(process.stdout)
+
+    def _factor_ssl_context(self, cluster, user):  # pylint: disable=no-self-use
+        ssl_context = ssl.create_default_context()
+        if cluster.get('insecure-skip-tls-verify'):
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+        elif 'certificate-authority-data' in cluster:
+            certificate_authority = base64.b64decode(cluster['certificate-authority-data'])
+            ssl_context.load_verify_locations(cadata=certificate_authority.decode('ascii'))
+
+        if 'client-certificate-data' in user:
+            # the ssl module can load client certificates only from files
+            with tempfile.TemporaryDirectory() as temp_directory:
+                certificate_filename = join(temp_directory, 'client.crt')
+                key_filename = join(temp_directory, 'client.key')
+                with open(certificate_filename, 'wb') as certificate_file:
+                    certificate_file.write(base64.b64decode(user['client-certificate-data']))
+                with open(key_filename, 'wb') as key_file:
+                    key_file.write(base64.b64decode(user['client-key-data']))
+                ssl_context.load_cert_chain(certificate_filename, key_filename)
+
+        return ssl_context
+
+    def _setup_authorization(self, user):
+        if 'token' in user:
+            self._headers['Authorization'] = f'Bearer {user["token"]}'
+        elif 'username' in user:
+            credentials = f'{user["username"]}:{user.get("password", "")}'
+            credentials_encoded = base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+            self._headers['Authorization'] = f'Basic {credentials_encoded}'
+        elif 'exec' in user or 'auth-provider' in user:
+            msg = 'Authentication plugins are not supported by the API backend, ' \
+                  'use the kubectl backend instead'
+            raise KubernetesApiError(msg)
+
+
+class PodSpecCache:
+    """
+    On-disk cache of the requests and limits of pods (without their usage), stored as
+    one JSON file per context, namespace and resource. Entries are valid for `ttl`
+    seconds and can be revalidated afterwards by comparing the fingerprint of the pods.
+    The oldest entries are removed once the cache exceeds `max_size` bytes.
+    Errors while reading or writing the cache are ignored, it is only a shortcut.
+    """
+
+    def __init__(self, directory, ttl=CACHE_TTL_DEFAULT, max_size=CACHE_MAX_SIZE):
+        self._directory = directory
+        self.ttl = ttl
+        self._max_size = max_size
+
+    def load(self, key):
+        """Return the cached pods, their fingerprint and age in seconds or None"""
+        filename = self._get_filename(key)
+        try:
+            with open(filename, encoding='utf-8') as cache_file:
+                entry = json.load(cache_file)
+            age = time.time() - getmtime(filename)
+            pods = {
+                (namespace, name): Pod(namespace, name, limits, requests, 0, group=group)
+                for namespace, name, limits, requests, group in entry['pods']}
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+        return pods, entry.get('fingerprint'), age
+
+    def store(self, key, pods, fingerprint):
+        entry = {
+            'fingerprint': fingerprint,
+            'pods': [
+                (pod.namespace, pod.name, pod.memory_limits, pod.memory_requests, pod.group)
+                for pod in pods.values()],
+        }
+        filename = self._get_filename(key)
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            # write to a temporary file first to not leave incomplete entries behind
+            temp_filename = f'{filename}.{os.getpid()}.tmp'
+            with open(temp_filename, 'w', encoding='utf-8') as cache_file:
+                json.dump(entry, cache_file, separators=(',', ':'))
+            os.replace(temp_filename, filename)
+            self._evict()
+        except OSError:
+            pass
+
+    def touch(self, key):
+        """Mark the entry as fresh after it has been revalidated"""
+        try:
+            os.utime(self._get_filename(key))
+        except OSError:
+            pass
+
+    def _get_filename(self, key):
+        key_hash = hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+        return join(self._directory, f'{key_hash}.json')
+
+    def _evict(self):
+        entries = []
+        for filename in os.listdir(self._directory):
+            path = join(self._directory, filename)
+            entries.append((getmtime(path), getsize(path), path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            os.remove(path)
+            total_size -= size
+
+
+class UsageStore:
+    """
+    Local SQLite store of sampled pod usage. The pods are interned: their context,
+    namespace, name, requests and limits are stored once and referenced by id.
+    Each sample is a single row holding the pod ids and their cpu and memory usage as
+    fixed-width integer arrays, so a query reads one row per sample instead of per pod.
+    """
+
+    _resources = ('cpu', 'memory')
+    _schema = """
+        CREATE TABLE IF NOT EXISTS pods (
+            id INTEGER PRIMARY KEY,
+            context TEXT NOT NULL,
+            namespace TEXT NOT NULL,
+            name TEXT NOT NULL,
+            cpu_requests INTEGER NOT NULL,
+            cpu_limits INTEGER NOT NULL,
+            memory_requests INTEGER NOT NULL,
+            memory_limits INTEGER NOT NULL,
+            UNIQUE (context, namespace, name));
+        CREATE TABLE IF NOT EXISTS samples (
+            context TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            pod_ids BLOB NOT NULL,
+            cpu_usage BLOB NOT NULL,
+            memory_usage BLOB NOT NULL,
+            PRIMARY KEY (context, timestamp)) WITHOUT ROWID;
+    """
+
+    def __init__(self, filename):
+        directory = dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(filename)
+        self._connection.executescript(self._schema)
+        self._pods = {}  # (context, namespace, name) to the pod id and its requests and limits
+        self._loaded_contexts = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def append(self, context, timestamp, pods):
+        """
+        Append the usage of the pods sampled at timestamp (in seconds), the pods must hold
+        the values of the cpu and memory resources
+        """
+        pod_ids = array('i')
+        usage = {resource: array('q') for resource in self._resources}
+        with self._connection:
+            self._load_pods(context)
+            for pod in pods:
+                pod_ids.append(self._intern_pod(context, pod))
+                for resource, column in usage.items():
+                    column.append(pod.resources[resource].usage)
+            self._connection.execute(
+                'INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?)',
+                (context, int(timestamp), pod_ids.tobytes(), usage['cpu'].tobytes(),
+                 usage['memory'].tobytes()))
+
+    def query(self, context, namespace, since, resource='memory'):
+        """
+        Return the usage statistics by pod key of the pods sampled since timestamp
+        (in seconds), of all namespaces if namespace is None
+        """
+        if resource not in self._resources:
+            msg = f'Unsupported resource: {resource}'
+            raise ValueError(msg)
+
+        pods = self._query_pods(context, namespace, resource)
+        pod_ids, values = self._query_samples(context, since, resource)
+        statistics = {}
+        for pod_id, pod_statistics in _compute_usage_statistics(pod_ids, values).items():
+            pod = pods.get(pod_id)
+            if pod is not None:  # in another namespace
+                statistics[pod[:2]] = UsageStatistics(*pod, *pod_statistics)
+        return statistics
+
+    def _query_pods(self, context, namespace, resource):
+        query = f'SELECT id, namespace, name, {resource}_requests, {resource}_limits ' \
+                'FROM pods WHERE context = ?'
+        parameters = [context]
+        if namespace is not None:
+            query += ' AND namespace = ?'
+            parameters.append(namespace)
+        return {row[0]: row[1:] for row in self._connection.execute(query, parameters)}
+
+    def _query_samples(self, context, since, resource):
+        pod_ids = array('i')
+        values = array('q')
+        rows = self._connection.execute(
+            f'SELECT pod_ids, {resource}_usage FROM samples '
+            'WHERE context = ? AND timestamp >= ?',
+            (context, int(since)))
+        for pod_ids_blob, values_blob in rows:
+            pod_ids.frombytes(pod_ids_blob)
+            values.frombytes(values_blob)
+        return pod_ids, values
+
+    def _load_pods(self, context):
+        if context in self._loaded_contexts:
+            return
+
+        rows = self._connection.execute(
+            'SELECT id, namespace, name, cpu_requests, cpu_limits, memory_requests, '
+            'memory_limits FROM pods WHERE context = ?',
+            (context,))
+        for pod_id, namespace, name, *values in rows:
+            self._pods[(context, namespace, name)] = (pod_id, tuple(values))
+        self._loaded_contexts.add(context)
+
+    def _intern_pod(self, context, pod):
+        cpu = pod.resources['cpu']
+        memory = pod.resources['memory']
+        values = (cpu.requests, cpu.limits, memory.requests, memory.limits)
+        key = (context, pod.namespace, pod.name)
+        interned = self._pods.get(key)
+        if interned is None:
+            cursor = self._connection.execute(
+                'INSERT INTO pods VALUES (NULL, ?, ?, ?, ?, ?, ?, ?)',
+                (*key, *values))
+            interned = self._pods[key] = (cursor.lastrowid, values)
+        elif interned[1] != values:  # the requests or limits have been changed
+            self._connection.execute(
+                'UPDATE pods SET cpu_requests = ?, cpu_limits = ?, memory_requests = ?, '
+                'memory_limits = ? WHERE id = ?',
+                (*values, interned[0]))
+            interned = self._pods[key] = (interned[0], values)
+        return interned[0]
+
+
+def _compute_usage_statistics(pod_ids, values):
+    """
+    Return the number of samples, minimum, average, 95th percentile (nearest rank) and
+    maximum of the values by pod id, with NumPy if it is installed
+    """
+    if numpy is None:
+        columns = {}
+        for pod_id, value in zip(pod_ids, values):
+            column = columns.get(pod_id)
+            if column is None:
+                column = columns[pod_id] = array('q')
+            column.append(value)
+        statistics = {}
+        for pod_id, column in columns.items():
+            column = sorted(column)
+            count = len(column)
+            statistics[pod_id] = (
+                count,
+                column[0],
+                round(sum(column) / count),
+                column[(95 * count + 99) // 100 - 1],
+                column[-1])
+        return statistics
+
+    if not pod_ids:
+        return {}
+    pod_ids = numpy.frombuffer(pod_ids, dtype=numpy.intc)
+    values = numpy.frombuffer(values, dtype=numpy.longlong)
+    # group the values by pod, a stable sort by the ids only is much faster than lexsort
+    order = numpy.argsort(pod_ids, kind='stable')
+    pod_ids = pod_ids[order]
+    values = values[order]
+    starts = numpy.flatnonzero(numpy.diff(pod_ids, prepend=pod_ids[0] - 1))
+    counts = numpy.diff(starts, append=len(values))
+    ranks = (95 * counts + 99) // 100 - 1
+    return {
+        pod_id: (count, minimum, round(total / count), _get_partitioned(values, start, count, rank),
+                 maximum)
+        for pod_id, start, count, rank, minimum, total, maximum in zip(
+            pod_ids[starts].tolist(),
+            starts.tolist(),
+            counts.tolist(),
+            ranks.tolist(),
+            numpy.minimum.reduceat(values, starts).tolist(),
+            numpy.add.reduceat(values, starts).tolist(),
+            numpy.maximum.reduceat(values, starts).tolist())}
+
+
+def _get_partitioned(values, start, count, rank):
+    """Return the value of the given rank among count values from start, without sorting them"""
+    return numpy.partition(values[start:start + count], rank)[rank].item()
+
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch of non-negative values in fixed memory, like DDSketch.
+    Values are counted in logarithmically sized buckets, so quantiles are estimated within
+    `relative_accuracy` of the true values. If there are more than `max_buckets` buckets,
+    the lowest ones are merged, which affects only the accuracy of the lowest quantiles.
+    """
+
+    __slots__ = ('_gamma', '_gamma_log', '_max_buckets', '_buckets', '_zero_count', 'count',
+                 'minimum', 'maximum')
+
+    def __init__(
+            self,
+            relative_accuracy=SKETCH_RELATIVE_ACCURACY,
+            max_buckets=SKETCH_MAX_BUCKETS):
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._gamma_log = math.log(self._gamma)
+        self._max_buckets = max_buckets
+        self._buckets = {}  # bucket index to count, bucket i holds (gamma^(i-1), gamma^i]
+        self._zero_count = 0
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        self.count += 1
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if value <= 0:
+            self._zero_count += 1
+            return
+
+        index = math.ceil(math.log(value) / self._gamma_log)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        if len(self._buckets) > self._max_buckets:
+            lowest, second_lowest = heapq.nsmallest(2, self._buckets)
+            self._buckets[second_lowest] += self._buckets.pop(lowest)
+
+    def get_quantile(self, quantile):
+        """Return the estimated value at the quantile (0 to 1), 0 if no values were added"""
+        if not self.count:
+            return 0
+
+        rank = quantile * (self.count - 1)
+        counted = self._zero_count
+        if rank < counted:
+            return 0
+        for index in sorted(self._buckets):
+            counted += self._buckets[index]
+            if counted > rank:
+                # the value with the same relative distance to both bounds of the bucket
+                value = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(round(value), self.minimum), self.maximum)
+        return self.maximum
+
+
+_END_OF_ITERATION = object()
+_NO_TIMING = contextlib.nullcontext()  # reusable, phases are not timed by default
+
+
+class Timings:
+    """
+    Collect the wall and CPU time of the phases of a run, the size and duration of the
+    kubectl outputs and API responses, counters and the peak memory.
+    Nested phases are not counted for their enclosing phase, so the phases of a thread
+    add up to its total time. Phases must not be open while a generator yields.
+    """
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._phases = {}  # name: [wall, cpu, count]
+        self._calls = {}  # name: [count, bytes, wall until first output, wall]
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()  # the open phases of each thread
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        stack = self._local.__dict__.setdefault('stack', [])
+        nested = [0.0, 0.0]  # wall and cpu time of nested phases
+        stack.append(nested)
+        wall_started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_started
+            cpu = time.thread_time() - cpu_started
+            stack.pop()
+            if stack:
+                stack[-1][0] += wall
+                stack[-1][1] += cpu
+            with self._lock:
+                values = self._phases.setdefault(name, [0.0, 0.0, 0])
+                values[0] += wall - nested[0]
+                values[1] += cpu - nested[1]
+                values[2] += 1
+
+    def iter_timed(self, name, iterable):
+        """Count the time spent to get each item of the iterable for the phase"""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                item = next(iterator, _END_OF_ITERATION)
+            if item is _END_OF_ITERATION:
+                return
+            yield item
+
+    def iter_output(self, name, chunks, started=None):
+        """Pass through the chunks of an output and record its size and durations"""
+        started = started or time.perf_counter()
+        return self._iter_output(name, chunks, started)
+
+    def _iter_output(self, name, chunks, started):
+        first_output = None
+        size = 0
+        try:
+            for chunk in self.iter_timed(name, chunks):
+                if first_output is None:
+                    first_output = time.perf_counter() - started
+                size += len(chunk.encode('utf-8'))
+                yield chunk
+        finally:
+            self.add_call(name, size, first_output, time.perf_counter() - started)
+
+    def add_call(self, name, size, first_output, wall):
+        with self._lock:
+            values = self._calls.setdefault(name, [0, 0, 0.0, 0.0])
+            values[0] += 1
+            values[1] += size
+            values[2] += first_output if first_output is not None else wall
+            values[3] += wall
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get_report(self):
+        with self._lock:
+            return {
+                'wall': time.perf_counter() - self._started,
+                'cpu': time.process_time(),
+                'peak_memory': _get_peak_memory(),
+                'phases': {
+                    name: {'wall': wall, 'cpu': cpu, 'count': count}
+                    for name, (wall, cpu, count) in self._phases.items()},
+                'calls': {
+                    name: {'count': count, 'bytes': size, 'first_output': first_output,
+                           'wall': wall}
+                    for name, (count, size, first_output, wall) in self._calls.items()},
+                'counters': dict(self._counters),
+            }
+
+    def write_report(self, filename):
+        with open(filename, 'w', encoding='utf-8') as report_file:
+            json.dump(self.get_report(), report_file, indent=2)
+            report_file.write('\n')
+
+    def print_report(self, output=None):
+        output = output or sys.stderr
+        report = self.get_report()
+        name_width = max(len(name) for name in (*report['phases'], *report['calls'], 'PHASE'))
+        lines = [f'{"PHASE":{name_width}} {"WALL":>9} {"CPU":>9} {"COUNT":>8}']
+        for name, values in report['phases'].items():
+            lines.append(
+                f'{name:{name_width}} {values["wall"]:8.3f}s {values["cpu"]:8.3f}s '
+                f'{values["count"]:>8}')
+        if report['calls']:
+            lines.append(
+                f'{"CALL":{name_width}} {"WALL":>9} {"FIRST":>9} {"COUNT":>8} {"BYTES":>13}')
+            for name, values in report['calls'].items():
+                lines.append(
+                    f'{name:{name_width}} {values["wall"]:8.3f}s {values["first_output"]:8.3f}s '
+                    f'{values["count"]:>8} {values["bytes"]:>13,}')
+        for name, value in report['counters'].items():
+            lines.append(f'{name}: {value:,}')
+        total = f'total: wall {report["wall"]:.3f}s, cpu {report["cpu"]:.3f}s'
+        if report['peak_memory'] is not None:
+            total = f'{total}, peak memory {report["peak_memory"] / 1024 / 1024:.1f} MiB'
+        lines.append(total)
+        output.write('\n'.join(lines))
+        output.write('\n')
+
+
+def _get_peak_memory():
+    """The peak resident set size of the process in bytes, None if it is unknown"""
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:  # not available on Windows
+        return None
+
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS and in kilobytes elsewhere
+    return peak_memory if sys.platform == 'darwin' else peak_memory * 1024
+
+
+def _time_phase(timings, name):
+    """Time the phase if timings are enabled, otherwise do nothing"""
+    if timings is None:
+        return _NO_TIMING
+    return timings.phase(name)
+
+
+class KubernetesCargoLoadOverviewProvider:  # pylint: disable=too-many-instance-attributes
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+            self,
+            namespace,
+            context=None,
+            show_cpu_usage=False,
+            compact=False,
+            backend=BACKEND_KUBECTL,
+            chunk_size=CHUNK_SIZE_DEFAULT,
+            cache=None,
+            request_timeout=KUBERNETES_API_TIMEOUT,
+            resources=None,
+            group_by=None,
+            timings=None,
+            nodes=False,
+            containers=False):
+        self._namespace = namespace
+        self._context = context
+        self._show_cpu_usage = show_cpu_usage
+        self._compact = compact
+        self._backend = backend
+        self._chunk_size = chunk_size
+        self._cache = cache
+        self._request_timeout = request_timeout
+        # fetch all these resources at once, the first one is used for the memory_* fields
+        self._resources = resources
+        self._group_by = group_by
+        self._timings = timings  # a Timings instance to instrument the run with
+        self._nodes = nodes  # sum up the pods per node, the usage is fetched per node then
+        if nodes:
+            self._group_by = GROUP_BY_NODE
+        self._containers = containers  # a row per container named <pod>/<container>
+        self._owner_index = {}  # ReplicaSet to its owner, most pods of a ReplicaSet share it
+        self._pod_usage_data = {}
+        self._usage_timestamp = None  # of the latest pod metrics, in seconds
+        self._pods = PodTable()
+        self._pod_data = None
+        self._resource_version = None
+        self._lock = threading.Lock()
+
+    def provide(self):
+        if self._cache is not None:
+            with _time_phase(self._timings, 'load cache'):
+                if self._provide_from_cache():
+                    return self._pods
+
+        # listing and decoding the pods are timed separately, the rest is factoring them
+        pod_versions = []
+        with _time_phase(self._timings, 'factor pods'):
+            for self._pod_data in self._iter_pod_data_from_backend_timed():
+                self._add_pod()
+                if self._cache is not None:
+                    pod_versions.append(self._get_pod_version())
+
+        if self._cache is not None:
+            with _time_phase(self._timings, 'store cache'):
+                self._cache.store(
+                    self._get_cache_key(),
+                    self._pods,
+                    _get_pods_fingerprint(pod_versions))
+
+        return self._pods
+
+    def iter_pods(self):
+        """
+        Yield the pods one by one while they are listed instead of collecting them first.
+        The cache is not used as it needs all pods. Each call works on its own state,
+        so multiple calls can be iterated at the same time, also from multiple threads.
+        """
+        return self._copy()._iter_pods()  # pylint: disable=protected-access
+
+    def aiter_pods(self):
+        """
+        Yield the pods like iter_pods() from an asynchronous iterator. kubectl is run as
+        subprocess of the running event loop, which is not blocked while its output is read.
+        Only the kubectl backend is supported.
+        """
+        if self._backend != BACKEND_KUBECTL:
+            msg = f'The {self._backend} backend does not support asynchronous calls'
+            raise ValueError(msg)
+        return self._copy()._aiter_pods()  # pylint: disable=protected-access
+
+    async def provide_async(self):
+        """Return the pods like provide() but without blocking the event loop, see aiter_pods()"""
+        pods = PodTable()
+        async for pod in self.aiter_pods():
+            pods[(pod.namespace, pod.name)] = pod
+        return pods
+
+    def provide_nodes(self):
+        """
+        Return the nodes by name with their allocatable and usage and the sums of the
+        requests and limits of their pods, which are summed up while the pods are listed
+        """
+        node_sums = {}
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            nodes_future = executor.submit(self._fetch_nodes)
+            with _time_phase(self._timings, 'factor pods'):
+                for self._pod_data in self._iter_pod_data_from_backend_timed():
+                    if not self._pod_is_job():
+                        self._add_pod_to_node_sums(node_sums)
+            with _time_phase(self._timings, 'wait for nodes'):
+                nodes = nodes_future.result()
+
+        for name, (requests, limits, pod_count) in node_sums.items():
+            node = nodes.get(name)
+            if node is not None:  # the node might have been removed meanwhile
+                nodes[name] = node._replace(
+                    requests=requests,
+                    limits=limits,
+                    pod_count=pod_count,
+                    headroom=max(node.allocatable - requests, 0))
+        return nodes
+
+    def watch(self):
+        """
+        Keep the provided pods up to date from a watch on the pods in a background thread.
+        Use get_overview() to get the current pods and refresh_usage() to update their usage.
+        """
+        thread = threading.Thread(target=self._watch_pods, name='watch-pods', daemon=True)
+        thread.start()
+
+    def get_overview(self):
+        with self._lock:
+            return self._pods.copy()
+
+    def get_usage_timestamp(self):
+        """Return the time the latest pod usage was measured (in seconds) or None"""
+        return self._usage_timestamp
+
+    def refresh_usage(self):
+        self._fetch_usage()
+        with self._lock:
+            for pod_key, pod in self._pods.items():
+                updated_pod = self._apply_usage(pod)
+                if updated_pod != pod:
+                    self._pods[pod_key] = updated_pod
+
+    def _copy(self):
+        """Return a provider with the same options but its own state for a single call"""
+        # pylint: disable=protected-access
+        provider = copy.copy(self)
+        provider._pod_usage_data = {}
+        provider._usage_timestamp = None
+        provider._pods = PodTable()
+        provider._pod_data = None
+        provider._resource_version = None
+        provider._lock = threading.Lock()
+        return provider
+
+    def _iter_pods(self):
+        for self._pod_data in self._iter_pod_data_from_backend_timed():
+            if not self._pod_is_job():
+                yield from self._factor_pods()
+
+    async def _aiter_pods(self):
+        async for self._pod_data in self._aiter_pod_data_from_kubectl():
+            if not self._pod_is_job():
+                for pod in self._factor_pods():
+                    yield pod
+
+    def _apply_usage(self, pod):
+        usage = self._pod_usage_data.get((pod.namespace, pod.name), {})
+        pod = pod._replace(memory_usage=usage.get(self._get_resource_name(), 0))
+        if pod.resources:
+            pod = pod._replace(resources={
+                resource: values._replace(usage=usage.get(resource, 0))
+                for resource, values in pod.resources.items()})
+        return pod
+
+    def _fetch_usage(self):
+        if self._backend == BACKEND_API:
+            with KubernetesApiClient(self._context, self._get_api_timeout()) as api_client:
+                self._fetch_pod_metrics_usage(self._execute_api_top_pods(api_client))
+        else:
+            self._fetch_kubectl_pod_metrics_usage()
+
+    def _provide_from_cache(self):
+        cache_key = self._get_cache_key()
+        cached = self._cache.load(cache_key)
+        if cached is None:
+            return False
+
+        pods, fingerprint, age = cached
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            usage_future = executor.submit(self._fetch_usage)
+            if age > self._cache.ttl:
+                if not fingerprint or self._fetch_pods_fingerprint() != fingerprint:
+                    return False
+                self._cache.touch(cache_key)
+            usage_future.result()
+
+        for pod_key, pod in pods.items():
+            pods[pod_key] = self._apply_usage(pod)
+        self._pods = PodTable(pods)
+        return True
+
+    def _add_pod_to_node_sums(self, node_sums):
+        node_name = self._get_nested_pod_data_attribute('spec', 'nodeName')
+        if not node_name:
+            return  # not scheduled yet
+        if self._get_nested_pod_data_attribute('status', 'phase') in POD_PHASES_TERMINATED:
+            return  # their containers do not run anymore, so they reserve nothing on the node
+
+        pod = self._factor_pod()
+        sums = node_sums.get(node_name)
+        if sums is None:
+            sums = node_sums[node_name] = [0, 0, 0]
+        sums[0] += pod.memory_requests
+        sums[1] += pod.memory_limits
+        sums[2] += 1
+
+    def _fetch_nodes(self):
+        if self._backend == BACKEND_API:
+            with KubernetesApiClient(self._context, self._get_api_timeout()) as api_client:
+                allocatable = self._parse_node_allocatable_json(
+                    self._execute_api_get_nodes(api_client))
+                usage = self._parse_node_metrics_usage(self._execute_api_top_nodes(api_client))
+        else:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                top_nodes_future = executor.submit(self._execute_kubectl_top_nodes)
+                allocatable = self._parse_node_allocatable(self._execute_kubectl_get_nodes())
+                usage = self._parse_top_nodes_usage(top_nodes_future.result())
+
+        return {
+            name: Node(name, node_allocatable, usage=usage.get(name, 0), headroom=node_allocatable)
+            for name, node_allocatable in allocatable.items()}
+
+    def _execute_kubectl_get_nodes(self):
+        # the full JSON contains e.g. the images of each node, so let kubectl print only the
+        # allocatable of the resource
+        resource_key = self._get_resource_name().replace('.', '\\.')
+        template = (
+            '{range .items[*]}'
+            '{.metadata.name}{"\\t"}'
+            f'{{.status.allocatable.{resource_key}}}{{"\\n"}}'
+            '{end}')
+        return self._execute_kubectl('get', 'nodes', '-o', f'jsonpath={template}', namespaced=False)
+
+    def _execute_kubectl_top_nodes(self):
+        return self._execute_kubectl('top', 'nodes', '--no-headers=true', namespaced=False)
+
+    def _execute_api_get_nodes(self, api_client):
+        return self._execute_api_get(api_client, '/api/v1/nodes')
+
+    def _execute_api_top_nodes(self, api_client):
+        return self._execute_api_get(api_client, f'{METRICS_API_PREFIX}/nodes')
+
+    def _parse_node_allocatable(self, get_nodes_output):
+        allocatable = {}
+        for line in get_nodes_output.splitlines():
+            if line:
+                name, quantity = line.split('\t')
+                allocatable[name] = self._parse_resource_quantity(quantity) if quantity else 0
+        return allocatable
+
+    def _parse_node_allocatable_json(self, nodes_output):
+        allocatable = {}
+        for node in PodListStreamParser(nodes_output):
+            name = self._get_nested_pod_data_attribute('metadata', 'name', pod_data=node)
+            quantity = self._get_nested_pod_data_attribute(
+                'status', 'allocatable', self._get_resource_name(), pod_data=node)
+            allocatable[name] = self._parse_resource_quantity(quantity) if quantity else 0
+        return allocatable
+
+    def _parse_top_nodes_usage(self, top_nodes_output):
+        usage = {}
+        for line in top_nodes_output.splitlines():
+            columns = line.split()
+            if not columns:
+                continue
+
+            name, cpu_usage_pretty, _, memory_usage_pretty = columns[:4]
+            usage_pretty = cpu_usage_pretty if self._show_cpu_usage else memory_usage_pretty
+            if usage_pretty != '<unknown>':  # the metrics of new nodes are not available yet
+                usage[name] = self._parse_resource_quantity(usage_pretty)
+        return usage
+
+    def _parse_node_metrics_usage(self, node_metrics_output):
+        usage = {}
+        for node_metrics in PodListStreamParser(node_metrics_output):
+            name = self._get_nested_pod_data_attribute('metadata', 'name', pod_data=node_metrics)
+            quantity = self._get_nested_pod_data_attribute(
+                'usage', self._get_resource_name(), pod_data=node_metrics)
+            if quantity is not None:
+                usage[name] = self._parse_resource_quantity(quantity)
+        return usage
+
+    def _get_cache_key(self):
+        # consider the kubeconfig files as the current context or its cluster might have changed
+        default_kubeconfig_filename = join(expanduser('~'), '.kube', 'config')
+        kubeconfig_filenames = os.environ.get('KUBECONFIG') or default_kubeconfig_filename
+        kubeconfig_state = []
+        for filename in kubeconfig_filenames.split(os.pathsep):
+            try:
+                kubeconfig_state.append((filename, getmtime(filename)))
+            except OSError:
+                kubeconfig_state.append((filename, None))
+
+        return [
+            self._context,
+            self._namespace,
+            self._get_resource_name(),
+            self._group_by,
+            kubeconfig_state]
+
+    def _get_pod_version(self, pod_data=None):
+        """
+        The requests and limits of a pod change only with a new pod (UID) or by resizing it
+        in place, which increases its generation. Unlike the resource version of the pod list,
+        this does not change with the status of the pods or any other change in the cluster.
+        The owners or the label the pods are grouped by can change without either, so they
+        are part of the version, like _get_pod_version_template() prints it.
+        """
+        uid = self._get_nested_pod_data_attribute('metadata', 'uid', pod_data=pod_data)
+        generation = self._get_nested_pod_data_attribute(
+            'metadata', 'generation', default='', pod_data=pod_data)
+        if self._group_by == GROUP_BY_OWNER:
+            owner_references = self._get_nested_pod_data_attribute(
+                'metadata', 'ownerReferences', default=[], pod_data=pod_data)
+            owner_names = ' '.join(reference.get('name', '') for reference in owner_references)
+            return f'{uid} {generation} {owner_names}'
+        if self._group_by and self._group_by.startswith(GROUP_BY_LABEL_PREFIX):
+            labels = self._get_nested_pod_data_attribute(
+                'metadata', 'labels', default={}, pod_data=pod_data)
+            label_value = labels.get(self._group_by[len(GROUP_BY_LABEL_PREFIX):], '')
+            return f'{uid} {generation} {label_value}'
+        return f'{uid} {generation}'
+
+    def _get_pod_version_template(self):
+        template = '{.metadata.uid}{" "}{.metadata.generation}'
+        if self._group_by == GROUP_BY_OWNER:
+            template += '{" "}{.metadata.ownerReferences[*].name}'
+        elif self._group_by and self._group_by.startswith(GROUP_BY_LABEL_PREFIX):
+            label_key = self._group_by[len(GROUP_BY_LABEL_PREFIX):].replace('.', '\\.')
+            template += f'{{" "}}{{.metadata.labels.{label_key}}}'
+        return f'{{range .items[*]}}{template}{{"\\n"}}{{end}}'
+
+    def _fetch_pods_fingerprint(self):
+        """Return the fingerprint of the current pods or None if it cannot be fetched"""
+        try:
+            if self._backend == BACKEND_API:
+                return _get_pods_fingerprint(self._fetch_api_pod_versions())
+            with _closing_output(self._execute_kubectl_get_pod_versions()) as output:
+                return _get_pods_fingerprint(line for line in _iter_lines(output) if line)
+        except (KubernetesApiError, OSError, ValueError, subprocess.CalledProcessError):
+            return None  # the pods are listed again then
+
+    def _fetch_api_pod_versions(self):
+        # only the metadata of the pods is sent
+        accept = 'application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1'
+        with KubernetesApiClient(self._context, self._get_api_timeout()) as api_client:
+            output = api_client.get(self._get_api_path('/api/v1'), accept=accept)
+            return [
+                self._get_pod_version(pod_data)
+                for pod_data in PodListStreamParser(output)]
+
+    def _execute_kubectl_get_pod_versions(self):
+        return self._execute_kubectl_streamed(
+            'get', 'pods', '-o', f'jsonpath={self._get_pod_version_template()}',
+            *self._get_kubectl_chunk_size_arguments())
+
+    def _iter_pod_data_from_backend_timed(self):
+        if self._timings is None:
+            return self._iter_pod_data_from_backend()
+        return self._iter_pod_data_counted(
+            self._timings.iter_timed('decode pods', self._iter_pod_data_from_backend()))
+
+    def _iter_pod_data_counted(self, pod_data_iterator):
+        pod_count = 0
+        container_count = 0
+        try:
+            for pod_data in pod_data_iterator:
+                pod_count += 1
+                container_count += len(self._get_nested_pod_data_attribute(
+                    'spec', 'containers', default=[], pod_data=pod_data))
+                yield pod_data
+        finally:
+            self._timings.count('pods', pod_count)
+            self._timings.count('containers', container_count)
+
+    def _iter_pod_data_from_backend(self):
+        if self._backend == BACKEND_API:
+            return self._iter_pod_data_from_api()
+        return self._iter_pod_data_from_kubectl()
+
+    def _iter_pod_data_from_kubectl(self):
+        # start both kubectl processes at once, the wall time is then the slower of both calls
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            usage_future = None
+            if not self._nodes:  # the usage is fetched per node in node mode
+                # the pod metrics are parsed while they are received
+                usage_future = executor.submit(self._fetch_kubectl_pod_metrics_usage)
+            if self._compact:
+                get_pods_future = executor.submit(self._execute_kubectl_get_pods_compact)
+            else:
+                get_pods_future = executor.submit(self._execute_kubectl_get_pods)
+            # stop kubectl also if the usage cannot be fetched and the pods are not read
+            with _closing_output(get_pods_future.result()) as get_pods_output:
+                # usage data must be complete before the pods are factored
+                if usage_future is not None:
+                    with _time_phase(self._timings, 'wait for usage'):
+                        usage_future.result()
+                if self._compact:
+                    yield from self._iter_pod_data_compact(get_pods_output)
+                else:
+                    yield from self._iter_pod_data(get_pods_output)
+
+    async def _aiter_pod_data_from_kubectl(self):
+        # both kubectl processes run at once like in _iter_pod_data_from_kubectl()
+        if self._compact:
+            get_pods_output = await self._execute_kubectl_get_pods_compact_async()
+        else:
+            get_pods_output = await self._execute_kubectl_get_pods_async()
+        # stop kubectl also if the usage cannot be fetched and the pods are not read
+        async with _aclosing_output(get_pods_output):
+            # usage data must be complete before the pods are factored
+            if not self._nodes:  # the usage is fetched per node in node mode
+                pod_metrics_output = await self._execute_kubectl_get_pod_metrics_async()
+                async with _aclosing_output(pod_metrics_output):
+                    await self._fetch_pod_metrics_usage_async(pod_metrics_output)
+            if self._compact:
+                async for line in _aiter_lines(get_pods_output):
+                    if line:
+                        yield self._parse_compact_pod_line(line)
+            else:
+                async for pod_data in PodListStreamParser(get_pods_output):
+                    yield pod_data
+
+    def _iter_pod_data_from_api(self):
+        with KubernetesApiClient(self._context, self._get_api_timeout()) as api_client:
+            # usage data must be complete before the pods are factored
+            if not self._nodes:  # the usage is fetched per node in node mode
+                self._fetch_pod_metrics_usage(self._execute_api_top_pods(api_client))
+            if self._chunk_size:
+                yield from self._iter_pod_data_paged(api_client)
+            else:
+                yield from self._iter_pod_data(self._execute_api_get_pods(api_client))
+
+    def _watch_pods(self):
+        relist = False
+        while True:
+            try:
+                if relist:
+                    self._relist_pods()
+                for event in PodListStreamParser(self._execute_watch_pods()).iter_values():
+                    self._apply_pod_event(event)
+                # the watch ended regularly (e.g. timeout), resume it if the position is known
+                relist = self._backend != BACKEND_API or self._resource_version is None
+            except (KubernetesApiError, OSError, ValueError, subprocess.CalledProcessError) as exc:
+                print(f'Watching pods failed, retrying: {exc}', file=sys.stderr)
+                time.sleep(WATCH_RETRY_DELAY)
+                relist = True
+
+    def _relist_pods(self):
+        # changes might have been missed, so start over with a fresh list
+        provider = KubernetesCargoLoadOverviewProvider(
+            self._namespace,
+            self._context,
+            self._show_cpu_usage,
+            self._compact,
+            self._backend,
+            self._chunk_size,
+            cache=None,
+            request_timeout=self._request_timeout,
+            resources=self._resources,
+            group_by=self._group_by,
+            timings=self._timings)
+        pods = provider.provide()
+        with self._lock:
+            self._pods = pods
+            self._pod_usage_data = provider._pod_usage_data  # pylint: disable=protected-access
+            self._resource_version = provider._resource_version  # pylint: disable=protected-access
+
+    def _execute_watch_pods(self):
+        if self._backend == BACKEND_API:
+            return self._execute_api_watch_pods()
+
+        # kubectl cannot resume a watch, so let it list the pods again as ADDED events and watch
+        # from that list on. Pods deleted before are dropped by relisting once the watch ended,
+        # it is ended after a while like the watches of the API backend as it might be idle.
+        return self._execute_kubectl_streamed(
+            'get', 'pods', '-o', 'json', '--watch', '--output-watch-events',
+            f'--request-timeout={WATCH_TIMEOUT}s', timeout=False)
+
+    def _execute_api_watch_pods(self):
+        # use a separate connection without timeout as the watch might be idle for a long time
+        with KubernetesApiClient(self._context, timeout=None) as api_client:
+            query = {'watch': 'true', 'timeoutSeconds': WATCH_TIMEOUT}
+            if self._resource_version:
+                query['resourceVersion'] = self._resource_version
+            yield from api_client.get(self._get_api_path('/api/v1'), query)
+
+    def _apply_pod_event(self, event):
+        event_type = event.get('type')
+        pod_data = event.get('object') or {}
+        if event_type == 'ERROR':
+            # e.g. the resource version is too old to resume the watch
+            self._resource_version = None
+            message = self._get_nested_pod_data_attribute('message', pod_data=pod_data)
+            msg = f'Watch failed: {message}'
+            raise KubernetesApiError(msg)
+
+        resource_version = self._get_nested_pod_data_attribute(
+            'metadata', 'resourceVersion', pod_data=pod_data)
+        if event_type in ('ADDED', 'MODIFIED', 'DELETED'):
+            with self._lock:
+                self._pod_data = pod_data
+                if event_type == 'DELETED' or self._pod_is_job():
+                    namespace = self._get_nested_pod_data_attribute('metadata', 'namespace')
+                    name = self._get_nested_pod_data_attribute('metadata', 'name')
+                    self._pods.pop((namespace, name), None)
+                else:
+                    self._add_pod()
+
+        self._resource_version = resource_version
+
+    def _get_api_timeout(self):
+        return self._request_timeout or None  # 0 waits forever like kubectl
+
+    def _execute_api_top_pods(self, api_client):
+        return self._execute_api_get(api_client, self._get_api_path(METRICS_API_PREFIX))
+
+    def _execute_api_get_pods(self, api_client, query=None):
+        return self._execute_api_get(api_client, self._get_api_path('/api/v1'), query)
+
+    def _execute_api_get(self, api_client, path, query=None):
+        if self._timings is None:
+            return api_client.get(path, query)
+
+        name = f'GET {path}'
+        started = time.perf_counter()
+        with self._timings.phase(name):  # until the response headers are received
+            output = api_client.get(path, query)
+        return self._timings.iter_output(name, output, started)
+
+    def _iter_pod_data_paged(self, api_client):
+        # the next page is fetched in the background while the current page is processed,
+        # pages are requested one after the other as each needs the continue token of the previous
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page_future = executor.submit(self._fetch_pod_data_page, api_client, None)
+            while page_future is not None:
+                pods, continue_token = page_future.result()
+                page_future = None
+                if continue_token:
+                    page_future = executor.submit(
+                        self._fetch_pod_data_page,
+                        api_client,
+                        continue_token)
+
+                yield from pods
+
+    def _fetch_pod_data_page(self, api_client, continue_token):
+        query = {'limit': self._chunk_size}
+        if continue_token:
+            query['continue'] = continue_token
+
+        pod_list_parser = PodListStreamParser(self._execute_api_get_pods(api_client, query))
+        pods = list(pod_list_parser)
+        continue_token = self._get_nested_pod_data_attribute(
+            'metadata', 'continue',
+            pod_data=pod_list_parser.members)
+        if not continue_token:
+            self._resource_version = self._get_nested_pod_data_attribute(
+                'metadata', 'resourceVersion',
+                pod_data=pod_list_parser.members)
+        return pods, continue_token
+
+    def _get_api_path(self, prefix):
+        if self._namespace is None:
+            return f'{prefix}/pods'
+
+        return f'{prefix}/namespaces/{quote(self._namespace, safe="")}/pods'
+
+    def _fetch_pod_metrics_usage(self, pod_metrics_output):
+        with _time_phase(self._timings, 'parse usage'):
+            self._parse_pod_metrics_usage(pod_metrics_output)
+
+    async def _fetch_pod_metrics_usage_async(self, pod_metrics_output):
+        pod_usage_data = {}
+        usage_timestamp = ''
+        async for pod_metrics in PodListStreamParser(pod_metrics_output):
+            usage_timestamp = max(
+                usage_timestamp, self._add_pod_metrics_usage(pod_metrics, pod_usage_data))
+
+        self._set_pod_usage_data(pod_usage_data, usage_timestamp)
+
+    def _parse_pod_metrics_usage(self, pod_metrics_output):
+        pod_usage_data = {}
+        usage_timestamp = ''
+        for pod_metrics in PodListStreamParser(pod_metrics_output):
+            usage_timestamp = max(
+                usage_timestamp, self._add_pod_metrics_usage(pod_metrics, pod_usage_data))
+
+        self._set_pod_usage_data(pod_usage_data, usage_timestamp)
+
+    def _set_pod_usage_data(self, pod_usage_data, usage_timestamp):
+        # replace the usage only once it is complete, the watch factors pods meanwhile
+        with self._lock:
+            self._pod_usage_data = pod_usage_data
+            self._usage_timestamp = _parse_timestamp(usage_timestamp) if usage_timestamp else None
+
+    def _add_pod_metrics_usage(self, pod_metrics, pod_usage_data):
+        """Add the usage of the pod or its containers and return the time it was measured"""
+        resources = self._get_usage_resource_names()
+        namespace = self._get_nested_pod_data_attribute(
+            'metadata', 'namespace', pod_data=pod_metrics)
+        name = self._get_nested_pod_data_attribute('metadata', 'name', pod_data=pod_metrics)
+        usage = dict.fromkeys(resources, 0)
+        for container in pod_metrics.get('containers') or []:
+            if self._containers:
+                usage = dict.fromkeys(resources, 0)
+                container_name = container.get('name')
+                pod_usage_data[(namespace, f'{name}/{container_name}')] = usage
+            for resource in resources:
+                container_usage = self._get_nested_pod_data_attribute(
+                    'usage', resource, pod_data=container)
+                if container_usage is not None:
+                    usage[resource] += self._parse_resource_quantity(container_usage, resource)
+
+        if not self._containers:
+            pod_key = (namespace, name)
+            pod_usage_data[pod_key] = usage
+        # RFC 3339 timestamps in UTC compare like the times they represent
+        return pod_metrics.get('timestamp') or ''
+
+    def _fetch_kubectl_pod_metrics_usage(self):
+        self._fetch_pod_metrics_usage(self._execute_kubectl_get_pod_metrics())
+
+    def _execute_kubectl_get_pod_metrics(self):
+        # the exact values instead of the rounded ones kubectl top prints
+        return self._execute_kubectl_streamed(
+            'get', '--raw', self._get_api_path(METRICS_API_PREFIX), namespaced=False)
+
+    async def _execute_kubectl_get_pod_metrics_async(self):
+        return await self._execute_kubectl_streamed_async(
+            'get', '--raw', self._get_api_path(METRICS_API_PREFIX), namespaced=False)
+
+    def _execute_kubectl(self, *arguments, namespaced=True):
+        command = self._factor_kubectl_command(arguments, namespaced)
+        call_name = self._get_kubectl_call_name(arguments)
+        started = time.perf_counter()
+        try:
+            with _time_phase(self._timings, call_name):
+                process = subprocess.run(  # noqa: S603
+                    command,
+                    capture_output=True,
+                    check=True)
+        except subprocess.CalledProcessError as exc:
+            print(exc.stderr.decode('utf-8'))
+            raise
+
+        if self._timings is not None:
+            self._timings.add_call(
+                call_name,
+                len(process.stdout),
+                None,
+                time.perf_counter() - started)
+        return process.stdout.decode('utf-8')
+
+    def _execute_kubectl_streamed(self, *arguments, namespaced=True, timeout=True):
+        """
+        Start kubectl and return an iterator over its decoded output in chunks of
+        KUBECTL_OUTPUT_CHUNK_SIZE characters. The process is started immediately,
+        its output is read only while the iterator is consumed.
+        """
+        command = self._factor_kubectl_command(arguments, namespaced, timeout)
+        # stderr goes to a file to not block kubectl while we are reading stdout
+        stderr_file = tempfile.TemporaryFile()  # pylint: disable=consider-using-with
+        started = time.perf_counter()
+        process = subprocess.Popen(  # noqa: S603 pylint: disable=consider-using-with
+            command,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file)
+        output = self._read_kubectl_output(process, stderr_file)
+        if self._timings is not None:
+            output = self._timings.iter_output(
+                self._get_kubectl_call_name(arguments),
+                output,
+                started)
+        return _KubectlOutput(output, process, stderr_file)
+
+    def _get_kubectl_call_name(self, arguments):  # pylint: disable=no-self-use
+        if arguments[1:2] == ('--raw',):
+            # e.g. "kubectl get --raw /apis/metrics.k8s.io/v1beta1/pods"
+            return ' '.join((KUBECTL_BIN, *arguments[:2], urlsplit(arguments[2]).path))
+        return ' '.join((KUBECTL_BIN, *arguments[:2]))  # e.g. "kubectl get pods"
+
+    def _read_kubectl_output(self, process, stderr_file):  # pylint: disable=no-self-use
+        with process, stderr_file:
+            stdout = io.TextIOWrapper(process.stdout, encoding='utf-8')
+            try:
+                while chunk := stdout.read(KUBECTL_OUTPUT_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                if process.poll() is None:
+                    process.kill()  # the output was not consumed completely, e.g. a watch
+
+            return_code = process.wait()
+            if return_code:
+                stderr_file.seek(0)
+                stderr = stderr_file.read()
+                print(stderr.decode('utf-8'))
+                raise subprocess.CalledProcessError(
+                    return_code,
+                    process.args,
+                    stderr=stderr)
+
+    async def _execute_kubectl_streamed_async(self, *arguments, namespaced=True):
+        """
+        Start kubectl like _execute_kubectl_streamed() as subprocess of the running event loop
+        and return an asynchronous iterator over its decoded output
+        """
+        command = self._factor_kubectl_command(arguments, namespaced)
+        stderr_file = tempfile.TemporaryFile()  # pylint: disable=consider-using-with
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=stderr_file)
+        except BaseException:
+            stderr_file.close()
+            raise
+        return _KubectlOutputAsync(
+            self._read_kubectl_output_async(process, command, stderr_file),
+            process,
+            stderr_file)
+
+    async def _read_kubectl_output_async(  # pylint: disable=no-self-use
+            self, process, command, stderr_file):
+        with stderr_file:
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            completed = False
+            try:
+                while chunk := await process.stdout.read(KUBECTL_OUTPUT_CHUNK_SIZE):
+                    yield decoder.decode(chunk)
+                completed = True
+            finally:
+                if not completed and process.returncode is None:
+                    process.kill()  # the output was not consumed completely
+                return_code = await process.wait()
+
+            remainder = decoder.decode(b'', final=True)
+            if remainder:
+                yield remainder
+            if return_code:
+                stderr_file.seek(0)
+                stderr = stderr_file.read()
+                print(stderr.decode('utf-8'))
+                raise subprocess.CalledProcessError(
+                    return_code,
+                    command,
+                    stderr=stderr)
+
+    def _factor_kubectl_command(self, arguments, namespaced=True, timeout=True):
+        command = [KUBECTL_BIN]
+        command.extend(arguments)
+
+        # context
+        if self._context is not None:
+            command.append('--context')
+            command.append(self._context)
+
+        if timeout and self._request_timeout:
+            command.append(f'--request-timeout={self._request_timeout}s')
+
+        # namespace
+        if namespaced:
+            if self._namespace is None:
+                command.append('--all-namespaces')
+            else:
+                command.append('--namespace')
+                command.append(self._namespace)
+
+        return command
+
+    def _fetch_pod_data(self, get_pods_output):
+        for self._pod_data in self._iter_pod_data(get_pods_output):
+            self._add_pod()
+
+    def _iter_pod_data(self, get_pods_output):
+        if isinstance(get_pods_output, str):
+            get_pods_output = (get_pods_output,)
+
+        # decode the pods one by one to not keep the whole pod list in memory
+        pod_list_parser = PodListStreamParser(get_pods_output)
+        yield from pod_list_parser
+
+        # kubectl reports no resource version for the lists it prints
+        self._resource_version = self._get_nested_pod_data_attribute(
+            'metadata', 'resourceVersion',
+            default=None,
+            pod_data=pod_list_parser.members) or None
+
+    def _add_pod(self):
+        if self._pod_is_job():
+            return  # do not consider (cron) jobs
+
+        for pod in self._factor_pods():
+            pod_key = (pod.namespace, pod.name)
+            self._pods[pod_key] = pod
+
+    def _execute_kubectl_get_pods(self):
+        return self._execute_kubectl_streamed(
+            'get', 'pods', '-o', 'json', *self._get_kubectl_chunk_size_arguments())
+
+    async def _execute_kubectl_get_pods_async(self):
+        return await self._execute_kubectl_streamed_async(
+            'get', 'pods', '-o', 'json', *self._get_kubectl_chunk_size_arguments())
+
+    def _get_kubectl_chunk_size_arguments(self):
+        # kubectl lists the pods in pages itself but prints them not before all are received
+        return ('--chunk-size', str(self._chunk_size))
+
+    def _fetch_pod_data_compact(self, get_pods_output):
+        for self._pod_data in self._iter_pod_data_compact(get_pods_output):
+            self._add_pod()
+
+    def _iter_pod_data_compact(self, get_pods_output):
+        if isinstance(get_pods_output, str):
+            get_pods_output = (get_pods_output,)
+
+        for line in _iter_lines(get_pods_output):
+            if line:
+                yield self._parse_compact_pod_line(line)
+
+    def _execute_kubectl_get_pods_compact(self):
+        return self._execute_kubectl_streamed(
+            'get', 'pods', '-o', f'jsonpath={self._get_compact_pod_template()}',
+            *self._get_kubectl_chunk_size_arguments())
+
+    async def _execute_kubectl_get_pods_compact_async(self):
+        return await self._execute_kubectl_streamed_async(
+            'get', 'pods', '-o', f'jsonpath={self._get_compact_pod_template()}',
+            *self._get_kubectl_chunk_size_arguments())
+
+    def _get_compact_pod_template(self):
+        """
+        A jsonpath template to let kubectl print only the fields we need, one pod per line:
+        namespace, name, UID, generation, job-name label, owner kinds and the requests and
+        limits of the containers (prefixed with their names if containers are shown)
+        """
+        container_resources = []
+        for resource in self._get_resource_names():
+            resource_key = resource.replace('.', '\\.')  # e.g. nvidia.com/gpu
+            container_resources.append(
+                f'{{.resources.requests.{resource_key}}}{{","}}'
+                f'{{.resources.limits.{resource_key}}}')
+        if self._containers:
+            container_resources.insert(0, '{.name}')
+        container_template = '{"|"}'.join(container_resources)
+        return (
+            '{range .items[*]}'
+            '{.metadata.namespace}{"\\t"}'
+            '{.metadata.name}{"\\t"}'
+            '{.metadata.uid}{"\\t"}'
+            '{.metadata.generation}{"\\t"}'
+            '{.metadata.labels.job-name}{"\\t"}'
+            '{.metadata.ownerReferences[*].kind}{"\\t"}'
+            '{range .spec.containers[*]}'
+            f'{container_template}{{";"}}'
+            '{end}'
+            f'{self._get_compact_group_template()}'
+            '{"\\n"}'
+            '{end}')
+
+    def _get_compact_group_template(self):
+        if self._group_by == GROUP_BY_OWNER:
+            return (
+                '{"\\t"}{.metadata.ownerReferences[*].name}'
+                '{"\\t"}{.metadata.labels.pod-template-hash}')
+        if self._group_by == GROUP_BY_NODE:
+            return '{"\\t"}{.spec.nodeName}{"\\t"}{.status.phase}'
+        if self._group_by and self._group_by.startswith(GROUP_BY_LABEL_PREFIX):
+            label_key = self._group_by[len(GROUP_BY_LABEL_PREFIX):].replace('.', '\\.')
+            return f'{{"\\t"}}{{.metadata.labels.{label_key}}}'
+        return ''
+
+    def _parse_compact_pod_line(self, line):
+        """
+        Convert a line of the compact output into the structure of a pod from
+        the full JSON output, reduced to the fields which are used here.
+        """
+        namespace, name, uid, generation, job_name, owner_kinds, containers, *group_fields = \
+            line.split('\t')
+        resources = self._get_resource_names()
+        pod_containers = [
+            self._parse_compact_container(container, resources)
+            for container in containers.split(';') if container]
+
+        pod_data = {
+            'metadata': {
+                'namespace': namespace,
+                'name': name,
+                'uid': uid,
+                'generation': generation,
+                'labels': {'job-name': job_name} if job_name else {},
+                'ownerReferences': [{'kind': kind} for kind in owner_kinds.split()],
+            },
+            'spec': {
+                'containers': pod_containers,
+            },
+        }
+        if group_fields:
+            self._parse_compact_group_fields(pod_data, group_fields)
+        return pod_data
+
+    def _parse_compact_group_fields(self, pod_data, group_fields):
+        metadata = pod_data['metadata']
+        if self._group_by == GROUP_BY_OWNER:
+            owner_names, pod_template_hash = group_fields
+            owner_references = metadata['ownerReferences']
+            for owner_reference, owner_name in zip(owner_references, owner_names.split()):
+                owner_reference['name'] = owner_name
+            if pod_template_hash:
+                metadata['labels']['pod-template-hash'] = pod_template_hash
+        elif self._group_by == GROUP_BY_NODE:
+            node_name, phase = group_fields
+            pod_data['spec']['nodeName'] = node_name
+            pod_data['status'] = {'phase': phase}
+        elif group_fields[0]:
+            metadata['labels'][self._group_by[len(GROUP_BY_LABEL_PREFIX):]] = group_fields[0]
+
+    def _parse_compact_container(self, container, resources):
+        container_requests = {}
+        container_limits = {}
+        fields = container.split('|')
+        container_data = {}
+        if self._containers:
+            container_data['name'] = fields.pop(0)
+        for resource, values in zip(resources, fields):
+            requests, limits = values.split(',')
+            if requests:
+                container_requests[resource] = requests
+            if limits:
+                container_limits[resource] = limits
+
+        container_data['resources'] = {
+            'requests': container_requests,
+            'limits': container_limits,
+        }
+        return container_data
+
+    def _pod_is_job(self):
+        labels = self._get_nested_pod_data_attribute('metadata', 'labels', default=[])
+        got_job_label = 'job-name' in labels
+        got_owner_job = False
+
+        if got_job_label:
+            owner_references = self._get_nested_pod_data_attribute(
+                'metadata',
+                'ownerReferences',
+                default=[])
+            for owner_reference in owner_references:
+                if 'kind' in owner_reference and owner_reference['kind'] == 'Job':
+                    got_owner_job = True
+                    break
+
+        return bool(got_job_label and got_owner_job)
+
+    def _factor_pods(self):
+        """Return the pod or a pod per container if containers are shown"""
+        if not self._containers:
+            return (self._factor_pod(),)
+
+        containers = self._get_nested_pod_data_attribute('spec', 'containers') or []
+        return [self._factor_pod(container) for container in containers]
+
+    def _factor_pod(self, container=None):
+        namespace = self._get_nested_pod_data_attribute('metadata', 'namespace')
+        name = self._get_nested_pod_data_attribute('metadata', 'name')
+        containers = None  # all of the pod
+        if container is not None:
+            # the container's usage is looked up by the name of its row
+            name = f'{name}/{container.get("name")}'
+            containers = [container]
+        pod_key = (namespace, name)
+        usage = self._pod_usage_data.get(pod_key, {})
+
+        resources = None
+        if self._resources:
+            resources = {
+                resource: ResourceValues(
+                    requests=self._get_resources('requests', resource, containers),
+                    limits=self._get_resources('limits', resource, containers),
+                    usage=usage.get(resource, 0))
+                for resource in self._resources}
+            primary_values = resources[self._get_resource_name()]
+            memory_limits = primary_values.limits
+            memory_requests = primary_values.requests
+        else:
+            memory_limits = self._get_resources('limits', containers=containers)
+            memory_requests = self._get_resources('requests', containers=containers)
+        memory_usage = usage.get(self._get_resource_name(), 0)
+
+        pod = Pod(
+            namespace=namespace,
+            name=name,
+            memory_limits=memory_limits,
+            memory_requests=memory_requests,
+            memory_usage=memory_usage,
+            resources=resources,
+            group=self._get_pod_group())
+
+        return pod
+
+    def _get_pod_group(self):
+        if self._group_by == GROUP_BY_OWNER:
+            return self._get_pod_owner()
+        if self._group_by == GROUP_BY_NODE:
+            return self._get_nested_pod_data_attribute('spec', 'nodeName') or '<none>'
+        if self._group_by and self._group_by.startswith(GROUP_BY_LABEL_PREFIX):
+            labels = self._get_nested_pod_data_attribute('metadata', 'labels', default={})
+            return labels.get(self._group_by[len(GROUP_BY_LABEL_PREFIX):], '<none>')
+        return None  # namespaces need no extra data
+
+    def _get_pod_owner(self):
+        owner_references = self._get_nested_pod_data_attribute(
+            'metadata', 'ownerReferences', default=[])
+        if not owner_references:
+            name = self._get_nested_pod_data_attribute('metadata', 'name')
+            return f'Pod/{name}'
+
+        owner_reference = next(
+            (reference for reference in owner_references if reference.get('controller')),
+            owner_references[0])
+        kind = owner_reference.get('kind')
+        owner_name = owner_reference.get('name')
+        if kind != 'ReplicaSet':
+            return f'{kind}/{owner_name}'
+
+        namespace = self._get_nested_pod_data_attribute('metadata', 'namespace')
+        owner_key = (namespace, owner_name)
+        owner = self._owner_index.get(owner_key)
+        if owner is None:
+            # Deployments name their ReplicaSets after themselves and the pod template hash,
+            # this saves fetching all ReplicaSets to look up their owners
+            labels = self._get_nested_pod_data_attribute('metadata', 'labels', default={})
+            suffix = f'-{labels.get("pod-template-hash")}'
+            if 'pod-template-hash' in labels and owner_name.endswith(suffix):
+                owner = f'Deployment/{owner_name[:-len(suffix)]}'
+            else:
+                owner = f'ReplicaSet/{owner_name}'
+            self._owner_index[owner_key] = owner
+
+        return owner
+
+    def _get_nested_pod_data_attribute(self, *keys, default=None, pod_data=None):
+        value = pod_data or self._pod_data
+        for key in keys:
+            if key in value:
+                value = value[key]
+            else:
+                value = default
+                break
+
+        return value
+
+    def _get_resources(self, key, resource=None, containers=None):
+        resource = resource or self._get_resource_name()
+        value = 0
+        if containers is None:
+            containers = self._get_nested_pod_data_attribute('spec', 'containers')
+        if not containers:
+            return 0  # PODs without containers are rare but can happen
+        for container in containers:
+            container_value = self._get_nested_pod_data_attribute(
+                'resources',
+                key,
+                resource,
+                pod_data=container)
+            if container_value is not None:
+                container_value_bytes = self._parse_resource_quantity(container_value, resource)
+                value += container_value_bytes
+
+        return value
+
+    def _get_resource_name(self):
+        if self._resources:
+            return self._resources[0]
+        return 'cpu' if self._show_cpu_usage else 'memory'
+
+    def _get_resource_names(self):
+        return self._resources or (self._get_resource_name(),)
+
+    def _get_usage_resource_names(self):
+        return [resource for resource in self._get_resource_names() if resource in USAGE_RESOURCES]
+
+    def _parse_resource_quantity(self, quantity, resource=None):
+        resource = resource or self._get_resource_name()
+        scale = CPU_SCALE if resource == 'cpu' else 1
+        return parse_quantity_as_integer(quantity, scale)
+
+
+def get_kubeconfig_contexts():
+    command = [KUBECTL_BIN, 'config', 'get-contexts', '--output', 'name']
+    try:
+        process = subprocess.run(  # noqa: S603
+            command,
+            capture_output=True,
+            check=True)
+    except subprocess.CalledProcessError as exc:
+        print(exc.stderr.decode('utf-8'))
+        raise
+
+    return process.stdout.decode('utf-8').split()
+
+
+def get_kubeconfig_current_context():
+    command = [KUBECTL_BIN, 'config', 'current-context']
+    try:
+        process = subprocess.run(  # noqa: S603
+            command,
+            capture_output=True,
+            check=True)
+    except subprocess.CalledProcessError as exc:
+        print(exc.stderr.decode('utf-8'))
+        raise
+
+    return process.stdout.decode('utf-8').strip()
+
+
+class KubernetesCargoLoadMultiContextOverviewProvider:
+    """
+    Provide the pods of multiple contexts, each fetched in parallel by its own provider.
+    Failing contexts do not affect the others, their errors are collected in `errors`.
+    """
+
+    def __init__(self, contexts, provider_factory, parallel=PARALLEL_CONTEXTS_DEFAULT):
+        self._contexts = contexts
+        self._provider_factory = provider_factory
+        self._parallel = parallel
+        self.errors = {}
+
+    def provide(self):
+        pods = PodTable()
+        with ThreadPoolExecutor(max_workers=self._parallel) as executor:
+            futures = {
+                executor.submit(self._provide_context, context): context
+                for context in self._contexts}
+            for future in as_completed(futures):
+                context = futures[future]
+                try:
+                    context_pods = future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    self.errors[context] = exc
+                    continue
+
+                for pod in context_pods.values():
+                    pods[(context, pod.namespace, pod.name)] = pod._replace(context=context)
+
+        return pods
+
+    def _provide_context(self, context):
+        provider = self._provider_factory(context=context)
+        return provider.provide()
+
+
+class KubernetesCargoLoadOverviewPrinter:  # pylint: disable=too-many-instance-attributes
+
+    _format_pattern = \
+        '{:{w_namespace}} {:{w_name}} {:>{w_requests}} {:>{w_limits}} {:>{w_usage}} {:>{w_ratio}}'
+    _resource_format_pattern = ' {:>{w_requests}} {:>{w_limits}} {:>{w_usage}} {:>{w_ratio}}'
+    _byte_suffixes = (' B', 'Ki', 'Mi', 'Gi', 'Ti')
+    _sort_columns = ('context', 'namespace', 'name', 'requests', 'limits', 'usage', 'ratio')
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+            self,
+            overview,
+            no_header=False,
+            sort=SORT_DEFAULT,
+            show_cpu_usage=False,
+            output=None,
+            show_context=False,
+            resources=None,
+            group_by=None,
+            top=None,
+            timings=None,
+            containers=False):
+        self._overview = overview
+        self._no_header = no_header
+        self._sort = sort
+        self._show_cpu_usage = show_cpu_usage
+        self._output = output  # defaults to sys.stdout
+        self._show_context = show_context
+        # print a group of columns per resource instead of only memory or cpu
+        self._resources = resources
+        self._group_by = group_by  # print a row per group of pods instead of per pod
+        self._top = top  # print only the first pods in sort order
+        self._timings = timings
+        self._containers = containers  # the rows are containers named <pod>/<container>
+        self._sort_keys = None
+        if resources:
+            self._format_pattern = \
+                '{:{w_namespace}} {:{w_name}}' + self._resource_format_pattern * len(resources)
+        if show_context:
+            self._format_pattern = f'{{:{{w_context}}}} {self._format_pattern}'
+        self._column_widths = {}
+        self._pod = None
+        self._sums = self._factor_sums()
+        self._context_sums = {}
+        self._row_format = None
+        self._lines = []  # written in blocks instead of line by line
+        self._humanized_values = {}  # most pods share the same requests and limits
+        self._humanized_ratios = {}
+
+    def _factor_sums(self):
+        if self._resources:
+            return {resource: ResourceValues(0, 0, 0) for resource in self._resources}
+
+        return {
+            'memory_requests': 0,
+            'memory_limits': 0,
+            'memory_usage': 0,
+            'memory_ratio': 0,
+        }
+
+    def print(self):
+        # grouping, sorting and writing are timed separately, the rest is formatting the rows
+        with _time_phase(self._timings, 'format rows'):
+            self._sort_keys = self._parse_sort_keys()
+            if self._group_by:
+                with _time_phase(self._timings, 'group pods'):
+                    self._overview = self._group_pods()
+            pod_table = self._overview
+            if not isinstance(pod_table, PodTable):
+                pod_table = PodTable(pod_table)
+            if not self._group_by:  # groups have been added to the summary already
+                self._add_pod_table_to_summary(pod_table)
+            self._determine_maximum_column_widths(pod_table)
+            self._print_resource_header()
+            self._print_header()
+            self._print_separator()
+            self._print_pod_data(pod_table)
+            self._print_separator()
+            self._print_summary()
+            self._flush()
+
+    def _determine_maximum_column_widths(self, pod_table):
+        # consider column names as well
+        max_namespace = max(pod_table.get_maximum_length('namespace'), len('Namespace'))
+        max_name = max(pod_table.get_maximum_length('name'), len('Name'), 40)
+
+        if self._show_context:
+            self._column_widths['w_context'] = \
+                max(pod_table.get_maximum_length('context'), len('Context'))
+        self._column_widths['w_namespace'] = max_namespace
+        self._column_widths['w_name'] = max_name
+        self._column_widths['w_requests'] = 12
+        self._column_widths['w_limits'] = 12
+        self._column_widths['w_usage'] = 12
+        self._column_widths['w_ratio'] = 12
+        self._row_format = self._compile_row_format()
+
+    def _print_header(self):
+        if self._no_header:
+            return
+
+        resource_columns = ('Requests', 'Limits', 'Usage', '%') * len(self._resources or [None])
+        self._print_row('Context', 'Namespace', self._get_name_column_title(), *resource_columns)
+
+    def _get_name_column_title(self):
+        if self._group_by == GROUP_BY_NAMESPACE:
+            return 'Containers' if self._containers else 'PODs'
+        if self._group_by == GROUP_BY_OWNER:
+            return 'Owner'
+        if self._group_by == GROUP_BY_NODE:
+            return 'Node'
+        if self._group_by:
+            return self._group_by[len(GROUP_BY_LABEL_PREFIX):]
+        if self._containers:
+            return 'POD/Container'
+        return 'Name'
+
+    def _print_resource_header(self):
+        if self._no_header or not self._resources:
+            return
+
+        widths = self._column_widths
+        group_width = widths['w_requests'] + widths['w_limits'] + widths['w_usage'] + \
+            widths['w_ratio'] + 3
+        line = ' ' * (widths['w_namespace'] + widths['w_name'] + 1)
+        if self._show_context:
+            line = f'{" " * widths["w_context"]} {line}'
+        for resource in self._resources:
+            line += f' {f" {resource} ":-^{group_width}}'
+        self._write_line(line)
+
+    def _print_row(self, context, *columns):
+        if self._show_context:
+            columns = (context, *columns)
+
+        self._write_line(self._row_format.format(*columns))
+
+    def _compile_row_format(self):
+        # insert the column widths once instead of passing them for each row
+        row_format = self._format_pattern
+        for name, width in self._column_widths.items():
+            row_format = row_format.replace(f'{{{name}}}', str(width))
+        return row_format
+
+    def _write_line(self, line):
+        self._lines.append(line)
+        if len(self._lines) >= PRINTER_BUFFER_LINES:
+            self._flush()
+
+    def _flush(self):
+        if self._lines:
+            output = self._output or sys.stdout
+            with _time_phase(self._timings, 'write output'):
+                output.write('\n'.join(self._lines))
+                output.write('\n')
+            self._lines = []
+
+    def _print_separator(self):
+        if self._no_header:
+            return
+
+        widths = self._column_widths
+        width = sum(widths.values()) + len(widths)
+        if self._resources:  # the resource columns are repeated for each resource
+            resource_width = widths['w_requests'] + widths['w_limits'] + widths['w_usage'] + \
+                widths['w_ratio'] + 4
+            width += resource_width * (len(self._resources) - 1)
+        self._write_line('-' * width)
+
+    def _print_pod_data(self, pod_table):
+        with _time_phase(self._timings, 'sort pods'):
+            rows = pod_table.get_sort_order(self._sort_keys, self._top)
+
+        for row in rows:
+            self._pod = pod_table.get_pod(row)
+            if self._resources:
+                self._print_row(
+                    self._pod.context,
+                    self._pod.namespace,
+                    self._pod.name,
+                    *self._get_resource_columns(self._pod.resources))
+                continue
+
+            self._print_row(
+                self._pod.context,
+                self._pod.namespace,
+                self._pod.name,
+                self._humanize_bytes(self._pod.memory_requests),
+                self._humanize_bytes(self._pod.memory_limits),
+                self._humanize_bytes(self._pod.memory_usage),
+                self._get_memory_usage_ratio_formatted())
+
+    def _get_resource_columns(self, resources):
+        columns = []
+        for resource in self._resources:
+            values = resources.get(resource) or ResourceValues(0, 0, 0)
+            columns.extend((
+                self._humanize_resource(values.requests, resource),
+                self._humanize_resource(values.limits, resource),
+                self._humanize_resource(values.usage, resource),
+                self._get_memory_usage_ratio_formatted(values.limits, values.usage)))
+        return columns
+
+    def _add_pod_table_to_summary(self, pod_table):
+        self._add_rows_to_sums(self._sums, pod_table)
+        if self._show_context:
+            for context, rows in pod_table.get_rows_by_context().items():
+                context_sums = self._context_sums.setdefault(context, self._factor_sums())
+                self._add_rows_to_sums(context_sums, pod_table, rows)
+
+    def _add_rows_to_sums(self, sums, pod_table, rows=None):
+        if self._resources:
+            for resource in self._resources:
+                values = pod_table.get_sums(resource, rows)
+                sums[resource] = ResourceValues(*(
+                    resource_sum + value for resource_sum, value in zip(sums[resource], values)))
+            return
+
+        # the usage of pods without limits is not considered
+        values = pod_table.get_sums(rows=rows)
+        sums['memory_requests'] += values.requests
+        sums['memory_limits'] += values.limits
+        sums['memory_usage'] += values.usage
+
+    def _add_pod_to_summary(self):
+        self._add_pod_to_sums(self._sums)
+        if self._show_context:
+            context_sums = self._context_sums.setdefault(self._pod.context, self._factor_sums())
+            self._add_pod_to_sums(context_sums)
+
+    def _add_pod_to_sums(self, sums, unlimited_usage=False):
+        if self._resources:
+            for resource, values in self._pod.resources.items():
+                resource_sums = sums[resource]._replace(
+                    requests=sums[resource].requests + values.requests)
+                # consider usage for summary only if limit is set
+                if values.limits or unlimited_usage:
+                    resource_sums = resource_sums._replace(
+                        limits=resource_sums.limits + values.limits,
+                        usage=resource_sums.usage + values.usage)
+                sums[resource] = resource_sums
+            return
+
+        sums['memory_requests'] += self._pod.memory_requests
+        # consider usage for summary only if limit is set
+        if self._pod.memory_limits or unlimited_usage:
+            sums['memory_limits'] += self._pod.memory_limits
+            sums['memory_usage'] += self._pod.memory_usage
+
+    def _group_pods(self):
+        # sum up the pods per group in a single pass, the groups are then printed like pods
+        groups = {}
+        for self._pod in self._overview.values():
+            self._add_pod_to_summary()
+            group_key = (self._pod.context, *self._get_group_for_pod(self._pod))
+            group = groups.get(group_key)
+            if group is None:
+                group = groups[group_key] = [self._factor_sums(), 0]
+            # the groups show the whole usage of their pods
+            self._add_pod_to_sums(group[0], unlimited_usage=True)
+            group[1] += 1
+
+        return {
+            group_key: self._factor_group_pod(group_key, group_sums, pod_count)
+            for group_key, (group_sums, pod_count) in groups.items()}
+
+    def _get_group_for_pod(self, pod):
+        if self._group_by == GROUP_BY_NAMESPACE:
+            return pod.namespace, None
+        if self._group_by == GROUP_BY_OWNER:
+            return pod.namespace, pod.group  # owners are namespaced
+        if self._group_by == GROUP_BY_NODE or self._group_by.startswith(GROUP_BY_LABEL_PREFIX):
+            return '', pod.group
+
+        msg = f'Unsupported group: {self._group_by}'
+        raise ValueError(msg)
+
+    def _factor_group_pod(self, group_key, sums, pod_count):
+        context, namespace, group = group_key
+        # the rows are counted, which are containers in container mode
+        unit = 'containers' if self._containers else 'PODs'
+        name = f'{pod_count} {unit}' if group is None else f'{group} ({pod_count} {unit})'
+        if self._resources:
+            values = sums[self._resources[0]]
+            return Pod(
+                namespace, name, values.limits, values.requests, values.usage,
+                context=context, resources=sums)
+
+        return Pod(
+            namespace, name, sums['memory_limits'], sums['memory_requests'], sums['memory_usage'],
+            context=context)
+
+    def _parse_sort_keys(self):
+        """
+        Parse the sort specification into the columns to sort the pod table by,
+        a key with the suffix ":desc" sorts in descending order
+        """
+        sort_keys = []
+        if self._show_context:
+            sort_keys.append(('context', False))  # keep the pods of each context together
+
+        for sort_key_raw in self._sort.split(','):
+            sort_key, _, direction = sort_key_raw.strip().partition(':')
+            if sort_key not in self._sort_columns:
+                msg = f'Unsupported sort key: {sort_key}'
+                raise ValueError(msg)
+            if direction not in ('', 'asc', 'desc'):
+                msg = f'Unsupported sort direction: {direction}'
+                raise ValueError(msg)
+
+            sort_keys.append((sort_key, direction == 'desc'))
+        return sort_keys
+
+    def _humanize_bytes(self, bytes_, precision=1):
+        cache_key = (bytes_, precision)
+        humanized = self._humanized_values.get(cache_key)
+        if humanized is None:
+            humanized = self._humanize_bytes_uncached(bytes_, precision)
+            self._humanized_values[cache_key] = humanized
+        return humanized
+
+    def _humanize_bytes_uncached(self, bytes_, precision):
+        # values might be any number but usually are integers, so work on integer ratios
+        numerator, denominator = bytes_.as_integer_ratio()
+        if self._show_cpu_usage:
+            millicores = _format_fraction(numerator, denominator * (CPU_SCALE // 1000), 0)
+            return f'{millicores} m'
+
+        # the largest power of 1024 up to the value is given by its number of bits
+        integral = max(numerator // denominator, 1)
+        suffix_index = min((integral.bit_length() - 1) // 10, len(self._byte_suffixes) - 1)
+        bytes_rounded = _format_fraction(numerator, denominator << (10 * suffix_index), precision)
+        return f'{bytes_rounded} {self._byte_suffixes[suffix_index]}'
+
+    def _humanize_resource(self, value, resource):
+        if resource == 'cpu':
+            millicores = _format_fraction(value, CPU_SCALE // 1000, 0)
+            return f'{millicores} m'
+        if resource in ('memory', 'ephemeral-storage') or resource.startswith('hugepages-'):
+            return self._humanize_bytes(value)
+
+        return str(value)  # extended resources like nvidia.com/gpu are counted in units
+
+    def _get_memory_usage_ratio_formatted(self, maximum=None, use=None):
+        maximum, use = self._get_memory_usage_ratio_values(maximum, use)
+        if not maximum:
+            return f'{0:.2f} %'
+
+        cache_key = (use, maximum)
+        ratio = self._humanized_ratios.get(cache_key)
+        if ratio is None:
+            ratio = f'{_format_fraction(use * 100, maximum, 2)} %'
+            self._humanized_ratios[cache_key] = ratio
+        return ratio
+
+    def _get_memory_usage_ratio_values(self, maximum, use):
+        if maximum is None:
+            maximum = self._pod.memory_limits
+        if use is None:
+            use = self._pod.memory_usage
+
+        return maximum, use
+
+    def _print_summary(self):
+        for context, context_sums in sorted(self._context_sums.items()):
+            self._print_summary_row(context, context_sums)
+
+        self._print_summary_row('All', self._sums)
+
+    def _print_summary_row(self, context, sums):
+        if self._resources:
+            self._print_row(
+                context,
+                'Summary',
+                '(PODs without configured limits ignored)',
+                *self._get_resource_columns(sums))
+            return
+
+        self._print_row(
+            context,
+            'Summary',
+            '(PODs without configured limits ignored)',
+            self._humanize_bytes(sums['memory_requests']),
+            self._humanize_bytes(sums['memory_limits']),
+            self._humanize_bytes(sums['memory_usage']),
+            self._get_memory_usage_ratio_formatted(
+                sums['memory_limits'],
+                sums['memory_usage']))
+
+
+class KubernetesCargoLoadNodeOverviewPrinter(KubernetesCargoLoadOverviewPrinter):
+    """
+    Print the sums of the requests and limits of the pods and the usage of each node
+    relative to its allocatable and the headroom left for the requests of further pods
+    """
+
+    _format_pattern = (
+        '{:{w_name}} {:>{w_pods}} {:>{w_allocatable}} {:>{w_requests}} {:>{w_ratio}} '
+        '{:>{w_limits}} {:>{w_ratio}} {:>{w_usage}} {:>{w_ratio}} {:>{w_headroom}}')
+    _sort_columns = ('name', 'pods', 'allocatable', 'requests', 'limits', 'usage', 'headroom')
+
+    def print(self):
+        with _time_phase(self._timings, 'format rows'):
+            nodes = list(self._overview.values())
+            with _time_phase(self._timings, 'sort nodes'):
+                # sort by each key from the last to the first, like the pod table
+                for sort_key, descending in reversed(self._parse_sort_keys()):
+                    attribute = 'pod_count' if sort_key == 'pods' else sort_key
+                    nodes.sort(key=attrgetter(attribute), reverse=descending)
+            summary = self._factor_summary(nodes)
+            self._determine_node_column_widths([*nodes, summary])
+            self._print_header()
+            self._print_separator()
+            for node in nodes[:self._top]:
+                self._print_node(node)
+            self._print_separator()
+            self._print_node(summary)
+            self._flush()
+
+    def _factor_summary(self, nodes):  # pylint: disable=no-self-use
+        return Node(
+            'Summary',
+            allocatable=sum(node.allocatable for node in nodes),
+            requests=sum(node.requests for node in nodes),
+            limits=sum(node.limits for node in nodes),
+            usage=sum(node.usage for node in nodes),
+            pod_count=sum(node.pod_count for node in nodes),
+            headroom=sum(node.headroom for node in nodes))
+
+    def _determine_node_column_widths(self, nodes):
+        self._column_widths['w_name'] = max(len('Node'), *(len(node.name) for node in nodes))
+        self._column_widths['w_pods'] = \
+            max(len('PODs'), *(len(str(node.pod_count)) for node in nodes))
+        self._column_widths['w_allocatable'] = 12
+        self._column_widths['w_requests'] = 12
+        self._column_widths['w_limits'] = 12
+        self._column_widths['w_usage'] = 12
+        self._column_widths['w_ratio'] = 12
+        self._column_widths['w_headroom'] = 12
+        self._row_format = self._compile_row_format()
+
+    def _print_header(self):
+        if self._no_header:
+            return
+
+        self._print_row(
+            None, 'Node', 'PODs', 'Allocatable', 'Requests', '%', 'Limits', '%', 'Usage', '%',
+            'Headroom')
+
+    def _print_separator(self):
+        if self._no_header:
+            return
+
+        widths = self._column_widths
+        # the ratio column is printed thrice
+        width = sum(widths.values()) + 2 * widths['w_ratio'] + len(widths) + 1
+        self._write_line('-' * width)
+
+    def _print_node(self, node):
+        self._print_row(
+            None,
+            node.name,
+            node.pod_count,
+            self._humanize_bytes(node.allocatable),
+            self._humanize_bytes(node.requests),
+            self._get_memory_usage_ratio_formatted(node.allocatable, node.requests),
+            self._humanize_bytes(node.limits),
+            self._get_memory_usage_ratio_formatted(node.allocatable, node.limits),
+            self._humanize_bytes(node.usage),
+            self._get_memory_usage_ratio_formatted(node.allocatable, node.usage),
+            self._humanize_bytes(node.headroom))
+
+
+class KubernetesCargoLoadUsageStatisticsPrinter(KubernetesCargoLoadOverviewPrinter):
+    """Print the recorded usage statistics of the pods with their requests and limits"""
+
+    _format_pattern = (
+        '{:{w_namespace}} {:{w_name}} {:>{w_requests}} {:>{w_limits}} {:>{w_samples}} '
+        '{:>{w_usage}} {:>{w_usage}} {:>{w_usage}} {:>{w_usage}}')
+    _sort_columns = (
+        'namespace', 'name', 'requests', 'limits', 'samples', 'min', 'avg', 'p95', 'max')
+    _sort_attributes = {'min': 'minimum', 'avg': 'average', 'max': 'maximum'}
+
+    def print(self):
+        with _time_phase(self._timings, 'format rows'):
+            statistics = list(self._overview.values())
+            with _time_phase(self._timings, 'sort pods'):
+                for sort_key, descending in reversed(self._parse_sort_keys()):
+                    attribute = self._sort_attributes.get(sort_key, sort_key)
+                    statistics.sort(key=attrgetter(attribute), reverse=descending)
+            self._determine_statistics_column_widths(statistics)
+            self._print_header()
+            self._print_separator()
+            for pod_statistics in statistics[:self._top]:
+                self._print_statistics(pod_statistics)
+            self._flush()
+
+    def _determine_statistics_column_widths(self, statistics):
+        self._column_widths['w_namespace'] = \
+            max(len('Namespace'), *(len(pod.namespace) for pod in statistics), 0)
+        self._column_widths['w_name'] = \
+            max(len('Name'), *(len(pod.name) for pod in statistics), 0)
+        self._column_widths['w_requests'] = 12
+        self._column_widths['w_limits'] = 12
+        self._column_widths['w_samples'] = \
+            max(len('Samples'), *(len(str(pod.samples)) for pod in statistics), 0)
+        self._column_widths['w_usage'] = 12
+        self._row_format = self._compile_row_format()
+
+    def _print_header(self):
+        if self._no_header:
+            return
+
+        self._print_row(
+            None, 'Namespace', 'Name', 'Requests', 'Limits', 'Samples', 'Min', 'Avg', 'P95',
+            'Max')
+
+    def _print_separator(self):
+        if self._no_header:
+            return
+
+        widths = self._column_widths
+        # the usage column is printed four times
+        width = sum(widths.values()) + 3 * widths['w_usage'] + len(widths) + 2
+        self._write_line('-' * width)
+
+    def _print_statistics(self, statistics):
+        self._print_row(
+            None,
+            statistics.namespace,
+            statistics.name,
+            self._humanize_bytes(statistics.requests),
+            self._humanize_bytes(statistics.limits),
+            statistics.samples,
+            self._humanize_bytes(statistics.minimum),
+            self._humanize_bytes(statistics.average),
+            self._humanize_bytes(statistics.p95),
+            self._humanize_bytes(statistics.maximum))
+
+
+class KubernetesCargoLoadRecommendationPrinter(KubernetesCargoLoadOverviewPrinter):
+    """
+    Print the recommended requests and limits per workload next to the current ones and
+    the usage they are based on, the summary shows the requests of all pods
+    """
+
+    _format_pattern = (
+        '{:{w_namespace}} {:{w_name}} {:>{w_pods}} {:>{w_samples}} {:>{w_value}} '
+        '{:>{w_value}} {:>{w_value}} {:>{w_value}} {:>{w_value}} {:>{w_value}} {:>{w_value}}')
+    _sort_columns = ('namespace', 'name', 'pods', 'samples', 'requests', 'limits', 'savings')
+
+    def print(self):
+        with _time_phase(self._timings, 'format rows'):
+            recommendations = list(self._overview.values())
+            for sort_key, descending in reversed(self._parse_sort_keys()):
+                attribute = 'pod_count' if sort_key == 'pods' else sort_key
+                recommendations.sort(key=attrgetter(attribute), reverse=descending)
+            self._determine_recommendation_column_widths(recommendations)
+            self._print_header()
+            self._print_separator()
+            for recommendation in recommendations[:self._top]:
+                self._print_recommendation(recommendation)
+            self._print_separator()
+            self._print_recommendation_summary(recommendations)
+            self._flush()
+
+    def _determine_recommendation_column_widths(self, recommendations):
+        self._column_widths['w_namespace'] = \
+            max(len('Namespace'), *(len(row.namespace) for row in recommendations), 0)
+        self._column_widths['w_name'] = max(
+            len('Owner'), len('(all PODs)'), *(len(row.name) for row in recommendations))
+        self._column_widths['w_pods'] = \
+            max(len('PODs'), *(len(str(row.pod_count)) for row in recommendations), 0)
+        self._column_widths['w_samples'] = \
+            max(len('Samples'), *(len(str(row.samples)) for row in recommendations), 0)
+        self._column_widths['w_value'] = 13
+        self._row_format = self._compile_row_format()
+
+    def _print_header(self):
+        if self._no_header:
+            return
+
+        self._print_row(
+            None, 'Namespace', 'Owner', 'PODs', 'Samples', 'Requests', 'Limits',
+            f'P{RECOMMEND_QUANTILE * 100:.0f}', 'Max', 'Rec. Requests', 'Rec. Limits', 'Savings')
+
+    def _print_separator(self):
+        if self._no_header:
+            return
+
+        widths = self._column_widths
+        # the value column is printed seven times
+        width = sum(widths.values()) + 6 * widths['w_value'] + len(widths) + 5
+        self._write_line('-' * width)
+
+    def _print_recommendation(self, recommendation):
+        self._print_row(
+            None,
+            recommendation.namespace,
+            recommendation.name,
+            recommendation.pod_count,
+            recommendation.samples,
+            self._humanize_bytes(recommendation.requests),
+            self._humanize_bytes(recommendation.limits),
+            self._humanize_bytes(recommendation.quantile),
+            self._humanize_bytes(recommendation.maximum),
+            self._humanize_bytes(recommendation.recommended_requests),
+            self._humanize_bytes(recommendation.recommended_limits),
+            self._humanize_signed(recommendation.savings))
+
+    def _print_recommendation_summary(self, recommendations):
+        # the requests of all pods, per pod values cannot be summed up
+        requests = sum(row.requests * row.pod_count for row in recommendations)
+        recommended_requests = \
+            sum(row.recommended_requests * row.pod_count for row in recommendations)
+        self._print_row(
+            None,
+            'Summary',
+            '(all PODs)',
+            sum(row.pod_count for row in recommendations),
+            sum(row.samples for row in recommendations),
+            self._humanize_bytes(requests),
+            '',
+            '',
+            '',
+            self._humanize_bytes(recommended_requests),
+            '',
+            self._humanize_signed(sum(row.savings for row in recommendations)))
+
+    def _humanize_signed(self, value):
+        if value < 0:
+            return f'-{self._humanize_bytes(-value)}'
+        return self._humanize_bytes(value)
+
+
+class KubernetesCargoLoadOverviewWriter(ABC):
+    """
+    Write the pods in a machine-readable format one by one as they are provided,
+    without column widths to determine first. Values are plain integers:
+    millicores for cpu, bytes for memory and storage and units for other resources.
+    The pods are written in the order they are provided, so they are not sorted.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+            self,
+            pods,
+            show_cpu_usage=False,
+            output=None,
+            show_context=False,
+            resources=None,
+            show_group=False):
+        self._pods = pods  # any iterable, e.g. a generator
+        self._output = output or sys.stdout
+        self._show_context = show_context
+        self._show_group = show_group
+        self._resources = resources or (('cpu' if show_cpu_usage else 'memory'),)
+
+    def write(self):
+        self._write_header()
+        for pod in self._pods:
+            self._write_record(self._factor_record(pod))
+        self._write_footer()
+
+    def _get_field_names(self):
+        field_names = ['context'] if self._show_context else []
+        field_names.extend(('namespace', 'name'))
+        if self._show_group:
+            field_names.append('group')
+        for resource in self._resources:
+            field_names.extend((f'{resource}_requests', f'{resource}_limits', f'{resource}_usage'))
+        return field_names
+
+    def _factor_record(self, pod):
+        record = {'context': pod.context} if self._show_context else {}
+        record['namespace'] = pod.namespace
+        record['name'] = pod.name
+        if self._show_group:
+            record['group'] = pod.group
+
+        resources = pod.resources or {
+            self._resources[0]:
+                ResourceValues(pod.memory_requests, pod.memory_limits, pod.memory_usage)}
+        for resource in self._resources:
+            values = resources.get(resource) or ResourceValues(0, 0, 0)
+            record[f'{resource}_requests'] = self._get_raw_value(values.requests, resource)
+            record[f'{resource}_limits'] = self._get_raw_value(values.limits, resource)
+            record[f'{resource}_usage'] = self._get_raw_value(values.usage, resource)
+        return record
+
+    def _get_raw_value(self, value, resource):  # pylint: disable=no-self-use
+        if resource == 'cpu':
+            return -(-value // (CPU_SCALE // 1000))  # nanocores rounded up to millicores
+        return value
+
+    def _write_header(self):
+        pass
+
+    @abstractmethod
+    def _write_record(self, record):
+        pass
+
+    def _write_footer(self):
+        pass
+
+
+class KubernetesCargoLoadOverviewJsonWriter(KubernetesCargoLoadOverviewWriter):
+
+    _separator = None
+
+    def _write_header(self):
+        self._output.write('[')
+        self._separator = '\n'
+
+    def _write_record(self, record):
+        self._output.write(f'{self._separator}{json.dumps(record)}')
+        self._separator = ',\n'
+
+    def _write_footer(self):
+        self._output.write('\n]\n')
+
+
+class KubernetesCargoLoadOverviewNdjsonWriter(KubernetesCargoLoadOverviewWriter):
+
+    def _write_record(self, record):
+        self._output.write(f'{json.dumps(record)}\n')
+
+
+class KubernetesCargoLoadOverviewCsvWriter(KubernetesCargoLoadOverviewWriter):
 
-    def _fetch_pod_data(self):
-        get_pods_output = self._execute_kubectl_get_pods()
-        pods_data = json.loads(get_pods_output)
-        for self._pod_data in pods_data['items']:
-            if self._pod_is_job():
-                continue  # do not consider (cron) jobs
+    _csv_writer = None
 
-            pod = self._factor_pod()
-            pod_key = (pod.namespace, pod.name)
-            self._pods[pod_key] = pod
+    def _write_header(self):
+        self._csv_writer = csv.DictWriter(
+            self._output,
+            self._get_field_names(),
+            lineterminator='\n')
+        self._csv_writer.writeheader()
 
-    def _execute_kubectl_get_pods(self):
-        return self._execute_kubectl('get', 'pods', '-o', 'json')
+    def _write_record(self, record):
+        self._csv_writer.writerow(record)
 
-    def _pod_is_job(self):
-        labels = self._get_nested_pod_data_attribute('metadata', 'labels', default=[])
-        got_job_label = 'job-name' in labels
-        got_owner_job = False
 
-        if got_job_label:
-            owner_references = self._get_nested_pod_data_attribute(
-                'metadata',
-                'ownerReferences',
-                default=[])
-            for owner_reference in owner_references:
-                if 'kind' in owner_reference and owner_reference['kind'] == 'Job':
-                    got_owner_job = True
-                    break
+OUTPUT_WRITERS = {
+    OUTPUT_JSON: KubernetesCargoLoadOverviewJsonWriter,
+    OUTPUT_NDJSON: KubernetesCargoLoadOverviewNdjsonWriter,
+    OUTPUT_CSV: KubernetesCargoLoadOverviewCsvWriter,
+}
 
-        return bool(got_job_label and got_owner_job)
 
-    def _factor_pod(self):
-        namespace = self._get_nested_pod_data_attribute('metadata', 'namespace')
-        name = self._get_nested_pod_data_attribute('metadata', 'name')
-        memory_limits = self._get_resources('limits')
-        memory_requests = self._get_resources('requests')
+class KubernetesCargoLoadOverviewWatcher:
+    """
+    Print the overview periodically with fresh usage data while the pods are kept up to
+    date by a watch. Only lines which changed since the last refresh are redrawn.
+    """
 
-        pod_key = (namespace, name)
-        memory_usage = self._pod_usage_data.get(pod_key, Decimal(0))
+    def __init__(self, provider, printer_factory, interval=WATCH_INTERVAL_DEFAULT, output=None):
+        self._provider = provider
+        self._printer_factory = printer_factory
+        self._interval = interval
+        self._output = output  # defaults to sys.stdout
+        self._lines = None
 
-        pod = Pod(
-            namespace=namespace,
-            name=name,
-            memory_limits=memory_limits,
-            memory_requests=memory_requests,
-            memory_usage=memory_usage)
+    def run(self):
+        self._provider.provide()
+        self._provider.watch()
+        while True:
+            self._redraw()
+            time.sleep(self._interval)
+            self._provider.refresh_usage()
 
-        return pod
+    def _redraw(self):
+        rendered_output = io.StringIO()
+        printer = self._printer_factory(self._provider.get_overview(), output=rendered_output)
+        printer.print()
+        self._write_changed_lines(rendered_output.getvalue().splitlines())
 
-    def _get_nested_pod_data_attribute(self, *keys, default=None, pod_data=None):
-        value = pod_data or self._pod_data
-        for key in keys:
-            if key in value:
-                value = value[key]
-            else:
-                value = default
-                break
+    def _write_changed_lines(self, lines):
+        previous_lines = self._lines
+        parts = []
+        if previous_lines is None:
+            previous_lines = []
+            parts.append('\x1b[H\x1b[2J')  # clear screen
 
-        return value
+        for index, line in enumerate(lines):
+            if index >= len(previous_lines) or previous_lines[index] != line:
+                # move the cursor to the line, write it and clear the rest of the line
+                parts.append(f'\x1b[{index + 1};1H{line}\x1b[K')
+        if len(lines) < len(previous_lines):
+            parts.append(f'\x1b[{len(lines) + 1};1H\x1b[J')  # clear the remaining lines
 
-    def _get_resources(self, key):
-        value = 0
-        containers = self._get_nested_pod_data_attribute('spec', 'containers')
-        if not containers:
-            return 0  # PODs without containers are rare but can happen
-        for container in containers:
-            container_value = self._get_nested_pod_data_attribute(
-                'resources',
-                key,
-                'cpu' if self._show_cpu_usage else 'memory',
-                pod_data=container)
-            if container_value is not None:
-                container_value_bytes = self._parse_quantity(container_value)
-                value += container_value_bytes
+        output = self._output or sys.stdout
+        output.write(''.join(parts))
+        output.flush()
+        self._lines = lines
 
-        return value
 
-    # pylint: disable=too-complex,no-self-use,raise-missing-from
-    def _parse_quantity(self, quantity):  # noqa: C901
-        # Taken from
-        # https://github.com/kubernetes-client/python/blob/master/kubernetes/utils/quantity.py
-        """
-        Parse kubernetes canonical form quantity like 200Mi to a decimal number.
-        Supported SI suffixes:
-        base1024: Ki | Mi | Gi | Ti | Pi | Ei
-        base1000: n | u | m | "" | k | M | G | T | P | E
-        See https://github.com/kubernetes/apimachinery/blob/master/pkg/api/resource/quantity.go
-        Input:
-        quantity: string. kubernetes canonical form quantity
-        Returns:
-        Decimal
-        Raises:
-        ValueError on invalid or unknown input
-        """
-        if isinstance(quantity, (int, float, Decimal)):
-            return Decimal(quantity)
-
-        exponents = {'n': -3, 'u': -2, 'm': -1, 'K': 1, 'k': 1, 'M': 2,
-                     'G': 3, 'T': 4, 'P': 5, 'E': 6}
-
-        quantity = str(quantity)
-        number = quantity
-        suffix = None
-        if len(quantity) >= 2 and quantity[-1] == 'i':
-            if quantity[-2] in exponents:
-                number = quantity[:-2]
-                suffix = quantity[-2:]
-        elif len(quantity) >= 1 and quantity[-1] in exponents:
-            number = quantity[:-1]
-            suffix = quantity[-1:]
+class KubernetesCargoLoadUsageRecorder:
+    """
+    Sample the usage of the pods periodically into a usage store. The requests and limits
+    of the pods are kept up to date by a watch, so only the usage is fetched per sample.
+    The provider must provide the values of the cpu and memory resources.
+    """
 
+    def __init__(self, provider, store, context, interval=RECORD_INTERVAL_DEFAULT):
+        self._provider = provider
+        self._store = store
+        self._context = context
+        self._interval = interval
+
+    def run(self):
+        self._provider.provide()
+        self._provider.watch()
+        self._record()
+        while True:
+            time.sleep(self._interval)
+            try:
+                self._provider.refresh_usage()
+            except (subprocess.CalledProcessError, KubernetesApiError, OSError) as exc:
+                # keep recording, the metrics API is often unavailable for a short while
+                print(f'Skipping sample: {exc}', file=sys.stderr)
+                continue
+            self._record()
+
+    def _record(self):
+        # the time of the measurement, samples of an unchanged measurement replace each other
+        timestamp = self._provider.get_usage_timestamp() or time.time()
+        # pods without usage are not scraped yet, a usage of 0 would skew their statistics
+        pods = [pod for pod in self._provider.get_overview().values()
+                if pod.resources['memory'].usage]
+        self._store.append(self._context, timestamp, pods)
+
+
+class KubernetesCargoLoadRecommender:
+    """
+    Recommend requests and limits per workload from the usage sampled periodically.
+    The pods are pooled by their owner and their usage is kept in a quantile sketch per
+    workload, so the memory stays bounded no matter how many pods and samples there are.
+    The provider must group the pods by owner and provide the values of the resource.
+    """
+
+    # recommendations are rounded up to these units
+    _granularities = {'memory': 1024 * 1024, 'cpu': CPU_SCALE // 1000}
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+            self,
+            provider,
+            resource='memory',
+            interval=RECORD_INTERVAL_DEFAULT,
+            duration=None,
+            headroom=RECOMMEND_HEADROOM_DEFAULT):
+        self._provider = provider
+        self._resource = resource
+        self._interval = interval
+        self._duration = duration  # sample until interrupted if None
+        self._headroom = headroom
+        self._sketches = {}  # (namespace, owner) to QuantileSketch
+        self._pods = {}  # of the last sample
+
+    def run(self):
+        """Sample the usage until the duration passed or until interrupted"""
+        self._provider.provide()
+        self._provider.watch()
+        end_time = None if self._duration is None else time.monotonic() + self._duration
         try:
-            number = Decimal(number)  # pylint: disable=redefined-variable-type
-        except InvalidOperation as exc:
-            msg = f'Invalid number format: {number}'
-            raise ValueError(msg) from exc
-
-        if suffix is None:
-            return number
-
-        if suffix.endswith('i'):
-            base = 1024
-        elif len(suffix) == 1:
-            base = 1000
-        else:
-            msg = f'{quantity} has unknown suffix'
-            raise ValueError(msg)
+            self.add_sample(self._provider.get_overview())
+            while end_time is None or time.monotonic() + self._interval <= end_time:
+                time.sleep(self._interval)
+                try:
+                    self._provider.refresh_usage()
+                except (subprocess.CalledProcessError, KubernetesApiError, OSError) as exc:
+                    print(f'Skipping sample: {exc}', file=sys.stderr)
+                    continue
+                self.add_sample(self._provider.get_overview())
+        except KeyboardInterrupt:
+            pass  # regular way to end the sampling
 
-        # handly SI inconsistency
-        if suffix == 'ki':
-            msg = f'{quantity} has unknown suffix'
-            raise ValueError(msg)
+    def add_sample(self, pods):
+        """Add the usage of the pods, pods without usage (not yet scraped) are skipped"""
+        for pod in pods.values():
+            usage = pod.resources[self._resource].usage
+            if usage:
+                workload = (pod.namespace, pod.group)
+                sketch = self._sketches.get(workload)
+                if sketch is None:
+                    sketch = self._sketches[workload] = QuantileSketch()
+                sketch.add(usage)
+        self._pods = pods
 
-        if suffix[0] not in exponents:
-            msg = f'{quantity} has unknown suffix'
-            raise ValueError(msg)
+    def get_recommendations(self):
+        """Return the recommendation by (namespace, owner) of the workloads with samples"""
+        workload_sums = {}  # the current requests and limits
+        for pod in self._pods.values():
+            values = pod.resources[self._resource]
+            sums = workload_sums.get((pod.namespace, pod.group))
+            if sums is None:
+                sums = workload_sums[(pod.namespace, pod.group)] = [0, 0, 0]
+            sums[0] += values.requests
+            sums[1] += values.limits
+            sums[2] += 1
 
-        exponent = Decimal(exponents[suffix[0]])
-        return number * (base ** exponent)
+        recommendations = {}
+        for workload, sketch in self._sketches.items():
+            # workloads which are gone meanwhile are reported without pods and savings
+            requests, limits, pod_count = workload_sums.get(workload, (0, 0, 0))
+            quantile = sketch.get_quantile(RECOMMEND_QUANTILE)
+            recommended_requests = self._add_headroom(quantile)
+            recommendations[workload] = Recommendation(
+                *workload,
+                pod_count=pod_count,
+                samples=sketch.count,
+                requests=requests // pod_count if pod_count else 0,
+                limits=limits // pod_count if pod_count else 0,
+                quantile=quantile,
+                maximum=sketch.maximum,
+                recommended_requests=recommended_requests,
+                recommended_limits=self._add_headroom(sketch.maximum),
+                savings=requests - recommended_requests * pod_count)
+        return recommendations
 
+    def _add_headroom(self, value):
+        granularity = self._granularities.get(self._resource, 1)
+        value = value * (100 + self._headroom) / 100
+        return math.ceil(value / granularity) * granularity
 
-class KubernetesCargoLoadOverviewPrinter:
 
-    _format_pattern = \
-        '{:{w_namespace}} {:{w_name}} {:>{w_requests}} {:>{w_limits}} {:>{w_usage}} {:>{w_ratio}}'
+def _format_prometheus_labels(**labels):
+    """Format the labels of a Prometheus sample, escaping the values"""
+    escaped_labels = (
+        (name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items())
+    return ','.join(f'{name}="{value}"' for name, value in escaped_labels)
 
-    def __init__(self, overview, no_header=False, sort='namespace,name', show_cpu_usage=False):
-        self._overview = overview
-        self._no_header = no_header
-        self._sort = sort
-        self._show_cpu_usage = show_cpu_usage
-        self._column_widths = {}
-        self._pod = None
-        self._sums = {
-            'memory_requests': 0,
-            'memory_limits': 0,
-            'memory_usage': 0,
-            'memory_ratio': 0,
-        }
 
-    def print(self):
-        self._determine_maximum_column_widths()
-        self._print_header()
-        self._print_separator()
-        self._print_pod_data()
-        self._print_separator()
-        self._print_summary()
-
-    def _determine_maximum_column_widths(self):
-        max_namespace = 0
-        max_name = 40
-        for pod in self._overview.values():
-            max_namespace = max(max_namespace, len(pod.namespace))
-            max_name = max(max_name, len(pod.name))
-        # consider column names as well
-        max_namespace = max(max_namespace, len('Namespace'))
-        max_name = max(max_name, len('Name'))
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Answer scrapes of /metrics with the metrics of the exporter of the server"""
 
-        self._column_widths['w_namespace'] = max_namespace
-        self._column_widths['w_name'] = max_name
-        self._column_widths['w_requests'] = 12
-        self._column_widths['w_limits'] = 12
-        self._column_widths['w_usage'] = 12
-        self._column_widths['w_ratio'] = 12
+    def do_GET(self):  # noqa: N802 pylint: disable=invalid-name
+        if urlsplit(self.path).path != '/metrics':
+            self.send_error(404)
+            return
 
-    def _print_header(self):
-        if self._no_header:
+        try:
+            body = self.server.exporter.get_metrics()
+        except (KubernetesApiError, OSError, ValueError, subprocess.CalledProcessError) as exc:
+            self.send_error(503, explain=str(exc))
             return
 
-        print(self._format_pattern.format(
-            'Namespace',
-            'Name',
-            'Requests',
-            'Limits',
-            'Usage',
-            '%',
-            **self._column_widths))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-    def _print_separator(self):
-        if self._no_header:
-            return
+    def log_request(self, code='-', size='-'):
+        pass  # errors are still logged
 
-        print('-' * (sum(self._column_widths.values()) + len(self._column_widths)))
 
-    def _print_pod_data(self):
-        pods_sorted = sorted(self._overview.values(), key=self._get_sort_key_for_pod)
-        for self._pod in pods_sorted:
-            self._sums['memory_requests'] += self._pod.memory_requests
-            if self._pod.memory_limits:  # consider usage for summary only if limit is set
-                self._sums['memory_limits'] += self._pod.memory_limits
-                self._sums['memory_usage'] += self._pod.memory_usage
+class KubernetesCargoLoadExporter:
+    """
+    Serve the requests, limits, usage and usage ratio per pod and namespace as Prometheus
+    metrics. The pods are kept up to date by a watch and their usage is refreshed in the
+    background, the metrics are rendered once per refresh so scrapes only send them.
+    Scrapes and refreshes which happen at the same time share a single refresh.
+    The provider must provide the values of the resources.
+    """
 
-            print(
-                self._format_pattern.format(
-                    self._pod.namespace,
-                    self._pod.name,
-                    self._humanize_bytes(self._pod.memory_requests),
-                    self._humanize_bytes(self._pod.memory_limits),
-                    self._humanize_bytes(self._pod.memory_usage),
-                    self._get_memory_usage_ratio_formatted(),
-                    **self._column_widths))
-
-    def _get_sort_key_for_pod(self, pod):
-        elements = []
-        for sort_key_raw in self._sort.split(','):
-            sort_key = sort_key_raw.strip()
-
-            if sort_key == 'name':
-                elements.append(pod.name)
-            elif sort_key == 'namespace':
-                elements.append(pod.namespace)
-            elif sort_key == 'requests':
-                elements.append(pod.memory_requests)
-            elif sort_key == 'limits':
-                elements.append(pod.memory_limits)
-            elif sort_key == 'usage':
-                elements.append(pod.memory_usage)
-            elif sort_key == 'ratio':
-                ratio = self._get_memory_usage_ratio(pod.memory_limits, pod.memory_usage)
-                elements.append(ratio)
+    _units = {'cpu': 'core', 'memory': 'byte'}
+    _fields = (
+        ('requests', 'Requests'),
+        ('limits', 'Limits'),
+        ('usage', 'Usage'),
+        ('usage_ratio', 'Usage in relation to the limits'),
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+            self,
+            provider,
+            address,
+            interval=SERVE_INTERVAL_DEFAULT,
+            resources=('memory', 'cpu'),
+            output=None):
+        self._provider = provider
+        self._address = address
+        self._interval = interval
+        self._resources = resources
+        self._output = output  # for status messages, defaults to sys.stderr
+        self._watching = False
+        self._metrics = None  # rendered after the latest refresh
+        self._refresh_lock = threading.Lock()
+        self._refresh_future = None  # of the refresh in progress
+        self._refresh_timestamp = None
+        self._refresh_duration = None
+        self._refresh_failures = 0
+
+    def run(self):
+        with self._factor_server(self._address) as server:
+            thread = threading.Thread(
+                target=self._refresh_periodically,
+                name='refresh',
+                daemon=True)
+            thread.start()
+            host, port = server.server_address[:2]
+            print(f'Serving metrics on http://{host}:{port}/metrics',
+                  file=self._output or sys.stderr)
+            server.serve_forever()
+
+    def get_metrics(self):
+        """Return the metrics of the latest refresh, wait for the first refresh if needed"""
+        metrics = self._metrics
+        if metrics is None:
+            metrics = self.refresh()
+        return metrics + self._render_refresh_status()
+
+    def refresh(self):
+        """
+        Refresh the pods and render their metrics. Calls while a refresh is in progress
+        wait for it and get its result instead of starting another one.
+        """
+        with self._refresh_lock:
+            future = self._refresh_future
+            if future is None:
+                future = self._refresh_future = Future()
+                in_progress = False
             else:
-                msg = f'Unsupported sort key: {sort_key}'
-                raise ValueError(msg)
+                in_progress = True
 
-        return tuple(elements)
+        if not in_progress:
+            try:
+                future.set_result(self._refresh())
+            except BaseException as exc:
+                self._refresh_failures += 1
+                future.set_exception(exc)
+            finally:
+                with self._refresh_lock:
+                    self._refresh_future = None
+        return future.result()
 
-    def _humanize_bytes(self, bytes_, precision=1):
-        if self._show_cpu_usage:
-            bytes_ = bytes_ * 1000
-            return f'{bytes_:.0f} m'
+    def _factor_server(self, address):
+        server = ThreadingHTTPServer(address, _MetricsRequestHandler)
+        server.exporter = self
+        return server
 
-        suffixes = ['B', 'Ki', 'Mi', 'Gi', 'Ti']
-        suffix_index = 0
-        while bytes_ >= 1024:
-            suffix_index += 1
-            bytes_ = bytes_ / Decimal(1024)
+    def _refresh_periodically(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as exc:  # noqa: BLE001 pylint: disable=broad-exception-caught
+                # keep serving the previous metrics, the metrics API is often unavailable
+                # for a short while, unexpected errors must not end the refreshes either,
+                # they are counted as failed refreshes
+                print(f'Refreshing failed: {exc!r}', file=self._output or sys.stderr)
+            # spread the refreshes to not query the cluster in lockstep with other exporters
+            jitter = random.uniform(-SERVE_JITTER, SERVE_JITTER)  # noqa: S311
+            time.sleep(self._interval * (1 + jitter))
 
-        bytes_rounded = round(bytes_, precision)
-        return f'{bytes_rounded:.{precision}f} {suffixes[suffix_index]:>2}'
+    def _refresh(self):
+        started = time.perf_counter()
+        if self._watching:
+            self._provider.refresh_usage()
+        else:
+            self._provider.provide()
+            self._provider.watch()
+            self._watching = True
+        self._metrics = self._render(self._provider.get_overview())
+        self._refresh_timestamp = time.time()
+        self._refresh_duration = time.perf_counter() - started
+        return self._metrics
 
-    def _get_memory_usage_ratio_formatted(self, maximum=None, use=None):
-        ratio = self._get_memory_usage_ratio(maximum, use)
-        return f'{ratio:.2f} %'
+    def _render(self, pods):
+        """Render the metrics of the pods and their sums per namespace"""
+        pod_samples, namespace_samples = self._get_samples(pods)
+        lines = []
+        for scope, samples in (('pod', pod_samples), ('namespace', namespace_samples)):
+            for field, description in self._fields:
+                self._render_family(lines, f'kubecargoload_{scope}_{field}',
+                                    f'{description} of the {scope}', field, samples)
 
-    def _get_memory_usage_ratio(self, maximum=None, use=None):
-        if maximum is None:
-            maximum = self._pod.memory_limits
-        if use is None:
-            use = self._pod.memory_usage
+        lines.extend((
+            '# HELP kubecargoload_namespace_pods Number of pods of the namespace',
+            '# TYPE kubecargoload_namespace_pods gauge'))
+        lines.extend(
+            f'kubecargoload_namespace_pods{{{labels}}} {sums["pods"]}'
+            for labels, sums in namespace_samples)
+        usage_timestamp = self._provider.get_usage_timestamp()
+        if usage_timestamp is not None:
+            lines.extend((
+                '# HELP kubecargoload_usage_timestamp_seconds Time the usage was measured',
+                '# TYPE kubecargoload_usage_timestamp_seconds gauge',
+                f'kubecargoload_usage_timestamp_seconds {usage_timestamp}'))
+        lines.append('')
+        return '\n'.join(lines).encode('utf-8')
 
-        ratio = 0 if not maximum else (use * 100) / maximum
-        return ratio
+    def _get_samples(self, pods):
+        """
+        Return the labels and the requests, limits, usage and usage of the containers with
+        limits per resource for each pod and the sums of these per namespace
+        """
+        pod_samples = []
+        namespace_sums = {}
+        for pod in pods.values():
+            sums = namespace_sums.get(pod.namespace)
+            if sums is None:
+                sums = namespace_sums[pod.namespace] = {
+                    resource: [0, 0, 0, 0] for resource in self._resources}
+                sums['pods'] = 0
+            sums['pods'] += 1
+            pod_values = {}
+            for resource in self._resources:
+                values = pod.resources.get(resource, _NO_VALUES)
+                pod_values[resource] = (*values, values.usage if values.limits else 0)
+                resource_sums = sums[resource]
+                for index, value in enumerate(pod_values[resource]):
+                    resource_sums[index] += value
+            labels = _format_prometheus_labels(namespace=pod.namespace, pod=pod.name)
+            pod_samples.append((labels, pod_values))
 
-    def _print_summary(self):
-        print(self._format_pattern.format(
-            'Summary',
-            '(PODs without configured limits ignored)',
-            self._humanize_bytes(self._sums['memory_requests']),
-            self._humanize_bytes(self._sums['memory_limits']),
-            self._humanize_bytes(self._sums['memory_usage']),
-            self._get_memory_usage_ratio_formatted(
-                self._sums['memory_limits'],
-                self._sums['memory_usage']),
-            **self._column_widths))
+        namespace_samples = [
+            (_format_prometheus_labels(namespace=namespace), sums)
+            for namespace, sums in sorted(namespace_sums.items())]
+        return pod_samples, namespace_samples
+
+    def _render_family(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+            self, lines, name, description, field, samples):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} gauge')
+        for resource in self._resources:
+            unit = self._units.get(resource, 'integer')
+            # in cores like Prometheus expects base units, ratios are not scaled
+            scale = CPU_SCALE if resource == 'cpu' and field != 'usage_ratio' else 1
+            for labels, values in samples:
+                value = self._get_sample_value(field, *values[resource])
+                if value is not None:
+                    lines.append(
+                        f'{name}{{{labels},resource="{resource}",unit="{unit}"}} '
+                        f'{value / scale if scale != 1 else value}')
+
+    def _get_sample_value(  # pylint: disable=no-self-use,too-many-arguments
+            self, field, requests, limits, usage, limited_usage):
+        if field == 'usage_ratio':
+            # only the usage of the containers with limits counts
+            return limited_usage / limits if limits else None
+        if field == 'usage':
+            return usage
+        # unset requests and limits are left out like kube-state-metrics does
+        value = requests if field == 'requests' else limits
+        return value or None
+
+    def _render_refresh_status(self):
+        lines = [
+            '# HELP kubecargoload_refresh_failures_total Number of failed refreshes',
+            '# TYPE kubecargoload_refresh_failures_total counter',
+            f'kubecargoload_refresh_failures_total {self._refresh_failures}',
+        ]
+        if self._refresh_timestamp is not None:
+            lines.extend((
+                '# HELP kubecargoload_refresh_timestamp_seconds Time of the latest refresh',
+                '# TYPE kubecargoload_refresh_timestamp_seconds gauge',
+                f'kubecargoload_refresh_timestamp_seconds {self._refresh_timestamp}',
+                # the metrics are stale if this grows beyond the interval
+                '# HELP kubecargoload_refresh_age_seconds Time since the latest refresh',
+                '# TYPE kubecargoload_refresh_age_seconds gauge',
+                f'kubecargoload_refresh_age_seconds {time.time() - self._refresh_timestamp}',
+                '# HELP kubecargoload_refresh_duration_seconds Duration of the latest refresh',
+                '# TYPE kubecargoload_refresh_duration_seconds gauge',
+                f'kubecargoload_refresh_duration_seconds {self._refresh_duration}'))
+        lines.append('')
+        return '\n'.join(lines).encode('utf-8')
 
 
 def _setup_options():
     argument_parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
     namespace_group = argument_parser.add_mutually_exclusive_group()
+    resource_group = argument_parser.add_mutually_exclusive_group()
+    sampling_group = argument_parser.add_mutually_exclusive_group()
 
     namespace_group.add_argument(
         '-A',
@@ -392,6 +3777,20 @@ def _setup_options():
         default=False)
 
     argument_parser.add_argument(
+        '--all-contexts',
+        dest='all_contexts',
+        action='store_true',
+        help='list the pods of all contexts in the kubeconfig',
+        default=False)
+
+    argument_parser.add_argument(
+        '--backend',
+        dest='backend',
+        choices=(BACKEND_KUBECTL, BACKEND_API),
+        help='fetch the data by running kubectl or by querying the Kubernetes API directly',
+        default=BACKEND_KUBECTL)
+
+    resource_group.add_argument(
         '-c',
         '--cpu',
         dest='show_cpu_usage',
@@ -399,10 +3798,40 @@ def _setup_options():
         help='show cpu instead of memory',
         default=False)
 
+    argument_parser.add_argument(
+        '--cache-ttl',
+        dest='cache_ttl',
+        type=float,
+        help='seconds to use cached pod requests and limits before they are revalidated',
+        default=CACHE_TTL_DEFAULT)
+
+    argument_parser.add_argument(
+        '--chunk-size',
+        dest='chunk_size',
+        type=_parse_non_negative_int,
+        help='list pods in pages of this size, 0 to request all pods at once',
+        default=CHUNK_SIZE_DEFAULT)
+
+    argument_parser.add_argument(
+        '--compact',
+        dest='compact',
+        action='store_true',
+        help='let kubectl output only the required pod fields instead of the full JSON',
+        default=False)
+
+    argument_parser.add_argument(
+        '--containers',
+        dest='containers',
+        action='store_true',
+        help='show a row per container with its own requests, limits and usage, '
+             'named <pod>/<container>',
+        default=False)
+
     argument_parser.add_argument(
         '--context',
         dest='context',
-        help='the name of the kubeconfig context to use')
+        help='the name of the kubeconfig context to use, '
+             'to use multiple contexts seperate them with comma')
 
     argument_parser.add_argument(
         '-d',
@@ -419,6 +3848,36 @@ def _setup_options():
         help='namespace to use',
         default='default')
 
+    argument_parser.add_argument(
+        '--duration',
+        dest='duration',
+        type=_parse_duration,
+        help='time to sample the usage in recommend mode, e.g. 30m or 12h')
+
+    argument_parser.add_argument(
+        '--nodes',
+        dest='nodes',
+        action='store_true',
+        help='show the requests and limits of the pods and the usage of each node against its '
+             'allocatable, the pods of all namespaces are considered. '
+             'Valid sort options: name,pods,allocatable,requests,limits,usage,headroom '
+             f'(default: {NODE_SORT_DEFAULT})',
+        default=False)
+
+    argument_parser.add_argument(
+        '--no-cache',
+        dest='no_cache',
+        action='store_true',
+        help='do not use or update the cache of pod requests and limits',
+        default=False)
+
+    argument_parser.add_argument(
+        '--headroom',
+        dest='headroom',
+        type=float,
+        help='percent to add to the recommended requests and limits',
+        default=RECOMMEND_HEADROOM_DEFAULT)
+
     argument_parser.add_argument(
         '-H',
         '--no-headers',
@@ -427,13 +3886,140 @@ def _setup_options():
         help='do not print header line before the output',
         default=False)
 
+    argument_parser.add_argument(
+        '--listen',
+        dest='listen',
+        type=_parse_address,
+        help='host and port to serve the metrics on in serve mode',
+        default=SERVE_ADDRESS_DEFAULT)
+
+    argument_parser.add_argument(
+        '--parallel',
+        dest='parallel',
+        type=_parse_positive_int,
+        help='number of contexts to fetch in parallel',
+        default=PARALLEL_CONTEXTS_DEFAULT)
+
+    sampling_group.add_argument(
+        '--query',
+        dest='query',
+        action='store_true',
+        help='report the minimum, average, 95th percentile and maximum usage per pod recorded '
+             'in the usage store within --since. '
+             'Valid sort options: namespace,name,requests,limits,samples,min,avg,p95,max',
+        default=False)
+
+    sampling_group.add_argument(
+        '--record',
+        dest='record',
+        action='store_true',
+        help='sample the usage of the pods every --interval seconds into the usage store, '
+             'the requests and limits are updated only when they change',
+        default=False)
+
+    sampling_group.add_argument(
+        '--recommend',
+        dest='recommend',
+        action='store_true',
+        help='sample the usage every --interval seconds for --duration or until interrupted '
+             'and recommend requests and limits per owner (e.g. Deployment) from the '
+             f'{RECOMMEND_QUANTILE * 100:.0f}th percentile and the maximum of the usage, '
+             'with the savings of the requests. '
+             'Valid sort options: namespace,name,pods,samples,requests,limits,savings',
+        default=False)
+
+    sampling_group.add_argument(
+        '--serve',
+        dest='serve',
+        action='store_true',
+        help='serve the requests, limits, usage and usage ratio per pod and namespace as '
+             'Prometheus metrics on http://<--listen>/metrics, the usage is refreshed '
+             'every --interval seconds in the background',
+        default=False)
+
+    argument_parser.add_argument(
+        '--request-timeout',
+        dest='request_timeout',
+        type=int,
+        help='seconds to wait for each request to the Kubernetes API server of a context, '
+             '0 to wait forever',
+        default=KUBERNETES_API_TIMEOUT)
+
+    argument_parser.add_argument(
+        '-o',
+        '--output',
+        dest='output',
+        choices=(OUTPUT_TABLE, OUTPUT_JSON, OUTPUT_NDJSON, OUTPUT_CSV),
+        help='print a table or write the pods as they are fetched with their raw values '
+             '(bytes and millicores)',
+        default=OUTPUT_TABLE)
+
+    resource_group.add_argument(
+        '--resources',
+        dest='resources',
+        help='show these resources side by side, seperated with comma, '
+             'e.g. cpu,memory,ephemeral-storage,nvidia.com/gpu')
+
+    argument_parser.add_argument(
+        '--since',
+        dest='since',
+        type=_parse_duration,
+        help='time window to query, e.g. 30m, 12h, 7d or 2w',
+        default=QUERY_SINCE_DEFAULT)
+
     argument_parser.add_argument(
         '-s',
         '--sort',
         dest='sort',
         help='sort by column(s), to sort by multiple columns seperate them with comma. '
-             'Valid options: namespace,name,requests,limits,usage,ratio',
-        default='namespace,name')
+             'Valid options: context,namespace,name,requests,limits,usage,ratio, '
+             'append :desc to sort in descending order',
+        default=SORT_DEFAULT)
+
+    argument_parser.add_argument(
+        '--store',
+        dest='store',
+        help='file of the usage store to record to and query',
+        default=USAGE_STORE_FILENAME)
+
+    argument_parser.add_argument(
+        '--timings',
+        dest='timings',
+        nargs='?',
+        const='-',
+        metavar='FILE',
+        help='report the time spent per phase, the size of the kubectl output and the peak '
+             'memory to stderr or as JSON to FILE')
+
+    argument_parser.add_argument(
+        '--top',
+        dest='top',
+        type=_parse_non_negative_int,
+        help='show only the first TOP pods in sort order, the summary still covers all pods')
+
+    argument_parser.add_argument(
+        '--group-by',
+        dest='group_by',
+        type=_parse_group_by,
+        help='print the sums per namespace, owner (e.g. Deployment), node or label, '
+             'use label=<key> to group by the values of a label')
+
+    argument_parser.add_argument(
+        '--interval',
+        dest='interval',
+        type=float,
+        help='seconds between refreshes of the usage in watch and serve mode or between '
+             f'samples in record and recommend mode (watch mode: {WATCH_INTERVAL_DEFAULT}, '
+             f'serve mode: {SERVE_INTERVAL_DEFAULT}, '
+             f'record and recommend mode: {RECORD_INTERVAL_DEFAULT})')
+
+    argument_parser.add_argument(
+        '-w',
+        '--watch',
+        dest='watch',
+        action='store_true',
+        help='keep the overview open and update it continuously',
+        default=False)
 
     argument_parser.add_argument(
         '-V',
@@ -446,33 +4032,354 @@ def _setup_options():
     return argument_parser.parse_args()
 
 
+def _parse_non_negative_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        msg = f'invalid non-negative number: {value!r}'
+        raise ArgumentTypeError(msg)
+    return number
+
+
+def _parse_positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        msg = f'invalid positive number: {value!r}'
+        raise ArgumentTypeError(msg)
+    return number
+
+
+def _parse_group_by(value):
+    if value in (GROUP_BY_NAMESPACE, GROUP_BY_OWNER, GROUP_BY_NODE):
+        return value
+    if value.startswith(GROUP_BY_LABEL_PREFIX) and len(value) > len(GROUP_BY_LABEL_PREFIX):
+        return value
+
+    msg = f'invalid group: {value!r}, use namespace, owner, node or label=<key>'
+    raise ArgumentTypeError(msg)
+
+
+def _parse_duration(value):
+    """Parse a duration like 90s, 30m, 12h, 7d or 2w into seconds"""
+    units = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60, 'w': 7 * 24 * 60 * 60}
+    try:
+        return float(value[:-1]) * units[value[-1:]]
+    except (KeyError, ValueError):
+        msg = f'invalid duration: {value!r}'
+        raise ArgumentTypeError(msg) from None
+
+
+def _parse_address(value):
+    """Parse a host:port address, an empty host listens on all interfaces"""
+    host, separator, port = value.rpartition(':')
+    try:
+        if not separator:
+            raise ValueError
+        return host, int(port)
+    except ValueError:
+        msg = f'invalid address: {value!r}'
+        raise ArgumentTypeError(msg) from None
+
+
+def _get_contexts(options):
+    if options.all_contexts:
+        return get_kubeconfig_contexts()
+    if options.context:
+        return options.context.split(',')
+    return [None]  # current context
+
+
+def _get_resources(options):
+    if not options.resources:
+        return None
+    return tuple(resource.strip() for resource in options.resources.split(','))
+
+
+def _factor_overview_provider(options, timings=None):
+    # the pods of all namespaces count for the nodes
+    namespace = None if options.all_namespaces or options.nodes else options.namespace
+    resources = _get_resources(options)
+
+    # watch mode keeps the pods up to date itself, the cache holds only a single resource,
+    # the node of a pod is not part of its metadata to revalidate the cached pods by
+    node_group = options.group_by == GROUP_BY_NODE
+    cachable = not (options.watch or resources or options.nodes or options.containers or node_group)
+    cache = None
+    if cachable and not options.no_cache:
+        cache = PodSpecCache(CACHE_DIRECTORY, options.cache_ttl)
+
+    provider_factory = functools.partial(
+        KubernetesCargoLoadOverviewProvider,
+        namespace,
+        show_cpu_usage=options.show_cpu_usage,
+        compact=options.compact,
+        backend=options.backend,
+        chunk_size=options.chunk_size,
+        cache=cache,
+        request_timeout=options.request_timeout,
+        resources=resources,
+        group_by=options.group_by,
+        timings=timings,
+        nodes=options.nodes,
+        containers=options.containers)
+
+    if options.nodes and (
+            options.watch or resources or options.group_by or options.output != OUTPUT_TABLE):
+        msg = f'Node mode supports neither watch mode, --resources, --group-by ' \
+              f'nor other outputs than {OUTPUT_TABLE}'
+        raise ValueError(msg)
+
+    if options.containers and (options.watch or options.nodes):
+        msg = 'Watch and node mode do not support --containers'
+        raise ValueError(msg)
+
+    # the other outputs write the pods while they are listed, so they can be neither sorted
+    # nor summed up per group
+    sorted_output = options.top is not None or options.sort != SORT_DEFAULT
+    if options.output != OUTPUT_TABLE and (options.watch or sorted_output or options.group_by):
+        msg = f'Watch mode, --group-by, --sort and --top support only the {OUTPUT_TABLE} output'
+        raise ValueError(msg)
+
+    contexts = _get_contexts(options)
+    if options.all_contexts or len(contexts) > 1:
+        if options.watch or options.nodes:
+            msg = 'Watch and node mode support only a single context'
+            raise ValueError(msg)
+        return KubernetesCargoLoadMultiContextOverviewProvider(
+            contexts,
+            provider_factory,
+            options.parallel)
+
+    return provider_factory(context=contexts[0])
+
+
+def _print_overview(overview_provider, options, show_context, timings=None):
+    printer_factory = functools.partial(
+        KubernetesCargoLoadOverviewPrinter,
+        no_header=options.no_header,
+        sort=options.sort,
+        show_cpu_usage=options.show_cpu_usage,
+        show_context=show_context,
+        resources=_get_resources(options),
+        group_by=options.group_by,
+        top=options.top,
+        timings=timings,
+        containers=options.containers)
+
+    if options.watch:
+        watcher = KubernetesCargoLoadOverviewWatcher(
+            overview_provider,
+            printer_factory,
+            options.interval or WATCH_INTERVAL_DEFAULT)
+        watcher.run()
+    else:
+        overview = overview_provider.provide()
+        printer = printer_factory(overview)
+        printer.print()
+
+
+def _show_overview(overview_provider, options, timings=None):
+    show_context = isinstance(
+        overview_provider,
+        KubernetesCargoLoadMultiContextOverviewProvider)
+
+    if options.nodes:
+        _print_node_overview(overview_provider, options, timings)
+    elif options.output != OUTPUT_TABLE:
+        _write_overview(overview_provider, options, show_context, timings)
+    else:
+        _print_overview(overview_provider, options, show_context, timings)
+
+
+def _print_node_overview(overview_provider, options, timings=None):
+    sort = NODE_SORT_DEFAULT if options.sort == SORT_DEFAULT else options.sort
+    printer = KubernetesCargoLoadNodeOverviewPrinter(
+        overview_provider.provide_nodes(),
+        no_header=options.no_header,
+        sort=sort,
+        show_cpu_usage=options.show_cpu_usage,
+        top=options.top,
+        timings=timings)
+    printer.print()
+
+
+def _write_overview(overview_provider, options, show_context, timings=None):
+    if show_context:
+        pods = overview_provider.provide().values()
+    else:
+        pods = overview_provider.iter_pods()  # write the pods while they are listed
+
+    writer = OUTPUT_WRITERS[options.output](
+        pods,
+        show_cpu_usage=options.show_cpu_usage,
+        show_context=show_context,
+        resources=_get_resources(options),
+        show_group=options.group_by not in (None, GROUP_BY_NAMESPACE))
+    # fetching the pods while they are written is timed separately
+    with _time_phase(timings, 'write output'):
+        writer.write()
+
+
+def _get_sampling_context(options):
+    unsupported_options = (
+        options.watch, options.nodes, options.resources, options.group_by, options.containers)
+    if any(unsupported_options) or options.output != OUTPUT_TABLE:
+        msg = f'Record, query, recommend and serve mode support neither watch or node mode, ' \
+              f'--resources, --group-by, --containers nor other outputs than {OUTPUT_TABLE}'
+        raise ValueError(msg)
+    contexts = _get_contexts(options)
+    if options.all_contexts or len(contexts) > 1:
+        msg = 'Record, query, recommend and serve mode support only a single context'
+        raise ValueError(msg)
+    return contexts[0]
+
+
+def _sample_usage(options, timings=None):
+    if options.recommend:
+        _recommend(options, timings)
+    elif options.serve:
+        _serve(options, timings)
+    else:
+        _use_usage_store(options, timings)
+
+
+def _use_usage_store(options, timings=None):
+    # samples are stored by the name of the context to not mix them up when it is switched
+    context = _get_sampling_context(options) or get_kubeconfig_current_context()
+    namespace = None if options.all_namespaces else options.namespace
+    with UsageStore(options.store) as store:
+        if options.record:
+            _record_usage(store, context, namespace, options, timings)
+        else:
+            _query_usage(store, context, namespace, options, timings)
+
+
+def _record_usage(store, context, namespace, options, timings=None):
+    provider = KubernetesCargoLoadOverviewProvider(
+        namespace,
+        context=context,
+        compact=options.compact,
+        backend=options.backend,
+        chunk_size=options.chunk_size,
+        request_timeout=options.request_timeout,
+        resources=('memory', 'cpu'),
+        timings=timings)
+    recorder = KubernetesCargoLoadUsageRecorder(
+        provider,
+        store,
+        context,
+        options.interval or RECORD_INTERVAL_DEFAULT)
+    recorder.run()
+
+
+def _query_usage(store, context, namespace, options, timings=None):
+    resource = 'cpu' if options.show_cpu_usage else 'memory'
+    with _time_phase(timings, 'query store'):
+        statistics = store.query(context, namespace, time.time() - options.since, resource)
+    printer = KubernetesCargoLoadUsageStatisticsPrinter(
+        statistics,
+        no_header=options.no_header,
+        sort=options.sort,
+        show_cpu_usage=options.show_cpu_usage,
+        top=options.top,
+        timings=timings)
+    printer.print()
+
+
+def _recommend(options, timings=None):
+    resource = 'cpu' if options.show_cpu_usage else 'memory'
+    provider = KubernetesCargoLoadOverviewProvider(
+        None if options.all_namespaces else options.namespace,
+        context=_get_sampling_context(options),
+        compact=options.compact,
+        backend=options.backend,
+        chunk_size=options.chunk_size,
+        request_timeout=options.request_timeout,
+        resources=(resource,),
+        group_by=GROUP_BY_OWNER,
+        timings=timings)
+    recommender = KubernetesCargoLoadRecommender(
+        provider,
+        resource,
+        options.interval or RECORD_INTERVAL_DEFAULT,
+        options.duration,
+        options.headroom)
+    recommender.run()
+    printer = KubernetesCargoLoadRecommendationPrinter(
+        recommender.get_recommendations(),
+        no_header=options.no_header,
+        sort=options.sort,
+        show_cpu_usage=options.show_cpu_usage,
+        top=options.top,
+        timings=timings)
+    printer.print()
+
+
+def _serve(options, timings=None):
+    provider = KubernetesCargoLoadOverviewProvider(
+        None if options.all_namespaces else options.namespace,
+        context=_get_sampling_context(options),
+        compact=options.compact,
+        backend=options.backend,
+        chunk_size=options.chunk_size,
+        request_timeout=options.request_timeout,
+        resources=('memory', 'cpu'),
+        timings=timings)
+    exporter = KubernetesCargoLoadExporter(
+        provider,
+        options.listen,
+        options.interval or SERVE_INTERVAL_DEFAULT)
+    exporter.run()
+
+
+def _report_timings(timings, options):
+    if options.timings == '-':
+        timings.print_report()
+    else:
+        timings.write_report(options.timings)
+
+
 def main():
     options = _setup_options()
     if options.version:
         print(f'{basename(__file__)} {VERSION}')
         sys.exit(0)
 
-    namespace = None if options.all_namespaces else options.namespace
-
+    overview_provider = None
+    timings = Timings() if options.timings else None
     try:
-        overview_provider = KubernetesCargoLoadOverviewProvider(
-            namespace,
-            options.context,
-            options.show_cpu_usage)
-        overview = overview_provider.provide()
-
-        printer = KubernetesCargoLoadOverviewPrinter(
-            overview,
-            options.no_header,
-            options.sort,
-            options.show_cpu_usage)
-        printer.print()
+        if options.record or options.query or options.recommend or options.serve:
+            _sample_usage(options, timings)
+        else:
+            overview_provider = _factor_overview_provider(options, timings)
+            _show_overview(overview_provider, options, timings)
+    except KeyboardInterrupt:
+        pass  # regular way to end watch mode
+    except BrokenPipeError:
+        # the output is read by another process which exited, e.g. head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
     except Exception as exc:  # pylint: disable=broad-except
         if options.debug:
             raise
 
         print(exc, file=sys.stderr)
         sys.exit(1)
+    finally:
+        if timings is not None:
+            _report_timings(timings, options)
+
+    # report contexts which could not be fetched after the others have been printed
+    context_errors = getattr(overview_provider, 'errors', None)
+    if context_errors:
+        for context, exc in sorted(context_errors.items()):
+            print(f'{context}: {exc}', file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -43,6 +43,7 @@ setup(
     },
     keywords='kubernetes pod memory usage',
     include_package_data=True,
+    python_requires='>=3.9',
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Intended Audience :: Developers',
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import join
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+import json
+import sys
+import threading
+import unittest
+
+from ddt import data, ddt, unpack
+
+from kubecargoload import (
+    _get_pods_fingerprint,
+    BACKEND_API,
+    KubernetesApiClient,
+    KubernetesApiError,
+    KubernetesCargoLoadOverviewProvider,
+)
+from kubecargoload import main as kubecargoload_main
+
+
+class StubKubernetesApiRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    routes = {
+        '/api/v1/pods': 'pods.json',
+        '/api/v1/namespaces/default/pods': 'pods_default.json',
+        '/apis/metrics.k8s.io/v1beta1/pods': 'pods_metrics.json',
+        '/apis/metrics.k8s.io/v1beta1/namespaces/default/pods': 'pods_metrics.json',
+        '/api/v1/nodes': 'nodes.json',
+        '/apis/metrics.k8s.io/v1beta1/nodes': 'nodes_metrics.json',
+    }
+
+    def do_GET(self):  # noqa: N802 pylint: disable=invalid-name
+        self.server.requests.append((self.path, self.headers.get('Authorization')))
+        self.server.accept_headers.append(self.headers.get('Accept'))
+        url = urlsplit(self.path)
+        filename = self.routes.get(url.path)
+        if filename is None:
+            self.send_error(404)
+            return
+
+        with open(join('tests/test_data', filename), 'rb') as file_h:
+            body = file_h.read()
+        query = parse_qs(url.query)
+        if 'limit' in query:
+            body = self._paginate(body, int(query['limit'][0]), int(query.get('continue', [0])[0]))
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _paginate(self, body, limit, start):  # pylint: disable=no-self-use
+        # like the API server, metadata is sent before the items
+        items = json.loads(body)['items']
+        metadata = {'resourceVersion': '1'}
+        if start + limit < len(items):
+            metadata['continue'] = str(start + limit)
+        page = {'kind': 'PodList', 'metadata': metadata, 'items': items[start:start + limit]}
+        return json.dumps(page).encode('utf-8')
+
+    def setup(self):
+        super().setup()
+        self.server.connection_count += 1
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass  # keep test output clean
+
+
+class StubKubernetesApiServer(ThreadingHTTPServer):
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubKubernetesApiRequestHandler)
+        self.requests = []
+        self.accept_headers = []
+        self.connection_count = 0
+
+
+@ddt
+class ApiBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.maxDiff = None  # pylint: disable=invalid-name
+        self._server = StubKubernetesApiServer()
+        self._server_thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={'poll_interval': 0.01})
+        self._server_thread.start()
+        host, port = self._server.server_address
+        self._kubeconfig = {
+            'clusters': [{'name': 'stub', 'cluster': {'server': f'http://{host}:{port}'}}],
+            'users': [{'name': 'stub', 'user': {'token': 'secret-token'}}],
+        }
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._server_thread.join()
+        super().tearDown()
+
+    @data(
+        ('output_cpu', ['--cpu', '--all-namespaces', '--chunk-size', '0']),
+        ('output_memory', ['--all-namespaces', '--chunk-size', '0']),
+    )
+    @unpack
+    def test_api_backend_full_output(self, output_name, argv):
+        expected_output = self._read_file_contents(output_name)
+        # test
+        argv = ['kubecargoload.py', '--backend', 'api', '--no-cache'] + argv
+        with mock.patch.object(sys, 'argv', argv), \
+                mock.patch.object(KubernetesApiClient, '_load_kubeconfig',
+                                  return_value=self._kubeconfig):
+            kubecargoload_main()
+        # check
+        output = sys.stdout.getvalue()  # pylint: disable=no-member
+        self.assertEqual(output, expected_output)
+        expected_requests = [
+            ('/apis/metrics.k8s.io/v1beta1/pods', 'Bearer secret-token'),
+            ('/api/v1/pods', 'Bearer secret-token'),
+        ]
+        self.assertEqual(self._server.requests, expected_requests)
+        self.assertEqual(self._server.connection_count, 1)
+
+    @data(
+        ('output_memory', ['--all-namespaces', '--chunk-size', '5']),
+        ('output_memory_default', ['--namespace', 'default', '--chunk-size', '5']),
+    )
+    @unpack
+    def test_api_backend_paged_full_output(self, output_name, argv):
+        expected_output = self._read_file_contents(output_name)
+        # test
+        argv = ['kubecargoload.py', '--backend', 'api', '--no-cache'] + argv
+        with mock.patch.object(sys, 'argv', argv), \
+                mock.patch.object(KubernetesApiClient, '_load_kubeconfig',
+                                  return_value=self._kubeconfig):
+            kubecargoload_main()
+        # check
+        output = sys.stdout.getvalue()  # pylint: disable=no-member
+        self.assertEqual(output, expected_output)
+        self.assertEqual(self._server.connection_count, 1)
+
+    def test_api_backend_nodes_full_output(self):
+        expected_output = self._read_file_contents('output_nodes')
+        # test
+        argv = ['kubecargoload.py', '--backend', 'api', '--nodes', '--chunk-size', '0']
+        with mock.patch.object(sys, 'argv', argv), \
+                mock.patch.object(KubernetesApiClient, '_load_kubeconfig',
+                                  return_value=self._kubeconfig):
+            kubecargoload_main()
+        # check, the nodes are fetched over a second connection while the pods are listed
+        output = sys.stdout.getvalue()  # pylint: disable=no-member
+        self.assertEqual(output, expected_output)
+        requested_paths = sorted(path for path, _ in self._server.requests)
+        expected_paths = ['/api/v1/nodes', '/api/v1/pods', '/apis/metrics.k8s.io/v1beta1/nodes']
+        self.assertEqual(requested_paths, expected_paths)
+        self.assertEqual(self._server.connection_count, 2)
+
+    def test_api_backend_paged_requests(self):
+        argv = ['kubecargoload.py', '--backend', 'api', '--no-cache', '--all-namespaces',
+                '--chunk-size', '8']
+        # test
+        with mock.patch.object(sys, 'argv', argv), \
+                mock.patch.object(KubernetesApiClient, '_load_kubeconfig',
+                                  return_value=self._kubeconfig):
+            kubecargoload_main()
+        # check, pods.json contains 17 pods
+        requested_paths = [path for path, _ in self._server.requests]
+        expected_paths = [
+            '/apis/metrics.k8s.io/v1beta1/pods',
+            '/api/v1/pods?limit=8',
+            '/api/v1/pods?limit=8&continue=8',
+            '/api/v1/pods?limit=8&continue=16',
+        ]
+        self.assertEqual(requested_paths, expected_paths)
+
+    def _read_file_contents(self, filename):  # pylint: disable=no-self-use
+        path = join('tests/test_data', filename)
+        with open(path, encoding='utf-8') as file_h:
+            return file_h.read()
+
+    def test_api_backend_pods_fingerprint(self):
+        provider = KubernetesCargoLoadOverviewProvider(
+            namespace='default',
+            context=None,
+            backend=BACKEND_API)
+        pod_versions = [
+            f'{pod["metadata"]["uid"]} '
+            for pod in json.loads(self._read_file_contents('pods_default.json'))['items']]
+        # test
+        with mock.patch.object(KubernetesApiClient, '_load_kubeconfig',
+                               return_value=self._kubeconfig):
+            result = provider._fetch_pods_fingerprint()  # pylint: disable=protected-access
+        # check, only the metadata of the pods is requested
+        self.assertEqual(result, _get_pods_fingerprint(pod_versions))
+        self.assertTrue(self._server.accept_headers[0].startswith(
+            'application/json;as=PartialObjectMetadataList;'))
+
+    def test_api_client_error_status(self):
+        with mock.patch.object(KubernetesApiClient, '_load_kubeconfig',
+                               return_value=self._kubeconfig):
+            with KubernetesApiClient() as api_client:
+                with self.assertRaises(KubernetesApiError):
+                    api_client.get('/api/v1/namespaces/missing/pods')
+
+    def test_api_client_unsupported_auth_plugin(self):
+        self._kubeconfig['users'][0]['user'] = {'exec': {'command': 'aws'}}
+        with mock.patch.object(KubernetesApiClient, '_load_kubeconfig',
+                               return_value=self._kubeconfig):
+            with KubernetesApiClient() as api_client:
+                with self.assertRaises(KubernetesApiError):
+                    api_client.get('/api/v1/pods')
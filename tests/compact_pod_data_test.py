@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+import unittest
+
+from ddt import data, ddt
+
+from kubecargoload import KubernetesCargoLoadOverviewProvider
+
+
+# pylint: disable=protected-access
+
+
+@ddt
+class CompactPodDataTest(unittest.TestCase):
+
+    def _factor_provider(self, show_cpu_usage):  # pylint: disable=no-self-use
+        return KubernetesCargoLoadOverviewProvider(
+            namespace=None,
+            context=None,
+            show_cpu_usage=show_cpu_usage)
+
+    def _read_file_contents(self, filename):  # pylint: disable=no-self-use
+        with open(f'tests/test_data/{filename}', encoding='utf-8') as file_h:
+            return file_h.read()
+
+    @data(False, True)
+    def test_compact_pod_data_equals_json_pod_data(self, show_cpu_usage):
+        compact_filename = 'pods_cpu.compact' if show_cpu_usage else 'pods_memory.compact'
+        json_provider = self._factor_provider(show_cpu_usage)
+        compact_provider = self._factor_provider(show_cpu_usage)
+        # test
+        json_provider._fetch_pod_data(self._read_file_contents('pods.json'))
+        compact_provider._fetch_pod_data_compact(self._read_file_contents(compact_filename))
+        # check
+        self.assertEqual(len(compact_provider._pods), 14)
+        self.assertEqual(compact_provider._pods, json_provider._pods)
+        self.assertEqual(list(compact_provider._pods), list(json_provider._pods))
+
+    def test_compact_pod_data_chunked(self):
+        provider = self._factor_provider(show_cpu_usage=True)
+        content = self._read_file_contents('pods_cpu.compact')
+        chunks = [content[index:index + 5] for index in range(0, len(content), 5)]
+        # test
+        provider._fetch_pod_data_compact(chunks)
+        # check
+        pod = provider._pods[('kube-system', 'kindnet-ptgnz')]
+        self.assertEqual(pod.memory_requests, pod.memory_limits)
+        self.assertEqual(pod.memory_limits, 100000000)  # nanocores
+
+    def test_parse_compact_pod_line(self):
+        provider = self._factor_provider(show_cpu_usage=False)
+        line = 'kube-system\tjob-pod\tuid\t2\tjob-name-1\tReplicaSet Job\t10Mi,;,1Gi;'
+        # test
+        result = provider._parse_compact_pod_line(line)
+        # check
+        expected_result = {
+            'metadata': {
+                'namespace': 'kube-system',
+                'name': 'job-pod',
+                'uid': 'uid',
+                'generation': '2',
+                'labels': {'job-name': 'job-name-1'},
+                'ownerReferences': [{'kind': 'ReplicaSet'}, {'kind': 'Job'}],
+            },
+            'spec': {
+                'containers': [
+                    {'resources': {'requests': {'memory': '10Mi'}, 'limits': {}}},
+                    {'resources': {'requests': {}, 'limits': {'memory': '1Gi'}}},
+                ],
+            },
+        }
+        self.assertEqual(result, expected_result)
@@ -6,6 +6,7 @@
 from os.path import join
 from unittest import mock
 import sys
+import tempfile
 import unittest
 
 from ddt import data, ddt, unpack
@@ -18,19 +19,38 @@ from kubecargoload import main as kubecargoload_main
 
 
 TEST_VARIATIONS = (
-    # output name, sys.argv, pods.json, pods.top
-    ('output_cpu', ['--cpu', '--all-namespaces'], 'pods.json', 'pods.top'),
-    ('output_cpu_default', ['--cpu', '--namespace', 'default'], 'pods_default.json', 'pods_default.top'),
-    ('output_cpu_default_no_header', ['--cpu', '--no-headers', '--namespace', 'default'], 'pods_default.json', 'pods_default.top'),
-    ('output_cpu_no_header', ['--cpu', '--no-headers'], 'pods.json', 'pods.top'),
-    ('output_memory', ['--all-namespaces'], 'pods.json', 'pods.top'),
-    ('output_memory_default', ['--namespace', 'default'], 'pods_default.json', 'pods_default.top'),
-    ('output_memory_default_no_header', ['--no-headers', '--namespace', 'default'], 'pods_default.json', 'pods_default.top'),
-    ('output_memory_default_no_header_sort_by_requests_limits', ['--no-headers', '--namespace', 'default', '--sort', 'requests,limits'], 'pods_default.json', 'pods_default.top'),
-    ('output_memory_default_sort_by_requests_limits', ['--namespace', 'default', '--sort', 'requests,limits'], 'pods_default.json', 'pods_default.top'),
-    ('output_memory_no_header', ['--all-namespaces', '--no-headers'], 'pods.json', 'pods.top'),
-    ('output_memory_no_header_sort_by_requests_limits', ['--all-namespaces', '--no-headers', '--sort', 'requests,limits'], 'pods.json', 'pods.top'),
-    ('output_memory_sort_by_requests_limits', ['--all-namespaces', '--sort', 'requests,limits'], 'pods.json', 'pods.top'),
+    # output name, sys.argv, pods.json, pod metrics
+    ('output_cpu', ['--cpu', '--all-namespaces'], 'pods.json', 'pods_metrics.json'),
+    ('output_cpu_default', ['--cpu', '--namespace', 'default'], 'pods_default.json', 'pods_default_metrics.json'),
+    ('output_cpu_default_no_header', ['--cpu', '--no-headers', '--namespace', 'default'], 'pods_default.json', 'pods_default_metrics.json'),
+    ('output_cpu_no_header', ['--cpu', '--no-headers'], 'pods.json', 'pods_metrics.json'),
+    ('output_memory', ['--all-namespaces'], 'pods.json', 'pods_metrics.json'),
+    ('output_memory_default', ['--namespace', 'default'], 'pods_default.json', 'pods_default_metrics.json'),
+    ('output_memory_default_no_header', ['--no-headers', '--namespace', 'default'], 'pods_default.json', 'pods_default_metrics.json'),
+    ('output_memory_default_no_header_sort_by_requests_limits', ['--no-headers', '--namespace', 'default', '--sort', 'requests,limits'], 'pods_default.json', 'pods_default_metrics.json'),
+    ('output_memory_default_sort_by_requests_limits', ['--namespace', 'default', '--sort', 'requests,limits'], 'pods_default.json', 'pods_default_metrics.json'),
+    ('output_memory_no_header', ['--all-namespaces', '--no-headers'], 'pods.json', 'pods_metrics.json'),
+    ('output_memory_no_header_sort_by_requests_limits', ['--all-namespaces', '--no-headers', '--sort', 'requests,limits'], 'pods.json', 'pods_metrics.json'),
+    ('output_memory_sort_by_requests_limits', ['--all-namespaces', '--sort', 'requests,limits'], 'pods.json', 'pods_metrics.json'),
+    # multiple contexts
+    ('output_memory_contexts', ['--context', 'cluster-b,cluster-a', '--sort', 'usage'], 'pods_default.json', 'pods_default_metrics.json'),
+    # compact output of kubectl get pods
+    ('output_cpu', ['--cpu', '--all-namespaces', '--compact'], 'pods_cpu.compact', 'pods_metrics.json'),
+    ('output_memory', ['--all-namespaces', '--compact'], 'pods_memory.compact', 'pods_metrics.json'),
+    # top pods
+    ('output_memory_top_ratio', ['--all-namespaces', '--top', '3', '--sort', 'ratio:desc,name'], 'pods.json', 'pods_metrics.json'),
+    # grouped pods
+    ('output_memory_group_by_owner', ['--all-namespaces', '--group-by', 'owner', '--sort', 'usage'], 'pods.json', 'pods_metrics.json'),
+    # machine-readable output
+    ('output_memory.json', ['--all-namespaces', '--output', 'json'], 'pods.json', 'pods_metrics.json'),
+    ('output_cpu.csv', ['--all-namespaces', '--cpu', '-o', 'csv'], 'pods.json', 'pods_metrics.json'),
+    ('output_resources.ndjson', ['--all-namespaces', '--resources', 'memory,cpu', '-o', 'ndjson'], 'pods.json', 'pods_metrics.json'),
+    # a row per container
+    ('output_memory_containers', ['--all-namespaces', '--containers'], 'pods.json', 'pods_containers_metrics.json'),
+    ('output_memory_containers', ['--all-namespaces', '--containers', '--compact'], 'pods_memory_containers.compact', 'pods_containers_metrics.json'),
+    # multiple resources
+    ('output_resources', ['--all-namespaces', '--resources', 'memory,cpu'], 'pods.json', 'pods_metrics.json'),
+    ('output_resources', ['--all-namespaces', '--resources', 'memory,cpu', '--compact'], 'pods_resources.compact', 'pods_metrics.json'),
 )
 
 
@@ -40,18 +60,27 @@ class FullOutputTest(unittest.TestCase):
     def setUp(self):
         super().setUp()
         self.maxDiff = None  # pylint: disable=invalid-name
+        # start each test with an empty cache
+        cache_directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(cache_directory.cleanup)
+        cache_directory_patcher = mock.patch('kubecargoload.CACHE_DIRECTORY', cache_directory.name)
+        cache_directory_patcher.start()
+        self.addCleanup(cache_directory_patcher.stop)
 
     @data(*TEST_VARIATIONS)
     @unpack
+    @mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_get_pods_compact')
     @mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_get_pods')
-    @mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_top_pods')
-    def test_full_output(self, output_name, argv, pods_json, pods_top, mocked_top_pods, mocked_get_pods):
+    @mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_get_pod_metrics')
+    def test_full_output(self, output_name, argv, pods_json, pod_metrics, mocked_get_pod_metrics, mocked_get_pods,
+                         mocked_get_pods_compact):
         pods_json_content = self._read_file_contents(pods_json)
-        pods_top_content = self._read_file_contents(pods_top)
+        pod_metrics_content = self._read_file_contents(pod_metrics)
         expected_output = self._read_file_contents(output_name)
 
-        mocked_top_pods.return_value = pods_top_content
+        mocked_get_pod_metrics.return_value = pod_metrics_content
         mocked_get_pods.return_value = pods_json_content
+        mocked_get_pods_compact.return_value = pods_json_content
 
         # mock sys.argv command line arguments
         with mock.patch.object(sys, 'argv', ['kubecargoload.py'] + argv):
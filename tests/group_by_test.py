@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+import io
+import unittest
+
+from ddt import data, ddt, unpack
+
+from kubecargoload import (
+    KubernetesCargoLoadOverviewPrinter,
+    KubernetesCargoLoadOverviewProvider,
+    Pod,
+)
+
+
+# pylint: disable=protected-access
+
+
+def _factor_pod_data(owner_references=None, labels=None, node_name=None):
+    return {
+        'metadata': {
+            'namespace': 'default',
+            'name': 'web-5d9c7b6f4-x2x7z',
+            'labels': labels or {},
+            'ownerReferences': owner_references or [],
+        },
+        'spec': {
+            'nodeName': node_name,
+            'containers': [],
+        },
+    }
+
+
+@ddt
+class GroupByProviderTest(unittest.TestCase):
+
+    def _factor_provider(self, group_by):  # pylint: disable=no-self-use
+        return KubernetesCargoLoadOverviewProvider(
+            namespace=None,
+            context=None,
+            group_by=group_by)
+
+    @data(
+        # Deployment resolved from the ReplicaSet name
+        ([{'kind': 'ReplicaSet', 'name': 'web-5d9c7b6f4'}], {'pod-template-hash': '5d9c7b6f4'},
+         'Deployment/web'),
+        # ReplicaSet not created by a Deployment
+        ([{'kind': 'ReplicaSet', 'name': 'web-5d9c7b6f4'}], {}, 'ReplicaSet/web-5d9c7b6f4'),
+        ([{'kind': 'StatefulSet', 'name': 'db'}], {}, 'StatefulSet/db'),
+        # the controller is preferred over other owners
+        ([{'kind': 'ConfigMap', 'name': 'config'},
+          {'kind': 'DaemonSet', 'name': 'agent', 'controller': True}], {}, 'DaemonSet/agent'),
+        ([], {}, 'Pod/web-5d9c7b6f4-x2x7z'),
+    )
+    @unpack
+    def test_get_pod_owner(self, owner_references, labels, expected_result):
+        provider = self._factor_provider('owner')
+        provider._pod_data = _factor_pod_data(owner_references, labels)
+        # test
+        result = provider._get_pod_group()
+        # check
+        self.assertEqual(result, expected_result)
+
+    def test_get_pod_owner_cached(self):
+        provider = self._factor_provider('owner')
+        owner_references = [{'kind': 'ReplicaSet', 'name': 'web-5d9c7b6f4'}]
+        provider._pod_data = _factor_pod_data(owner_references, {'pod-template-hash': '5d9c7b6f4'})
+        provider._get_pod_group()
+        # test
+        result = provider._owner_index
+        # check
+        self.assertEqual(result, {('default', 'web-5d9c7b6f4'): 'Deployment/web'})
+
+    @data(
+        ('node', 'worker-1'),
+        ('label=app', 'web'),
+        ('label=app.kubernetes.io/name', '<none>'),
+        ('namespace', None),
+    )
+    @unpack
+    def test_get_pod_group(self, group_by, expected_result):
+        provider = self._factor_provider(group_by)
+        provider._pod_data = _factor_pod_data(labels={'app': 'web'}, node_name='worker-1')
+        # test
+        result = provider._get_pod_group()
+        # check
+        self.assertEqual(result, expected_result)
+
+    @data(
+        ('owner', 'web-5d9c7b6f4\t5d9c7b6f4', 'Deployment/web'),
+        ('node', 'worker-1\tRunning', 'worker-1'),
+        ('node', '\tPending', '<none>'),
+        ('label=app.kubernetes.io/name', 'web', 'web'),
+        ('label=app', '', '<none>'),
+    )
+    @unpack
+    def test_compact_pod_group(self, group_by, group_fields, expected_result):
+        provider = self._factor_provider(group_by)
+        line = f'default\tweb-5d9c7b6f4-x2x7z\tuid\t\t\tReplicaSet\t10Mi,;\t{group_fields}'
+        # test
+        provider._fetch_pod_data_compact(line)
+        # check
+        self.assertEqual(provider._pods[('default', 'web-5d9c7b6f4-x2x7z')].group, expected_result)
+
+    @data(
+        ('owner', '{.metadata.ownerReferences[*].name}'),
+        ('node', '{.spec.nodeName}'),
+        ('label=app.kubernetes.io/name', '{.metadata.labels.app\\.kubernetes\\.io/name}'),
+    )
+    @unpack
+    def test_compact_pod_template(self, group_by, expected_field):
+        provider = self._factor_provider(group_by)
+        # test
+        result = provider._get_compact_pod_template()
+        # check
+        self.assertIn(f'{{";"}}{{end}}{{"\\t"}}{expected_field}', result)
+
+
+class GroupByPrinterTest(unittest.TestCase):
+
+    def _factor_printer(self, group_by, containers=False):  # pylint: disable=no-self-use
+        overview = {
+            ('default', 'web-1'): Pod('default', 'web-1', 200, 100, 50, group='Deployment/web'),
+            ('default', 'web-2'): Pod('default', 'web-2', 200, 100, 250, group='Deployment/web'),
+            ('default', 'db-0'): Pod('default', 'db-0', 0, 100, 300, group='StatefulSet/db'),
+        }
+        return KubernetesCargoLoadOverviewPrinter(
+            overview,
+            output=io.StringIO(),
+            group_by=group_by,
+            containers=containers)
+
+    def test_group_pods(self):
+        printer = self._factor_printer('owner')
+        # test
+        result = printer._group_pods()
+        # check, the groups contain the usage of pods without limits as well
+        expected_result = {
+            (None, 'default', 'Deployment/web'):
+                Pod('default', 'Deployment/web (2 PODs)', 400, 200, 300),
+            (None, 'default', 'StatefulSet/db'):
+                Pod('default', 'StatefulSet/db (1 PODs)', 0, 100, 300),
+        }
+        self.assertEqual(result, expected_result)
+        # while the summary does not
+        self.assertEqual(printer._sums['memory_usage'], 300)
+        self.assertEqual(printer._sums['memory_requests'], 300)
+
+    def test_print_grouped_by_namespace(self):
+        printer = self._factor_printer('namespace')
+        # test
+        printer.print()
+        # check
+        lines = printer._output.getvalue().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[0].split()[:2], ['Namespace', 'PODs'])
+        self.assertEqual(lines[2].split()[:3], ['default', '3', 'PODs'])
+
+    def test_print_containers_grouped_by_namespace(self):
+        printer = self._factor_printer('namespace', containers=True)
+        # test
+        printer.print()
+        # check, the rows are containers
+        lines = printer._output.getvalue().splitlines()
+        self.assertEqual(lines[0].split()[:2], ['Namespace', 'Containers'])
+        self.assertEqual(lines[2].split()[:3], ['default', '3', 'containers'])
+
+    def test_unsupported_group(self):
+        printer = self._factor_printer('deployment')
+        # test
+        with self.assertRaises(ValueError):
+            printer.print()
@@ -65,11 +65,14 @@ TEST_VARIATIONS = (
     (1024 * 1.05, 2, False, '1.05 Ki'),
     (1024 * 1.5, 2, False, '1.50 Ki'),
 
-    # cpu
+    # cpu, in nanocores
     (0, 0, True, '0 m'),
-    (1, 0, True, '1000 m'),
-    (24, 0, True, '24000 m'),
-    (1024, 0, True, '1024000 m'),
+    (1000000, 0, True, '1 m'),
+    (1500000, 0, True, '2 m'),
+    (2500000, 0, True, '2 m'),
+    (1000000000, 0, True, '1000 m'),
+    (24000000000, 0, True, '24000 m'),
+    (1024000000000, 0, True, '1024000 m'),
 )
 
 
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from unittest import mock
+import subprocess
+import sys
+import unittest
+
+from kubecargoload import (
+    KubernetesCargoLoadMultiContextOverviewProvider,
+    KubernetesCargoLoadOverviewProvider,
+)
+from kubecargoload import main as kubecargoload_main
+from kubecargoload import Pod
+
+
+class FakeOverviewProvider:
+
+    def __init__(self, context):
+        self._context = context
+
+    def provide(self):
+        if self._context == 'unreachable':
+            raise subprocess.CalledProcessError(1, ['kubectl'], stderr=b'connection refused')
+
+        pod = Pod('default', 'pod', memory_limits=2, memory_requests=1, memory_usage=1)
+        return {(pod.namespace, pod.name): pod}
+
+
+class MultiContextTest(unittest.TestCase):
+
+    def test_provide_multiple_contexts(self):
+        provider = KubernetesCargoLoadMultiContextOverviewProvider(
+            ['cluster-a', 'unreachable', 'cluster-b'],
+            FakeOverviewProvider,
+            parallel=2)
+        # test
+        result = provider.provide()
+        # check
+        expected_result = {
+            ('cluster-a', 'default', 'pod'): Pod('default', 'pod', 2, 1, 1, context='cluster-a'),
+            ('cluster-b', 'default', 'pod'): Pod('default', 'pod', 2, 1, 1, context='cluster-b'),
+        }
+        self.assertEqual(result, expected_result)
+        self.assertEqual(list(provider.errors), ['unreachable'])
+
+    def test_main_reports_failed_context(self):
+        with open('tests/test_data/pods_default.json', encoding='utf-8') as pods_json_f:
+            pods_json = pods_json_f.read()
+        with open('tests/test_data/pods_default_metrics.json', encoding='utf-8') as pod_metrics_f:
+            pod_metrics = pod_metrics_f.read()
+
+        def get_pods(provider):
+            if provider._context == 'unreachable':  # pylint: disable=protected-access
+                raise subprocess.CalledProcessError(1, ['kubectl'], stderr=b'')
+            return pods_json
+
+        argv = ['kubecargoload.py', '--no-cache', '--context', 'cluster-a,unreachable']
+        # test
+        with mock.patch.object(sys, 'argv', argv), \
+                mock.patch.object(KubernetesCargoLoadOverviewProvider,
+                                  '_execute_kubectl_get_pod_metrics', return_value=pod_metrics), \
+                mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_get_pods',
+                                  autospec=True, side_effect=get_pods), \
+                mock.patch.object(sys, 'stderr') as mocked_stderr:
+            with self.assertRaises(SystemExit) as context:
+                kubecargoload_main()
+        # check
+        self.assertEqual(context.exception.code, 1)
+        output = sys.stdout.getvalue()  # pylint: disable=no-member
+        self.assertIn('cluster-a Summary', output)
+        self.assertNotIn('unreachable', output)
+        stderr_output = ''.join(call.args[0] for call in mocked_stderr.write.call_args_list)
+        self.assertIn('unreachable: ', stderr_output)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from unittest import mock
+import io
+import json
+import unittest
+
+from ddt import data, ddt, unpack
+
+from kubecargoload import (
+    KubernetesCargoLoadOverviewPrinter,
+    KubernetesCargoLoadOverviewProvider,
+    Pod,
+    ResourceValues,
+)
+
+
+# pylint: disable=protected-access
+
+
+RESOURCES = ('memory', 'cpu', 'ephemeral-storage', 'nvidia.com/gpu')
+
+
+def _factor_pods_json():
+    container = {
+        'resources': {
+            'requests': {'cpu': '250m', 'memory': '64Mi', 'ephemeral-storage': '1Gi'},
+            'limits': {'cpu': '1', 'memory': '128Mi', 'nvidia.com/gpu': '2'},
+        },
+    }
+    pod = {
+        'metadata': {'namespace': 'default', 'name': 'trainer'},
+        'spec': {'containers': [container, container]},
+    }
+    return json.dumps({'items': [pod]})
+
+
+def _factor_pod_metrics_json(cpu, memory):
+    pod_metrics = {
+        'metadata': {'namespace': 'default', 'name': 'trainer'},
+        'containers': [{'name': 'trainer', 'usage': {'cpu': cpu, 'memory': memory}}],
+    }
+    return json.dumps({'items': [pod_metrics]})
+
+
+@ddt
+class MultiResourceProviderTest(unittest.TestCase):
+
+    def _factor_provider(self, compact=False):  # pylint: disable=no-self-use
+        return KubernetesCargoLoadOverviewProvider(
+            namespace='default',
+            context=None,
+            compact=compact,
+            resources=RESOURCES)
+
+    @mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_get_pods')
+    @mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_get_pod_metrics')
+    def test_provide_all_resources_at_once(self, mocked_get_pod_metrics, mocked_get_pods):
+        mocked_get_pod_metrics.return_value = _factor_pod_metrics_json('1500000000n', '102400Ki')
+        mocked_get_pods.return_value = _factor_pods_json()
+        provider = self._factor_provider()
+        # test
+        result = provider.provide()
+        # check
+        mocked_get_pod_metrics.assert_called_once_with()
+        mocked_get_pods.assert_called_once_with()
+        expected_resources = {
+            'memory': ResourceValues(128 * 1024 ** 2, 256 * 1024 ** 2, 100 * 1024 ** 2),
+            'cpu': ResourceValues(500000000, 2000000000, 1500000000),
+            'ephemeral-storage': ResourceValues(2 * 1024 ** 3, 0, 0),
+            'nvidia.com/gpu': ResourceValues(0, 4, 0),
+        }
+        pod = result[('default', 'trainer')]
+        self.assertEqual(pod.resources, expected_resources)
+        # the first resource is used for the regular fields
+        self.assertEqual(
+            (pod.memory_requests, pod.memory_limits, pod.memory_usage),
+            tuple(expected_resources['memory']))
+
+    def test_refresh_usage(self):
+        provider = self._factor_provider()
+        provider._pod_usage_data = {('default', 'trainer'): {'cpu': 1, 'memory': 2}}
+        provider._fetch_pod_data(_factor_pods_json())
+        # test
+        pod_metrics_output = _factor_pod_metrics_json('3m', '4')
+        with mock.patch.object(
+                provider, '_execute_kubectl_get_pod_metrics', return_value=pod_metrics_output):
+            provider.refresh_usage()
+        # check
+        pod = provider.get_overview()[('default', 'trainer')]
+        self.assertEqual(pod.memory_usage, 4)
+        self.assertEqual(pod.resources['memory'].usage, 4)
+        self.assertEqual(pod.resources['cpu'].usage, 3000000)
+        self.assertEqual(pod.resources['nvidia.com/gpu'].usage, 0)
+
+    def test_compact_pod_template(self):
+        provider = self._factor_provider(compact=True)
+        # test
+        result = provider._get_compact_pod_template()
+        # check
+        self.assertIn(
+            '{.resources.requests.ephemeral-storage},{.resources.limits.ephemeral-storage}'
+            .replace(',', '{","}'),
+            result)
+        self.assertIn('{"|"}{.resources.requests.nvidia\\.com/gpu}', result)
+
+    @data(
+        ('2Gi,4Gi|1,2|,|,1;', {'memory': '2Gi', 'cpu': '1'},
+         {'memory': '4Gi', 'cpu': '2', 'nvidia.com/gpu': '1'}),
+        (',|,|,|,;', {}, {}),
+    )
+    @unpack
+    def test_parse_compact_pod_line(self, containers, expected_requests, expected_limits):
+        provider = self._factor_provider(compact=True)
+        line = f'default\ttrainer\tuid\t\t\tReplicaSet\t{containers}'
+        # test
+        result = provider._parse_compact_pod_line(line)
+        # check
+        container_resources = result['spec']['containers'][0]['resources']
+        self.assertEqual(container_resources['requests'], expected_requests)
+        self.assertEqual(container_resources['limits'], expected_limits)
+
+
+@ddt
+class MultiResourcePrinterTest(unittest.TestCase):
+
+    def _factor_printer(self, overview):  # pylint: disable=no-self-use
+        return KubernetesCargoLoadOverviewPrinter(
+            overview,
+            output=io.StringIO(),
+            resources=RESOURCES)
+
+    @data(
+        ('cpu', 1500000000, '1500 m'),
+        ('memory', 3 * 1024 ** 2, '3.0 Mi'),
+        ('ephemeral-storage', 2 * 1024 ** 3, '2.0 Gi'),
+        ('hugepages-2Mi', 4 * 1024 ** 2, '4.0 Mi'),
+        ('nvidia.com/gpu', 2, '2'),
+    )
+    @unpack
+    def test_humanize_resource(self, resource, value, expected_result):
+        printer = self._factor_printer({})
+        # test
+        result = printer._humanize_resource(value, resource)
+        # check
+        self.assertEqual(result, expected_result)
+
+    def test_print_resource_sums(self):
+        resources = {
+            'memory': ResourceValues(1, 0, 10),
+            'cpu': ResourceValues(2, 4, 1),
+            'ephemeral-storage': ResourceValues(0, 0, 0),
+            'nvidia.com/gpu': ResourceValues(1, 1, 0),
+        }
+        overview = {
+            ('default', name): Pod('default', name, 0, 1, 10, resources=resources)
+            for name in ('a', 'b')}
+        printer = self._factor_printer(overview)
+        # test
+        printer.print()
+        # check
+        lines = printer._output.getvalue().splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertIn(' nvidia.com/gpu ', lines[0])
+        self.assertTrue(lines[-1].endswith('           2            2            0       0.00 %'))
+        # usage is summed only for pods with a limit
+        expected_sums = {
+            'memory': ResourceValues(2, 0, 0),
+            'cpu': ResourceValues(4, 8, 2),
+            'ephemeral-storage': ResourceValues(0, 0, 0),
+            'nvidia.com/gpu': ResourceValues(2, 2, 0),
+        }
+        self.assertEqual(printer._sums, expected_sums)
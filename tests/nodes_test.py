@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from os.path import join
+from unittest import mock
+import io
+import sys
+import unittest
+
+from ddt import data, ddt, unpack
+
+from kubecargoload import (
+    KubernetesCargoLoadNodeOverviewPrinter,
+    KubernetesCargoLoadOverviewProvider,
+)
+from kubecargoload import main as kubecargoload_main
+from kubecargoload import Node
+
+
+# pylint: disable=protected-access
+
+
+def _read_file_contents(filename):
+    with open(join('tests/test_data', filename), encoding='utf-8') as file_h:
+        return file_h.read()
+
+
+@ddt
+class NodesTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.maxDiff = None  # pylint: disable=invalid-name
+
+    @data(
+        ('output_nodes', [], 'nodes_memory.allocatable'),
+        ('output_nodes_cpu_no_header', ['--cpu', '--no-headers'], 'nodes_cpu.allocatable'),
+    )
+    @unpack
+    @mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_get_pod_metrics')
+    @mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_get_pods')
+    @mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_top_nodes')
+    @mock.patch.object(KubernetesCargoLoadOverviewProvider, '_execute_kubectl_get_nodes')
+    def test_full_output(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+            self, output_name, argv, nodes_allocatable, mocked_get_nodes, mocked_top_nodes,
+            mocked_get_pods, mocked_get_pod_metrics):
+        mocked_get_nodes.return_value = _read_file_contents(nodes_allocatable)
+        mocked_top_nodes.return_value = _read_file_contents('nodes.top')
+        mocked_get_pods.return_value = _read_file_contents('pods.json')
+        # test
+        with mock.patch.object(sys, 'argv', ['kubecargoload.py', '--nodes', *argv]):
+            kubecargoload_main()
+        # check, the usage of the pods is not needed
+        output = sys.stdout.getvalue()  # pylint: disable=no-member
+        self.assertEqual(output, _read_file_contents(output_name))
+        mocked_get_pod_metrics.assert_not_called()
+
+    def test_provide_nodes(self):
+        provider = KubernetesCargoLoadOverviewProvider(namespace=None, nodes=True)
+        pods_json = '''{"items": [
+            {"metadata": {"namespace": "a", "name": "pod-1"}, "spec": {"nodeName": "node-1",
+             "containers": [{"resources": {"requests": {"memory": "1Ki"}}}]}},
+            {"metadata": {"namespace": "a", "name": "pod-2"}, "spec": {"nodeName": "node-1",
+             "containers": [{"resources": {"requests": {"memory": "1Ki"},
+                                           "limits": {"memory": "4Ki"}}}]}},
+            {"metadata": {"namespace": "b", "name": "pending"}, "spec": {
+             "containers": [{"resources": {"requests": {"memory": "1Gi"}}}]}},
+            {"metadata": {"namespace": "b", "name": "pod-3"}, "spec": {"nodeName": "removed",
+             "containers": [{"resources": {"requests": {"memory": "1Ki"}}}]}}
+        ]}'''
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_get_pods', return_value=pods_json), \
+                mock.patch.object(provider, '_execute_kubectl_get_nodes',
+                                  return_value='node-1\t3Ki\nnode-2\t\n'), \
+                mock.patch.object(provider, '_execute_kubectl_top_nodes',
+                                  return_value='node-1  1m  0%  1Ki  33%\n'):
+            result = provider.provide_nodes()
+        # check, pending pods and pods of unknown nodes are ignored
+        expected_result = {
+            'node-1': Node('node-1', 3072, 2048, 4096, 1024, 2, 1024),
+            'node-2': Node('node-2', 0),
+        }
+        self.assertEqual(result, expected_result)
+
+    def test_provide_nodes_pending_pod(self):
+        provider = KubernetesCargoLoadOverviewProvider(namespace=None, nodes=True)
+        pods_json = '''{"items": [
+            {"metadata": {"namespace": "a", "name": "pending"}, "spec": {
+             "containers": [{"resources": {"requests": {"memory": "1Ki"}}}]},
+             "status": {"phase": "Pending"}}
+        ]}'''
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_get_pods', return_value=pods_json), \
+                mock.patch.object(provider, '_execute_kubectl_get_nodes',
+                                  return_value='<none>\t3Ki\n'), \
+                mock.patch.object(provider, '_execute_kubectl_top_nodes', return_value=''):
+            result = provider.provide_nodes()
+        # check, a node named like the group of unscheduled pods gets none of them
+        self.assertEqual(result, {'<none>': Node('<none>', 3072, headroom=3072)})
+
+    def test_provide_nodes_terminated_pods(self):
+        provider = KubernetesCargoLoadOverviewProvider(namespace=None, nodes=True)
+        pods_json = '''{"items": [
+            {"metadata": {"namespace": "a", "name": "running"}, "spec": {"nodeName": "node-1",
+             "containers": [{"resources": {"requests": {"memory": "1Ki"}}}]},
+             "status": {"phase": "Running"}},
+            {"metadata": {"namespace": "a", "name": "evicted"}, "spec": {"nodeName": "node-1",
+             "containers": [{"resources": {"requests": {"memory": "1Ki"}}}]},
+             "status": {"phase": "Failed", "reason": "Evicted"}},
+            {"metadata": {"namespace": "a", "name": "completed"}, "spec": {"nodeName": "node-1",
+             "containers": [{"resources": {"requests": {"memory": "1Ki"}}}]},
+             "status": {"phase": "Succeeded"}}
+        ]}'''
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_get_pods', return_value=pods_json), \
+                mock.patch.object(provider, '_execute_kubectl_get_nodes',
+                                  return_value='node-1\t3Ki\n'), \
+                mock.patch.object(provider, '_execute_kubectl_top_nodes', return_value=''):
+            result = provider.provide_nodes()
+        # check, only the running pod reserves memory on the node
+        self.assertEqual(result, {'node-1': Node('node-1', 3072, 1024, 0, 0, 1, 2048)})
+
+    def test_provide_nodes_terminated_pods_compact(self):
+        provider = KubernetesCargoLoadOverviewProvider(namespace=None, nodes=True, compact=True)
+        pods_compact = (
+            'a\trunning\tuid-1\t\t\t\t1Ki,;\tnode-1\tRunning\n'
+            'a\tevicted\tuid-2\t\t\t\t1Ki,;\tnode-1\tFailed\n')
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_get_pods_compact',
+                               return_value=pods_compact), \
+                mock.patch.object(provider, '_execute_kubectl_get_nodes',
+                                  return_value='node-1\t3Ki\n'), \
+                mock.patch.object(provider, '_execute_kubectl_top_nodes', return_value=''):
+            result = provider.provide_nodes()
+        # check
+        self.assertEqual(result, {'node-1': Node('node-1', 3072, 1024, 0, 0, 1, 2048)})
+
+    def test_parse_top_nodes_usage(self):
+        provider = KubernetesCargoLoadOverviewProvider(namespace=None, nodes=True)
+        # test
+        result = provider._parse_top_nodes_usage(_read_file_contents('nodes.top'))
+        # check, nodes without metrics are missing
+        self.assertEqual(result, {'minikube': 2231 * 1024 * 1024})
+
+    def test_parse_node_json(self):
+        provider = KubernetesCargoLoadOverviewProvider(
+            namespace=None, show_cpu_usage=True, nodes=True)
+        # test
+        allocatable = provider._parse_node_allocatable_json(_read_file_contents('nodes.json'))
+        usage = provider._parse_node_metrics_usage(_read_file_contents('nodes_metrics.json'))
+        # check
+        self.assertEqual(allocatable, {'minikube': 4 * 10 ** 9, 'minikube-m02': 2 * 10 ** 9})
+        self.assertEqual(usage, {'minikube': 428 * 10 ** 6})
+
+    @data(
+        ('name', ['a', 'b', 'c']),
+        ('headroom:desc,name', ['c', 'a', 'b']),
+        ('pods:desc,name:desc', ['b', 'a', 'c']),
+    )
+    @unpack
+    def test_sort(self, sort, expected_result):
+        nodes = {
+            'a': Node('a', 100, requests=50, pod_count=2, headroom=50),
+            'b': Node('b', 100, requests=50, pod_count=2, headroom=50),
+            'c': Node('c', 100, headroom=100),
+        }
+        printer = KubernetesCargoLoadNodeOverviewPrinter(
+            nodes, no_header=True, sort=sort, output=io.StringIO())
+        # test
+        printer.print()
+        # check
+        lines = printer._output.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[:-1]], expected_result)
+        self.assertEqual(lines[-1].split()[:2], ['Summary', '4'])
+
+    def test_unsupported_sort(self):
+        printer = KubernetesCargoLoadNodeOverviewPrinter({}, sort='namespace')
+        # test
+        with self.assertRaises(ValueError):
+            printer.print()
+
+    @data(
+        ['--watch'],
+        ['--output', 'json'],
+        ['--group-by', 'owner'],
+        ['--resources', 'cpu,memory'],
+        ['--context', 'a,b'],
+    )
+    def test_unsupported_options(self, argv):
+        # test
+        with mock.patch.object(sys, 'argv', ['kubecargoload.py', '--nodes', *argv]):
+            with self.assertRaises(SystemExit):
+                kubecargoload_main()
+        # check
+        self.assertIn('node mode', sys.stderr.getvalue().lower())  # pylint: disable=no-member
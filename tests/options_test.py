@@ -10,7 +10,7 @@ import unittest
 from kubecargoload import _setup_options
 
 
-class OptionsTest(unittest.TestCase):
+class OptionsTest(unittest.TestCase):  # pylint: disable=too-many-public-methods
 
     def test_option_unknown(self):
         test_argv = ['kubecargoload.py', '--unknown-option-which-will-never-exist-abcdefgh']
@@ -41,15 +41,42 @@ class OptionsTest(unittest.TestCase):
     def test_flag_all_namespaces(self):
         self._test_flag('A', 'all-namespaces', 'all_namespaces')
 
+    def test_flag_all_contexts(self):
+        self._test_flag(None, 'all-contexts', 'all_contexts')
+
     def test_flag_show_cpu_usage(self):
         self._test_flag('c', 'cpu', 'show_cpu_usage')
 
+    def test_flag_compact(self):
+        self._test_flag(None, 'compact', 'compact')
+
+    def test_flag_containers(self):
+        self._test_flag(None, 'containers', 'containers')
+
     def test_flag_debug(self):
         self._test_flag('d', 'debug', 'debug')
 
+    def test_flag_no_cache(self):
+        self._test_flag(None, 'no-cache', 'no_cache')
+
     def test_flag_no_header(self):
         self._test_flag('H', 'no-headers', 'no_header')
 
+    def test_flag_query(self):
+        self._test_flag(None, 'query', 'query')
+
+    def test_flag_recommend(self):
+        self._test_flag(None, 'recommend', 'recommend')
+
+    def test_flag_record(self):
+        self._test_flag(None, 'record', 'record')
+
+    def test_flag_serve(self):
+        self._test_flag(None, 'serve', 'serve')
+
+    def test_flag_watch(self):
+        self._test_flag('w', 'watch', 'watch')
+
     def test_flag_version(self):
         self._test_flag('V', 'version', 'version')
 
@@ -69,15 +96,137 @@ class OptionsTest(unittest.TestCase):
             long_name_value = getattr(arguments, name)
             self.assertEqual(long_name_value, value)
 
+    def test_option_backend(self):
+        self._test_option(None, 'backend', 'backend', 'api')
+
+    def test_option_cache_ttl(self):
+        test_argv = ['kubecargoload.py', '--cache-ttl', '120']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.cache_ttl, 120)
+
+    def test_option_chunk_size(self):
+        test_argv = ['kubecargoload.py', '--chunk-size', '100']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.chunk_size, 100)
+
+        test_argv = ['kubecargoload.py', '--chunk-size', '-1']
+        with mock.patch.object(sys, 'argv', test_argv):
+            with self.assertRaises(SystemExit):
+                _setup_options()
+
     def test_option_context(self):
         self._test_option(None, 'context', 'context', 'my-k8s-cluster')
 
+    def test_option_duration(self):
+        test_argv = ['kubecargoload.py', '--duration', '30m']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.duration, 30 * 60)
+
+    def test_option_group_by(self):
+        for value in ('namespace', 'owner', 'node', 'label=app.kubernetes.io/name'):
+            self._test_option(None, 'group-by', 'group_by', value)
+
+        for value in ('bogus', 'label=', 'labels'):
+            test_argv = ['kubecargoload.py', '--group-by', value, '-o', 'ndjson']
+            with mock.patch.object(sys, 'argv', test_argv):
+                with self.assertRaises(SystemExit):
+                    _setup_options()
+
+    def test_option_headroom(self):
+        test_argv = ['kubecargoload.py', '--headroom', '20']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.headroom, 20)
+
+    def test_option_interval(self):
+        test_argv = ['kubecargoload.py', '--interval', '2.5']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.interval, 2.5)
+
+    def test_option_listen(self):
+        test_argv = ['kubecargoload.py', '--listen', ':9100']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.listen, ('', 9100))
+
+        test_argv = ['kubecargoload.py']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.listen, ('localhost', 9723))
+
     def test_option_namespace(self):
         self._test_option('n', 'namespace', 'namespace', 'kube-system')
 
+    def test_option_output(self):
+        self._test_option('o', 'output', 'output', 'ndjson')
+
+    def test_option_parallel(self):
+        test_argv = ['kubecargoload.py', '--parallel', '3']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.parallel, 3)
+
+        for value in ('0', '-2', 'many'):
+            test_argv = ['kubecargoload.py', '--parallel', value]
+            with mock.patch.object(sys, 'argv', test_argv):
+                with self.assertRaises(SystemExit):
+                    _setup_options()
+
+    def test_option_request_timeout(self):
+        test_argv = ['kubecargoload.py', '--request-timeout', '30']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.request_timeout, 30)
+
+        test_argv = ['kubecargoload.py']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.request_timeout, 60)
+
+    def test_option_resources(self):
+        test_argv = ['kubecargoload.py', '--resources', 'cpu,memory']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.resources, 'cpu,memory')
+
+    def test_option_since(self):
+        test_argv = ['kubecargoload.py', '--since', '7d']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.since, 7 * 24 * 60 * 60)
+
     def test_option_sort(self):
         self._test_option('s', 'sort', 'sort', 'name,namespace')
 
+    def test_option_store(self):
+        self._test_option(None, 'store', 'store', '/tmp/usage.sqlite')
+
+    def test_option_timings(self):
+        test_argv = ['kubecargoload.py', '--timings']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.timings, '-')
+
+        test_argv = ['kubecargoload.py', '--timings', 'timings.json']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.timings, 'timings.json')
+
+    def test_option_top(self):
+        test_argv = ['kubecargoload.py', '--top', '20']
+        with mock.patch.object(sys, 'argv', test_argv):
+            arguments = _setup_options()
+            self.assertEqual(arguments.top, 20)
+
+        test_argv = ['kubecargoload.py', '--top', '-5']
+        with mock.patch.object(sys, 'argv', test_argv):
+            with self.assertRaises(SystemExit):
+                _setup_options()
+
     def test_option_exclusive_group_namespace(self):
         test_argv = ['kubecargoload.py', '--namespace', 'kube-system', '--all-namespaces']
         with mock.patch.object(sys, 'argv', test_argv):
@@ -88,3 +237,20 @@ class OptionsTest(unittest.TestCase):
         with mock.patch.object(sys, 'argv', test_argv):
             with self.assertRaises(SystemExit):
                 _setup_options()
+
+    def test_option_exclusive_group_resources(self):
+        test_argv = ['kubecargoload.py', '--cpu', '--resources', 'cpu,memory']
+        with mock.patch.object(sys, 'argv', test_argv):
+            with self.assertRaises(SystemExit):
+                _setup_options()
+
+    def test_option_exclusive_group_usage_store(self):
+        test_argv = ['kubecargoload.py', '--record', '--recommend']
+        with mock.patch.object(sys, 'argv', test_argv):
+            with self.assertRaises(SystemExit):
+                _setup_options()
+
+        test_argv = ['kubecargoload.py', '--serve', '--record']
+        with mock.patch.object(sys, 'argv', test_argv):
+            with self.assertRaises(SystemExit):
+                _setup_options()
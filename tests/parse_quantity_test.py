@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from decimal import Decimal
+import unittest
+
+from ddt import data, ddt, unpack
+
+from kubecargoload import parse_quantity
+
+
+TEST_VARIATIONS = (
+    # quantity, result
+    ('0', Decimal(0)),
+    ('134217728', Decimal(134217728)),
+    ('0.5', Decimal('0.5')),
+    ('1e3', Decimal(1000)),
+    ('100Mi', Decimal(100 * 1024 * 1024)),
+    ('1Gi', Decimal(1024 * 1024 * 1024)),
+    ('1000000Ki', Decimal(1000000 * 1024)),
+    ('1Ti', Decimal(1024 ** 4)),
+    ('500M', Decimal(500 * 1000 * 1000)),
+    ('1k', Decimal(1000)),
+    ('1K', Decimal(1000)),
+    ('250m', Decimal('0.25')),
+    ('2500u', Decimal('0.0025')),
+    ('123456789n', Decimal('0.123456789')),
+    (5, Decimal(5)),
+    (Decimal('1.5'), Decimal('1.5')),
+)
+
+
+@ddt
+class ParseQuantityTest(unittest.TestCase):
+
+    @data(*TEST_VARIATIONS)
+    @unpack
+    def test_parse_quantity(self, quantity, expected_result):
+        # test
+        result = parse_quantity(quantity)
+        # check
+        self.assertEqual(result, expected_result)
+        # the second call is answered from the cache
+        self.assertEqual(parse_quantity(quantity), expected_result)
+
+    @data('', 'Mi', 'abc', '1.2.3Mi', '10Xi', '10ki', '1ki')
+    def test_parse_quantity_invalid(self, quantity):
+        with self.assertRaises(ValueError):
+            parse_quantity(quantity)
+
+    def test_parse_quantity_unknown_suffix_message(self):
+        with self.assertRaisesRegex(ValueError, '^10ki has unknown suffix$'):
+            parse_quantity('10ki')
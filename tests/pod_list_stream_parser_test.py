@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from unittest import mock
+import asyncio
+import json
+import subprocess
+import sys
+import unittest
+
+from ddt import data, ddt
+
+from kubecargoload import KubernetesCargoLoadOverviewProvider, PodListStreamParser
+
+
+# pylint: disable=protected-access
+
+
+def _split(content, chunk_size):
+    return [content[index:index + chunk_size] for index in range(0, len(content), chunk_size)]
+
+
+async def _split_async(content, chunk_size):
+    for chunk in _split(content, chunk_size):
+        await asyncio.sleep(0)  # let other tasks run in between like while waiting for output
+        yield chunk
+
+
+async def _collect_async(parser):
+    return [item async for item in parser]
+
+
+@ddt
+class PodListStreamParserTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        filename = 'tests/test_data/pods.json'
+        with open(filename, encoding='utf-8') as all_pod_data_f:
+            self._pods_json = all_pod_data_f.read()
+
+    @data(1, 7, 100, 4096, 1024 * 1024)
+    def test_stream_parser_chunked(self, chunk_size):
+        chunks = _split(self._pods_json, chunk_size)
+        # test
+        result = list(PodListStreamParser(chunks))
+        # check
+        expected_result = json.loads(self._pods_json)['items']
+        self.assertEqual(result, expected_result)
+
+    @data(7, 4096, 1024 * 1024)
+    def test_stream_parser_async(self, chunk_size):
+        parser = PodListStreamParser(_split_async(self._pods_json, chunk_size))
+        # test
+        result = asyncio.run(_collect_async(parser))
+        # check
+        expected_result = json.loads(self._pods_json)['items']
+        self.assertEqual(result, expected_result)
+        self.assertEqual(parser.members['kind'], 'List')
+
+    def test_stream_parser_async_invalid(self):
+        parser = PodListStreamParser(_split_async('{"items": [{"a": 1}', 3))
+        # test
+        with self.assertRaises(ValueError):
+            asyncio.run(_collect_async(parser))
+
+    def test_iter_values(self):
+        content = '{"type": "ADDED"}\n{"type": "DELETED", "object": {"a": [1]}}\n'
+        # test
+        result = list(PodListStreamParser(_split(content, 5)).iter_values())
+        # check
+        self.assertEqual(result, [{'type': 'ADDED'}, {'type': 'DELETED', 'object': {'a': [1]}}])
+
+    @data(
+        '{"apiVersion": "v1", "items": [], "kind": "List"}',
+        '{"items":[]}',
+        '{}',
+        ' { "kind" : "List" , "metadata" : {"resourceVersion": 1} } ',
+    )
+    def test_stream_parser_empty(self, content):
+        # test
+        result = list(PodListStreamParser(_split(content, 3)))
+        # check
+        self.assertEqual(result, [])
+
+    def test_stream_parser_members_after_items(self):
+        content = '{"items": [{"a": 1}, {"b": [2, 3]}], "metadata": {"continue": 12345}}'
+        # test
+        result = list(PodListStreamParser(_split(content, 2)))
+        # check
+        self.assertEqual(result, [{'a': 1}, {'b': [2, 3]}])
+
+    @data(
+        '',
+        '[]',
+        '{"items": [{"a": 1}',
+        '{"items": [{"a": 1}} ',
+    )
+    def test_stream_parser_invalid(self, content):
+        with self.assertRaises(ValueError):
+            list(PodListStreamParser(_split(content, 3)))
+
+
+class ExecuteKubectlStreamedTest(unittest.TestCase):
+
+    def _factor_provider(self):  # pylint: disable=no-self-use
+        return KubernetesCargoLoadOverviewProvider(
+            namespace=None,
+            context=None,
+            show_cpu_usage=None)
+
+    def test_execute_kubectl_streamed(self):
+        provider = self._factor_provider()
+        # test
+        with mock.patch('kubecargoload.KUBECTL_BIN', sys.executable), \
+                mock.patch('kubecargoload.KUBECTL_OUTPUT_CHUNK_SIZE', 4):
+            result = list(provider._execute_kubectl_streamed('-c', 'print("Ünicode output")'))
+        # check
+        self.assertEqual(''.join(result), 'Ünicode output\n')
+        self.assertEqual(result[0], 'Ünic')
+
+    def test_execute_kubectl_streamed_error(self):
+        provider = self._factor_provider()
+        script = 'import sys; sys.stderr.write("failed"); sys.exit(3)'
+        # test
+        with mock.patch('kubecargoload.KUBECTL_BIN', sys.executable):
+            output = provider._execute_kubectl_streamed('-c', script)
+            with self.assertRaises(subprocess.CalledProcessError) as context:
+                list(output)
+        # check
+        self.assertEqual(context.exception.returncode, 3)
+        self.assertEqual(context.exception.stderr, b'failed')
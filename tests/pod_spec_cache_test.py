@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from os.path import join
+from unittest import mock
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+
+from kubecargoload import KubernetesCargoLoadOverviewProvider, Pod, PodSpecCache
+
+
+# pylint: disable=protected-access
+
+
+POD_KEY = ('default', 'kube-web-view-7c67ddb647-pvjvs')
+CACHE_KEY = [None, 'default', 'memory', []]
+# UIDs and generations of the pods in pods_default.json, they have no generation
+POD_VERSIONS = [
+    '1bd5220b-f610-4a81-a6b1-20cff5dce60f ',
+    '97a2220a-913b-48b1-a8fe-77b9859abddd ',
+    'a303d025-b3db-4c83-90a8-5e2ff7cc5013 ',
+    '3282cb52-5304-45a6-9aa2-5adea49042c5 ',
+]
+
+
+class PodSpecCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache_directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(cache_directory.cleanup)
+        self._cache_directory = cache_directory.name
+
+    def test_store_and_load(self):
+        cache = PodSpecCache(self._cache_directory)
+        pods = {POD_KEY: Pod(*POD_KEY, memory_limits=2, memory_requests=1, memory_usage=3)}
+        # test
+        cache.store(CACHE_KEY, pods, '4711')
+        result = cache.load(CACHE_KEY)
+        # check
+        cached_pods, fingerprint, age = result
+        self.assertEqual(cached_pods, {POD_KEY: Pod(*POD_KEY, 2, 1, 0)})  # without usage
+        self.assertEqual(fingerprint, '4711')
+        self.assertLess(age, 10)
+        self.assertIsNone(cache.load(['other-context', 'default', 'memory', []]))
+
+    def test_store_and_load_group(self):
+        cache = PodSpecCache(self._cache_directory)
+        pod = Pod(*POD_KEY, memory_limits=2, memory_requests=1, memory_usage=3,
+                  group='Deployment/kube-web-view')
+        # test
+        cache.store(CACHE_KEY, {POD_KEY: pod}, None)
+        cached_pods, _, _ = cache.load(CACHE_KEY)
+        # check
+        self.assertEqual(cached_pods[POD_KEY].group, 'Deployment/kube-web-view')
+
+    def test_load_invalid(self):
+        cache = PodSpecCache(self._cache_directory)
+        cache.store(CACHE_KEY, {}, None)
+        filename = join(self._cache_directory, os.listdir(self._cache_directory)[0])
+        with open(filename, 'w', encoding='utf-8') as cache_file:
+            cache_file.write('{"pods": [[1]]')
+        # test
+        result = cache.load(CACHE_KEY)
+        # check
+        self.assertIsNone(result)
+
+    def test_evict(self):
+        cache = PodSpecCache(self._cache_directory, max_size=100)
+        pods = {POD_KEY: Pod(*POD_KEY, memory_limits=2, memory_requests=1, memory_usage=3)}
+        # test
+        for context in range(5):
+            cache.store([str(context), 'default', 'memory', []], pods, None)
+        # check, each entry is about 60 bytes
+        self.assertEqual(len(os.listdir(self._cache_directory)), 1)
+        self.assertIsNotNone(cache.load(['4', 'default', 'memory', []]))
+
+
+class ProvideFromCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache_directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(cache_directory.cleanup)
+        self._cache = PodSpecCache(cache_directory.name, ttl=60)
+        with open('tests/test_data/pods_default.json', encoding='utf-8') as pods_json_f:
+            self._pods_json = pods_json_f.read()
+        # the pods of the default namespace
+        with open('tests/test_data/pods_memory.compact', encoding='utf-8') as pods_compact_f:
+            self._pods_compact = ''.join(
+                line for line in pods_compact_f if line.startswith('default\t'))
+
+    def _provide(self, pod_versions=None, memory_usage='34Mi', compact=False, group_by=None):
+        provider = KubernetesCargoLoadOverviewProvider(
+            namespace='default',
+            context=None,
+            show_cpu_usage=False,
+            compact=compact,
+            cache=self._cache,
+            group_by=group_by)
+        if pod_versions is None:
+            pod_versions = POD_VERSIONS
+        pod_metrics = {
+            'metadata': {'namespace': 'default', 'name': 'kube-web-view-7c67ddb647-pvjvs'},
+            'containers': [{'name': 'kube-web-view', 'usage': {'memory': memory_usage}}],
+        }
+        pod_metrics_output = json.dumps({'items': [pod_metrics]})
+        with mock.patch.object(provider, '_execute_kubectl_get_pod_metrics',
+                               return_value=pod_metrics_output), \
+                mock.patch.object(provider, '_execute_kubectl_get_pods',
+                                  return_value=self._pods_json) as mocked_get_pods, \
+                mock.patch.object(provider, '_execute_kubectl_get_pods_compact',
+                                  return_value=self._pods_compact) as mocked_get_pods_compact, \
+                mock.patch.object(provider, '_execute_kubectl_get_pod_versions',
+                                  return_value=''.join(f'{line}\n' for line in pod_versions)):
+            pods = provider.provide()
+
+        return pods, mocked_get_pods.called or mocked_get_pods_compact.called
+
+    def test_provide_from_cache(self):
+        self._provide()
+        # test
+        pods, got_pods_listed = self._provide(memory_usage='40Mi')
+        # check
+        self.assertFalse(got_pods_listed)
+        self.assertEqual(pods[POD_KEY].memory_limits, 100 * 1024 * 1024)
+        self.assertEqual(pods[POD_KEY].memory_usage, 40 * 1024 * 1024)  # usage is always fresh
+
+    def test_provide_from_cache_revalidated(self):
+        self._provide()
+        self._cache.ttl = 0
+        # test
+        pods, got_pods_listed = self._provide()
+        # check
+        self.assertFalse(got_pods_listed)
+        self.assertEqual(pods[POD_KEY].memory_limits, 100 * 1024 * 1024)
+
+    def test_provide_from_cache_outdated(self):
+        self._provide()
+        self._cache.ttl = 0
+        # test
+        pods, got_pods_listed = self._provide(pod_versions=POD_VERSIONS[1:])
+        # check
+        self.assertTrue(got_pods_listed)
+        self.assertEqual(pods[POD_KEY].memory_limits, 100 * 1024 * 1024)
+
+    def test_provide_from_cache_resized(self):
+        self._provide()
+        self._cache.ttl = 0
+        pod_versions = [f'{POD_VERSIONS[0]}2', *POD_VERSIONS[1:]]
+        # test, the generation of a pod is increased when it is resized in place
+        _, got_pods_listed = self._provide(pod_versions=pod_versions)
+        # check
+        self.assertTrue(got_pods_listed)
+
+    def test_provide_from_cache_group_changed(self):
+        provider = KubernetesCargoLoadOverviewProvider(namespace='default', group_by='label=app')
+        pods_data = json.loads(self._pods_json)['items']
+        self._provide(
+            pod_versions=[provider._get_pod_version(pod_data) for pod_data in pods_data],
+            group_by='label=app')
+        self._cache.ttl = 0
+        # test, relabeling a pod changes neither its UID nor its generation
+        pods_data[3]['metadata']['labels']['app'] = 'web'
+        self._pods_json = json.dumps({'items': pods_data})
+        pods, got_pods_listed = self._provide(
+            pod_versions=[provider._get_pod_version(pod_data) for pod_data in pods_data],
+            group_by='label=app')
+        # check
+        self.assertTrue(got_pods_listed)
+        self.assertEqual(pods[POD_KEY].group, 'web')
+
+    def test_pod_version_template(self):
+        provider = KubernetesCargoLoadOverviewProvider(namespace='default', group_by='owner')
+        # test
+        result = provider._get_pod_version_template()
+        # check, the same fields as _get_pod_version() takes
+        self.assertEqual(
+            result,
+            '{range .items[*]}{.metadata.uid}{" "}{.metadata.generation}'
+            '{" "}{.metadata.ownerReferences[*].name}{"\\n"}{end}')
+
+    def test_provide_from_cache_revalidated_compact(self):
+        self._provide(compact=True)
+        self._cache.ttl = 0
+        # test, the pod versions are read from the compact output as well
+        _, got_pods_listed = self._provide(pod_versions=reversed(POD_VERSIONS), compact=True)
+        # check
+        self.assertFalse(got_pods_listed)
+
+    def test_provide_from_cache_revalidation_failed(self):
+        self._provide()
+        self._cache.ttl = 0
+        provider = KubernetesCargoLoadOverviewProvider(
+            namespace='default',
+            context=None,
+            cache=self._cache)
+        error = subprocess.CalledProcessError(1, ['kubectl', 'get', 'pods'])
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_get_pod_versions', side_effect=error):
+            result = provider._fetch_pods_fingerprint()
+        # check, the pods are listed again
+        self.assertIsNone(result)
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from unittest import mock
+import random
+import unittest
+
+from ddt import data, ddt, unpack
+
+from kubecargoload import Pod, PodTable, ResourceValues
+import kubecargoload
+
+
+# pylint: disable=protected-access
+
+
+def _factor_pods(count):
+    rng = random.Random(42)  # noqa: S311
+    pods = {}
+    for index in range(count):
+        context = rng.choice((None, 'kind', 'prod'))
+        namespace = f'namespace-{rng.randrange(5)}'
+        name = f'pod-{rng.randrange(count)}'  # names are not unique across namespaces
+        limits = rng.choice((0, 100, 200))
+        pods[(context, namespace, name, index)] = Pod(
+            namespace, name, limits, rng.randrange(100), rng.randrange(300), context=context)
+    return pods
+
+
+def _get_ratio(pod):
+    return (pod.memory_usage * 100) / pod.memory_limits if pod.memory_limits else 0
+
+
+def _get_numpy_settings():
+    settings = [None]  # pure Python
+    if kubecargoload.numpy is not None:
+        settings.append(kubecargoload.numpy)
+    return settings
+
+
+@ddt
+class PodTableTest(unittest.TestCase):
+
+    def test_mapping(self):
+        pods = _factor_pods(50)
+        # test
+        pod_table = PodTable(pods)
+        # check
+        self.assertEqual(len(pod_table), 50)
+        self.assertEqual(list(pod_table), list(pods))
+        self.assertEqual(pod_table, pods)
+        key = next(iter(pods))
+        self.assertEqual(pod_table[key], pods[key])
+        self.assertNotIn(('unknown', 'pod'), pod_table)
+
+    def test_set_existing(self):
+        pod_table = PodTable({('default', 'a'): Pod('default', 'a', 1, 2, 3)})
+        # test
+        pod_table[('default', 'a')] = Pod('default', 'a', 4, 5, 6, group='Deployment/a')
+        # check
+        self.assertEqual(len(pod_table), 1)
+        expected_result = Pod('default', 'a', 4, 5, 6, group='Deployment/a')
+        self.assertEqual(pod_table[('default', 'a')], expected_result)
+
+    def test_delete(self):
+        pods = _factor_pods(10)
+        pod_table = PodTable(pods)
+        keys = list(pods)
+        # test
+        del pod_table[keys[3]]
+        del pod_table[keys[-1]]
+        # check, the last pod takes the place of the deleted one
+        del pods[keys[3]]
+        del pods[keys[-1]]
+        self.assertEqual(pod_table, pods)
+        self.assertEqual(list(pod_table)[3], keys[-2])
+        with self.assertRaises(KeyError):
+            del pod_table[keys[3]]
+
+    def test_resources(self):
+        resources = {'cpu': ResourceValues(1, 2, 3), 'memory': ResourceValues(4, 5, 6)}
+        pod = Pod('default', 'a', 5, 4, 6, resources=resources)
+        # test
+        pod_table = PodTable({('default', 'a'): pod})
+        pod_table[('default', 'b')] = Pod('default', 'b', 0, 0, 0, resources={
+            'nvidia.com/gpu': ResourceValues(1, 1, 0)})
+        # check, missing resources are zero
+        self.assertEqual(pod_table.resources, ('cpu', 'memory', 'nvidia.com/gpu'))
+        self.assertEqual(pod_table[('default', 'a')].resources, {
+            **resources, 'nvidia.com/gpu': ResourceValues(0, 0, 0)})
+        self.assertEqual(pod_table[('default', 'b')].resources['cpu'], ResourceValues(0, 0, 0))
+
+    def test_copy(self):
+        pods = _factor_pods(10)
+        pod_table = PodTable(pods)
+        # test
+        result = pod_table.copy()
+        pod_table.clear()
+        # check
+        self.assertEqual(result, pods)
+        self.assertEqual(len(pod_table), 0)
+
+    def test_get_maximum_length(self):
+        pod_table = PodTable(_factor_pods(10))
+        pod_table[('x', 'y')] = Pod('kube-system', 'a-very-long-pod-name', 0, 0, 0, context='x')
+        del pod_table[('x', 'y')]
+        # check, removed pods are not considered
+        self.assertEqual(pod_table.get_maximum_length('namespace'), len('namespace-0'))
+        self.assertEqual(pod_table.get_maximum_length('name'), len('pod-0'))
+        self.assertEqual(pod_table.get_maximum_length('context'), len('kind'))
+        self.assertEqual(PodTable().get_maximum_length('name'), 0)
+
+    @data(*_get_numpy_settings())
+    def test_get_ratios(self, numpy):
+        pods = _factor_pods(100)
+        pod_table = PodTable(pods)
+        # test
+        with mock.patch('kubecargoload.numpy', numpy):
+            result = pod_table.get_ratios()
+        # check
+        self.assertEqual(list(result), [_get_ratio(pod) for pod in pods.values()])
+
+    @data(*_get_numpy_settings())
+    def test_get_sums(self, numpy):
+        pods = _factor_pods(100)
+        pod_table = PodTable(pods)
+        # test
+        with mock.patch('kubecargoload.numpy', numpy):
+            result = pod_table.get_sums()
+            result_rows = pod_table.get_sums(rows=[0, 5, 7])
+            result_resource = pod_table.get_sums('cpu')
+        # check, the usage is summed only for pods with limits
+        expected_result = ResourceValues(
+            sum(pod.memory_requests for pod in pods.values()),
+            sum(pod.memory_limits for pod in pods.values()),
+            sum(pod.memory_usage for pod in pods.values() if pod.memory_limits))
+        self.assertEqual(result, expected_result)
+        rows = [list(pods.values())[row] for row in (0, 5, 7)]
+        expected_result = ResourceValues(
+            sum(pod.memory_requests for pod in rows),
+            sum(pod.memory_limits for pod in rows),
+            sum(pod.memory_usage for pod in rows if pod.memory_limits))
+        self.assertEqual(result_rows, expected_result)
+        self.assertEqual(result_resource, ResourceValues(0, 0, 0))
+        self.assertEqual(PodTable().get_sums(), ResourceValues(0, 0, 0))
+
+    @data(
+        ([('namespace', False), ('name', False)], None),
+        ([('context', False), ('namespace', True), ('usage', False)], None),
+        ([('ratio', True), ('name', False)], 10),
+        ([('name', True), ('limits', False)], None),
+        ([('requests', True)], 500),
+        ([('context', True), ('ratio', False)], 0),
+        ([('name', True), ('namespace', False)], 7),
+        ([('namespace', False), ('name', False)], 20),
+        ([('limits', True), ('context', False), ('name', True)], 30),
+    )
+    @unpack
+    def test_get_sort_order(self, sort_keys, limit):
+        pods = _factor_pods(300)
+        pod_table = PodTable(pods)
+        getters = {
+            'context': lambda pod: pod.context or '',
+            'namespace': lambda pod: pod.namespace,
+            'name': lambda pod: pod.name,
+            'requests': lambda pod: pod.memory_requests,
+            'limits': lambda pod: pod.memory_limits,
+            'usage': lambda pod: pod.memory_usage,
+            'ratio': _get_ratio,
+        }
+        # sort the rows by one key after the other like the stable sorts of a tuple key
+        expected_result = list(range(len(pods)))
+        pod_list = list(pods.values())
+        for key, descending in reversed(sort_keys):
+            expected_result.sort(
+                key=lambda row, key=key: getters[key](pod_list[row]),
+                reverse=descending)
+        expected_result = expected_result[:limit]
+        # test
+        for numpy in _get_numpy_settings():
+            with mock.patch('kubecargoload.numpy', numpy):
+                result = pod_table.get_sort_order(sort_keys, limit)
+            # check
+            self.assertEqual(result, expected_result)
+
+    def test_get_sort_order_top(self):
+        pods = _factor_pods(300)
+        pod_table = PodTable(pods)
+        # test
+        for numpy in _get_numpy_settings():
+            with mock.patch('kubecargoload.numpy', numpy), \
+                    mock.patch.object(pod_table, '_sort_rows',
+                                      wraps=pod_table._sort_rows) as sort_rows:
+                pod_table.get_sort_order([('usage', True), ('name', False)], 5)
+            # check, only the selected rows are sorted, no other pod has the usage of the fifth
+            rows = sort_rows.call_args[0][0]
+            self.assertEqual(len(rows), 5)
+
+    def test_get_rows_by_context(self):
+        pod_table = PodTable({
+            ('a', 'default', 'pod-1'): Pod('default', 'pod-1', 0, 0, 0, context='a'),
+            ('b', 'default', 'pod-1'): Pod('default', 'pod-1', 0, 0, 0, context='b'),
+            ('a', 'default', 'pod-2'): Pod('default', 'pod-2', 0, 0, 0, context='a'),
+        })
+        # test
+        result = pod_table.get_rows_by_context()
+        # check
+        self.assertEqual(result, {'a': [0, 2], 'b': [1]})
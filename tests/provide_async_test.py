@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from unittest import mock
+import asyncio
+import json
+import subprocess
+import sys
+import unittest
+
+from kubecargoload import BACKEND_API, KubernetesCargoLoadOverviewProvider
+
+
+# pylint: disable=protected-access
+
+
+MIB = 1024 * 1024
+
+
+def _read_file_contents(filename):
+    with open(f'tests/test_data/{filename}', encoding='utf-8') as file_h:
+        return file_h.read()
+
+
+async def _iter_chunks(content, chunk_size=4096):
+    for index in range(0, len(content), chunk_size):
+        await asyncio.sleep(0)  # let other calls run in between like while waiting for output
+        yield content[index:index + chunk_size]
+
+
+def _factor_pod_metrics(memory_usage):
+    return json.dumps({'items': [{
+        'metadata': {'namespace': 'default', 'name': 'kube-web-view-7c67ddb647-pvjvs'},
+        'timestamp': '2020-05-15T12:01:00Z',
+        'containers': [{'name': 'kube-web-view', 'usage': {'memory': memory_usage}}],
+    }]})
+
+
+class ProvideAsyncTest(unittest.IsolatedAsyncioTestCase):
+
+    def _factor_provider(self, **kwargs):  # pylint: disable=no-self-use
+        return KubernetesCargoLoadOverviewProvider(namespace=None, context=None, **kwargs)
+
+    def _mock_kubectl(self, provider, pod_metrics, get_pods):  # pylint: disable=no-self-use
+        """Serve the pod metrics one after the other to the calls"""
+        async def get_pod_metrics_async():
+            return _iter_chunks(pod_metrics.pop(0))
+
+        async def get_pods_async():
+            return _iter_chunks(get_pods)
+
+        return mock.patch.multiple(
+            provider,
+            _execute_kubectl_get_pod_metrics_async=get_pod_metrics_async,
+            _execute_kubectl_get_pods_async=get_pods_async,
+            _execute_kubectl_get_pods_compact_async=get_pods_async)
+
+    async def test_provide_async(self):
+        provider = self._factor_provider()
+        pods_json = _read_file_contents('pods.json')
+        pod_metrics = _read_file_contents('pods_metrics.json')
+        # test
+        with self._mock_kubectl(provider, [pod_metrics], pods_json):
+            result = await provider.provide_async()
+        # check, the same pods as a synchronous call
+        with mock.patch.object(provider, '_execute_kubectl_get_pod_metrics',
+                               return_value=pod_metrics), \
+                mock.patch.object(provider, '_execute_kubectl_get_pods', return_value=pods_json):
+            expected_result = provider.provide()
+        self.assertEqual(dict(result), dict(expected_result))
+        self.assertEqual(len(result), 14)
+
+    async def test_aiter_pods_compact(self):
+        provider = self._factor_provider(compact=True)
+        pods_compact = _read_file_contents('pods_memory.compact')
+        pod_metrics = _read_file_contents('pods_metrics.json')
+        # test
+        with self._mock_kubectl(provider, [pod_metrics], pods_compact):
+            result = [pod async for pod in provider.aiter_pods()]
+        # check, jobs are skipped and the pods are not kept
+        self.assertEqual(len(result), 14)
+        self.assertNotIn('hello-1589543400-rvnr5', [pod.name for pod in result])
+        self.assertEqual(provider.get_overview(), {})
+
+    async def test_provide_async_concurrent_calls(self):
+        provider = self._factor_provider()
+        pods_json = _read_file_contents('pods_default.json')
+        pod_metrics = [_factor_pod_metrics(f'{index}Mi') for index in range(1, 9)]
+        # test, the calls are interleaved as each chunk is awaited
+        with self._mock_kubectl(provider, pod_metrics, pods_json):
+            results = await asyncio.gather(*(provider.provide_async() for _ in range(8)))
+        # check, each call has its own usage
+        pod_key = ('default', 'kube-web-view-7c67ddb647-pvjvs')
+        memory_usages = sorted(result[pod_key].memory_usage for result in results)
+        self.assertEqual(memory_usages, [index * MIB for index in range(1, 9)])
+
+    async def test_aiter_pods_stops_kubectl_on_usage_error(self):
+        provider = self._factor_provider()
+        error = subprocess.CalledProcessError(1, ['kubectl', 'get', '--raw'], stderr=b'error')
+        outputs = []
+
+        async def get_pods_async():
+            outputs.append(await provider._execute_kubectl_streamed_async(
+                '-c', 'import time; time.sleep(60)', namespaced=False))
+            return outputs[-1]
+
+        # test
+        with mock.patch('kubecargoload.KUBECTL_BIN', sys.executable), \
+                mock.patch.object(provider, '_execute_kubectl_get_pods_async', get_pods_async):
+            with mock.patch.object(provider, '_execute_kubectl_get_pod_metrics_async',
+                                   side_effect=error):
+                with self.assertRaises(subprocess.CalledProcessError):
+                    await provider.provide_async()
+        # check, the pods were not read but kubectl is stopped
+        self.assertIsNotNone(outputs[0]._process.returncode)
+        self.assertTrue(outputs[0]._stderr_file.closed)
+
+    async def test_aiter_pods_unsupported_backend(self):
+        provider = self._factor_provider(backend=BACKEND_API)
+        with self.assertRaises(ValueError):
+            provider.aiter_pods()
+
+    async def test_execute_kubectl_streamed_async(self):
+        provider = self._factor_provider()
+        # test
+        with mock.patch('kubecargoload.KUBECTL_BIN', sys.executable), \
+                mock.patch('kubecargoload.KUBECTL_OUTPUT_CHUNK_SIZE', 4):
+            output = await provider._execute_kubectl_streamed_async(
+                '-c', 'print("Ünicode output")', namespaced=False)
+            result = [chunk async for chunk in output]
+        # check, multi-byte characters split across chunks are decoded
+        self.assertEqual(''.join(result), 'Ünicode output\n')
+
+    async def test_execute_kubectl_streamed_async_error(self):
+        provider = self._factor_provider()
+        script = 'import sys; sys.stderr.write("failed"); sys.exit(3)'
+        # test
+        with mock.patch('kubecargoload.KUBECTL_BIN', sys.executable), \
+                mock.patch('sys.stdout'):
+            output = await provider._execute_kubectl_streamed_async(
+                '-c', script, namespaced=False)
+            with self.assertRaises(subprocess.CalledProcessError) as context:
+                async for _ in output:
+                    pass
+        # check
+        self.assertEqual(context.exception.returncode, 3)
+        self.assertEqual(context.exception.stderr, b'failed')
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from unittest import mock
+import json
+import subprocess
+import sys
+import threading
+import unittest
+
+from kubecargoload import KubernetesCargoLoadOverviewProvider, Pod
+
+
+# pylint: disable=protected-access
+
+
+class ProvideTest(unittest.TestCase):
+
+    def _factor_provider(self):  # pylint: disable=no-self-use
+        return KubernetesCargoLoadOverviewProvider(
+            namespace='default',
+            context=None,
+            show_cpu_usage=False)
+
+    def _read_file_contents(self, filename):  # pylint: disable=no-self-use
+        with open(f'tests/test_data/{filename}', encoding='utf-8') as file_h:
+            return file_h.read()
+
+    def test_provide_runs_kubectl_calls_concurrently(self):
+        provider = self._factor_provider()
+        # both calls wait for each other, this would deadlock if they were run sequentially
+        barrier = threading.Barrier(2, timeout=5)
+        pod_metrics_content = self._read_file_contents('pods_default_metrics.json')
+        pods_json_content = self._read_file_contents('pods_default.json')
+
+        def get_pod_metrics():
+            barrier.wait()
+            return pod_metrics_content
+
+        def get_pods():
+            barrier.wait()
+            return pods_json_content
+
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_get_pod_metrics', get_pod_metrics), \
+                mock.patch.object(provider, '_execute_kubectl_get_pods', get_pods):
+            result = provider.provide()
+        # check
+        expected_pod = Pod(
+            namespace='default',
+            name='kube-web-view-7c67ddb647-pvjvs',
+            memory_limits=100 * 1024 * 1024,
+            memory_requests=100 * 1024 * 1024,
+            memory_usage=34 * 1024 * 1024)
+        self.assertEqual(result[('default', 'kube-web-view-7c67ddb647-pvjvs')], expected_pod)
+
+    def test_iter_pods(self):
+        provider = self._factor_provider()
+        get_pod_metrics = mock.Mock(
+            return_value=self._read_file_contents('pods_default_metrics.json'))
+        get_pods = mock.Mock(return_value=self._read_file_contents('pods_default.json'))
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_get_pod_metrics', get_pod_metrics), \
+                mock.patch.object(provider, '_execute_kubectl_get_pods', get_pods):
+            result = list(provider.iter_pods())
+        # check, jobs are skipped and the pods are not kept
+        self.assertEqual([pod.name for pod in result], ['kube-web-view-7c67ddb647-pvjvs'])
+        self.assertEqual(result[0].memory_usage, 34 * 1024 * 1024)
+        self.assertEqual(provider.get_overview(), {})
+
+    def test_iter_pods_concurrent_calls(self):
+        provider = self._factor_provider()
+        other_pod_metrics = {'items': [{
+            'metadata': {'namespace': 'kube-system', 'name': 'coredns-66bff467f8-qn4pq'},
+            'containers': [{'name': 'coredns', 'usage': {'memory': '999Mi'}}],
+        }]}
+        get_pod_metrics = mock.Mock(side_effect=[
+            self._read_file_contents('pods_metrics.json'),
+            json.dumps(other_pod_metrics)])
+        get_pods = mock.Mock(side_effect=[
+            self._read_file_contents('pods.json'),
+            self._read_file_contents('pods.json')])
+        # test, both calls are iterated alternately
+        with mock.patch.object(provider, '_execute_kubectl_get_pod_metrics', get_pod_metrics), \
+                mock.patch.object(provider, '_execute_kubectl_get_pods', get_pods):
+            results = ({}, {})
+            for pods in zip(provider.iter_pods(), provider.iter_pods()):
+                for result, pod in zip(results, pods):
+                    result[pod.name] = pod.memory_usage
+        # check, each call uses its own usage
+        self.assertEqual(results[0]['coredns-66bff467f8-qn4pq'], 8 * 1024 * 1024)
+        self.assertEqual(results[1]['coredns-66bff467f8-qn4pq'], 999 * 1024 * 1024)
+        self.assertEqual(results[1]['kube-web-view-7c67ddb647-pvjvs'], 0)
+
+    def test_provide_raises_kubectl_error(self):
+        provider = self._factor_provider()
+        error = subprocess.CalledProcessError(1, ['kubectl', 'top', 'pods'], stderr=b'error')
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_get_pod_metrics', side_effect=error), \
+                mock.patch.object(provider, '_execute_kubectl_get_pods', return_value='{}'):
+            with self.assertRaises(subprocess.CalledProcessError):
+                provider.provide()
+
+    def test_iter_pods_stops_kubectl_on_usage_error(self):
+        provider = self._factor_provider()
+        error = subprocess.CalledProcessError(1, ['kubectl', 'get', '--raw'], stderr=b'error')
+        outputs = []
+
+        def get_pods():
+            outputs.append(provider._execute_kubectl_streamed(
+                '-c', 'import time; time.sleep(60)', namespaced=False))
+            return outputs[-1]
+
+        # test
+        with mock.patch('kubecargoload.KUBECTL_BIN', sys.executable), \
+                mock.patch.object(provider, '_execute_kubectl_get_pods', get_pods):
+            with mock.patch.object(provider, '_execute_kubectl_get_pod_metrics',
+                                   side_effect=error):
+                with self.assertRaises(subprocess.CalledProcessError):
+                    list(provider.iter_pods())
+        # check, the pods were not read but kubectl is stopped
+        self.assertIsNotNone(outputs[0]._process.poll())
+        self.assertTrue(outputs[0]._stderr_file.closed)
+
+    def test_provide_containers_joins_container_usage(self):
+        provider = KubernetesCargoLoadOverviewProvider(
+            namespace=None,
+            context=None,
+            show_cpu_usage=True,
+            containers=True)
+        get_pod_metrics = mock.Mock(
+            return_value=self._read_file_contents('pods_containers_metrics.json'))
+        get_pods = mock.Mock(return_value=self._read_file_contents('pods.json'))
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_get_pod_metrics', get_pod_metrics), \
+                mock.patch.object(provider, '_execute_kubectl_get_pods', get_pods):
+            result = provider.provide()
+        # check, a single call for the usage of all containers
+        get_pod_metrics.assert_called_once_with()
+        jitsi_containers = sorted(
+            (pod.name, pod.memory_usage) for pod in result.values() if pod.namespace == 'jitsi')
+        self.assertEqual(jitsi_containers, [
+            ('jitsi-57d5888c88-vzrzl/jicofo', 40 * 10 ** 6),
+            ('jitsi-57d5888c88-vzrzl/jvb', 80 * 10 ** 6),
+            ('jitsi-57d5888c88-vzrzl/prosody', 1 * 10 ** 6),
+            ('jitsi-57d5888c88-vzrzl/web', 0),
+        ])
+        self.assertEqual(
+            result[('kube-system', 'coredns-66bff467f8-qn4pq/coredns')].memory_requests,
+            100 * 10 ** 6)
+
+    def test_parse_pod_metrics_usage_containers(self):
+        provider = KubernetesCargoLoadOverviewProvider(
+            namespace='default',
+            context=None,
+            containers=True)
+        pod_metrics = {'items': [{
+            'metadata': {'namespace': 'default', 'name': 'web'},
+            'containers': [
+                {'name': 'app', 'usage': {'cpu': '10m', 'memory': '100Mi'}},
+                {'name': 'istio-proxy', 'usage': {'cpu': '5m', 'memory': '30Mi'}},
+            ],
+        }]}
+        # test
+        provider._parse_pod_metrics_usage(json.dumps(pod_metrics))
+        # check
+        self.assertEqual(provider._pod_usage_data, {
+            ('default', 'web/app'): {'memory': 100 * 1024 * 1024},
+            ('default', 'web/istio-proxy'): {'memory': 30 * 1024 * 1024},
+        })
+        self.assertIsNone(provider.get_usage_timestamp())
+
+    def test_parse_pod_metrics_usage_exact_values(self):
+        provider = KubernetesCargoLoadOverviewProvider(
+            namespace='default',
+            context=None,
+            show_cpu_usage=True)
+        pod_metrics = {'items': [
+            {
+                'metadata': {'namespace': 'default', 'name': 'web'},
+                'timestamp': '2020-05-15T12:01:00Z',
+                'containers': [{'name': 'app', 'usage': {'cpu': '1500001n', 'memory': '1Ki'}}],
+            },
+            {
+                'metadata': {'namespace': 'default', 'name': 'db'},
+                'timestamp': '2020-05-15T12:01:15Z',
+                'containers': [{'name': 'db', 'usage': {'cpu': '0', 'memory': '0'}}],
+            },
+        ]}
+        # test
+        provider._parse_pod_metrics_usage(json.dumps(pod_metrics))
+        # check, kubectl top would have rounded the values to 2m and 0Mi
+        self.assertEqual(provider._pod_usage_data[('default', 'web')], {'cpu': 1500001})
+        # the latest measurement
+        self.assertEqual(provider.get_usage_timestamp(), 1589544075.0)
+
+    def test_request_timeout(self):
+        provider = self._factor_provider()
+        # test
+        command = provider._factor_kubectl_command(('get', 'pods'))
+        watch_command = provider._factor_kubectl_command(('get', 'pods'), timeout=False)
+        # check, a finite default for both backends
+        self.assertIn('--request-timeout=60s', command)
+        self.assertNotIn('--request-timeout=60s', watch_command)
+        self.assertEqual(provider._get_api_timeout(), 60)
+
+    def test_request_timeout_disabled(self):
+        provider = KubernetesCargoLoadOverviewProvider(
+            namespace='default',
+            context=None,
+            request_timeout=0)
+        # test
+        command = provider._factor_kubectl_command(('get', 'pods'))
+        # check, both backends wait forever
+        self.assertFalse([argument for argument in command if 'timeout' in argument])
+        self.assertIsNone(provider._get_api_timeout())
+
+    def test_execute_kubectl_get_pod_metrics(self):
+        provider = self._factor_provider()
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_streamed') as execute_kubectl_streamed:
+            provider._execute_kubectl_get_pod_metrics()
+        # check
+        execute_kubectl_streamed.assert_called_once_with(
+            'get', '--raw', '/apis/metrics.k8s.io/v1beta1/namespaces/default/pods',
+            namespaced=False)
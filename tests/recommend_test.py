@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from unittest import mock
+import io
+import math
+import random
+import unittest
+
+from ddt import data, ddt
+
+from kubecargoload import (
+    KubernetesCargoLoadRecommendationPrinter,
+    KubernetesCargoLoadRecommender,
+    Pod,
+    QuantileSketch,
+    Recommendation,
+    ResourceValues,
+)
+
+
+# pylint: disable=protected-access
+
+
+MIB = 1024 * 1024
+
+
+def _factor_pod(name, memory_usage, group='Deployment/web', memory_requests=100 * MIB):
+    resources = {'memory': ResourceValues(memory_requests, 200 * MIB, memory_usage)}
+    return Pod(
+        'default', name, 200 * MIB, memory_requests, memory_usage, resources=resources,
+        group=group)
+
+
+@ddt
+class QuantileSketchTest(unittest.TestCase):
+
+    @data(0.5, 0.9, 0.95, 0.99)
+    def test_get_quantile_relative_accuracy(self, quantile):
+        values = [random.lognormvariate(20, 1) for _ in range(10000)]
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        # test
+        for value in values:
+            sketch.add(value)
+        # check, against the value of the same rank
+        expected_value = sorted(values)[int(quantile * (len(values) - 1))]
+        self.assertAlmostEqual(sketch.get_quantile(quantile), expected_value,
+                               delta=expected_value * 0.01 + 1)
+        self.assertEqual(sketch.count, 10000)
+        self.assertEqual(sketch.maximum, max(values))
+
+    def test_get_quantile_empty(self):
+        self.assertEqual(QuantileSketch().get_quantile(0.95), 0)
+
+    def test_get_quantile_zeros(self):
+        sketch = QuantileSketch()
+        # test
+        for value in (0, 0, 0, 1000):
+            sketch.add(value)
+        # check
+        self.assertEqual(sketch.get_quantile(0.5), 0)
+        self.assertEqual(sketch.get_quantile(1), 1000)
+
+    def test_add_bounds_buckets(self):
+        sketch = QuantileSketch(max_buckets=16)
+        # test
+        for value in range(1, 100000, 7):
+            sketch.add(value)
+        # check, only the lowest values are merged
+        self.assertEqual(len(sketch._buckets), 16)
+        self.assertAlmostEqual(sketch.get_quantile(0.99), 99000, delta=990)
+
+
+class RecommenderTest(unittest.TestCase):
+
+    def _factor_recommender(self, provider=None, **kwargs):  # pylint: disable=no-self-use
+        return KubernetesCargoLoadRecommender(provider or mock.Mock(), **kwargs)
+
+    def test_get_recommendations(self):
+        recommender = self._factor_recommender(headroom=10)
+        # test, replicas of an owner are pooled
+        for usage in range(1, 51):
+            recommender.add_sample({
+                ('default', 'web-1'): _factor_pod('web-1', usage * MIB),
+                ('default', 'web-2'): _factor_pod('web-2', (usage + 50) * MIB),
+                ('default', 'job'): _factor_pod('job', 0, group='Pod/job'),
+            })
+        result = recommender.get_recommendations()
+        # check, the p95 of 1 to 100 Mi is 95 Mi within 1%, pods without usage are skipped
+        self.assertEqual(list(result), [('default', 'Deployment/web')])
+        recommendation = result[('default', 'Deployment/web')]
+        self.assertEqual(recommendation.pod_count, 2)
+        self.assertEqual(recommendation.samples, 100)
+        self.assertEqual(recommendation.requests, 100 * MIB)
+        self.assertAlmostEqual(recommendation.quantile, 95 * MIB, delta=MIB)
+        self.assertEqual(recommendation.maximum, 100 * MIB)
+        # rounded up to MiB
+        recommended_requests = math.ceil(recommendation.quantile * 1.1 / MIB) * MIB
+        self.assertEqual(recommendation.recommended_requests, recommended_requests)
+        self.assertEqual(recommendation.recommended_limits, 110 * MIB)
+        self.assertEqual(recommendation.savings, 200 * MIB - 2 * recommended_requests)
+
+    def test_get_recommendations_cpu(self):
+        recommender = self._factor_recommender(resource='cpu', headroom=0)
+        pod = _factor_pod('web-1', 0)._replace(resources={'cpu': ResourceValues(10 ** 9, 0, 0)})
+        # test
+        for usage in (100, 200, 300):
+            recommender.add_sample({('default', 'web-1'): pod._replace(resources={
+                'cpu': ResourceValues(10 ** 9, 0, usage * 10 ** 6 + 1)})})
+        result = recommender.get_recommendations()
+        # check, rounded up to millicores
+        recommendation = result[('default', 'Deployment/web')]
+        self.assertEqual(recommendation.recommended_limits, 301 * 10 ** 6)
+        self.assertEqual(recommendation.savings, 10 ** 9 - recommendation.recommended_requests)
+
+    def test_run_for_duration(self):
+        provider = mock.Mock()
+        provider.get_overview.return_value = {('default', 'web-1'): _factor_pod('web-1', MIB)}
+        recommender = self._factor_recommender(provider, interval=10, duration=25)
+        # test
+        with mock.patch('time.monotonic', side_effect=[0, 0, 10, 20]), \
+                mock.patch('time.sleep') as sleep:
+            recommender.run()
+        # check, the samples at 0, 10 and 20 seconds
+        provider.watch.assert_called_once_with()
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(recommender._sketches[('default', 'Deployment/web')].count, 3)
+
+    def test_run_until_interrupted(self):
+        provider = mock.Mock()
+        provider.get_overview.return_value = {('default', 'web-1'): _factor_pod('web-1', MIB)}
+        recommender = self._factor_recommender(provider)
+        # test
+        with mock.patch('time.sleep', side_effect=[None, KeyboardInterrupt]):
+            recommender.run()
+        # check
+        self.assertEqual(recommender.get_recommendations()[('default', 'Deployment/web')].samples,
+                         2)
+
+
+class RecommendationPrinterTest(unittest.TestCase):
+
+    def test_print(self):
+        recommendations = {
+            ('default', 'Deployment/web'): Recommendation(
+                'default', 'Deployment/web', 2, 100, 100 * MIB, 200 * MIB, 95 * MIB, 100 * MIB,
+                105 * MIB, 110 * MIB, -10 * MIB),
+            ('default', 'StatefulSet/db'): Recommendation(
+                'default', 'StatefulSet/db', 1, 50, 1024 * MIB, 0, 50 * MIB, 60 * MIB,
+                58 * MIB, 66 * MIB, 966 * MIB),
+        }
+        output = io.StringIO()
+        printer = KubernetesCargoLoadRecommendationPrinter(
+            recommendations,
+            sort='savings:desc',
+            output=output)
+        # test
+        printer.print()
+        # check
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(len({len(line) for line in lines}), 1)
+        self.assertTrue(lines[0].endswith('Rec. Requests   Rec. Limits       Savings'))
+        self.assertEqual(lines[2].split()[:2], ['default', 'StatefulSet/db'])
+        self.assertTrue(lines[3].endswith('-10.0 Mi'))
+        # the requests of all pods
+        self.assertEqual(lines[5].split(), [
+            'Summary', '(all', 'PODs)', '3', '150', '1.2', 'Gi', '268.0', 'Mi', '956.0', 'Mi'])
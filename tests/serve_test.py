@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from argparse import ArgumentTypeError
+from concurrent.futures import Future
+from unittest import mock
+from urllib.error import HTTPError
+from urllib.request import urlopen
+import io
+import subprocess
+import threading
+import unittest
+
+from ddt import data, ddt, unpack
+
+from kubecargoload import (
+    _format_prometheus_labels,
+    _parse_address,
+    KubernetesCargoLoadExporter,
+    Pod,
+    ResourceValues,
+)
+
+
+# pylint: disable=protected-access
+
+
+MIB = 1024 * 1024
+MILLICORES = 10 ** 6
+
+
+def _factor_pod(name, memory_values, cpu_values):
+    resources = {'memory': ResourceValues(*memory_values), 'cpu': ResourceValues(*cpu_values)}
+    return Pod('default', name, memory_values[1], memory_values[0], memory_values[2],
+               resources=resources)
+
+
+def _factor_provider():
+    provider = mock.Mock()
+    provider.get_overview.return_value = {
+        ('default', 'web'): _factor_pod(
+            'web', (100 * MIB, 200 * MIB, 50 * MIB), (100 * MILLICORES, 0, 5 * MILLICORES)),
+        ('default', 'db'): _factor_pod(
+            'db', (0, 0, 10 * MIB), (0, 500 * MILLICORES, 250 * MILLICORES)),
+    }
+    provider.get_usage_timestamp.return_value = 1589544060.0
+    return provider
+
+
+def _get_pod_metrics(metrics):
+    """The metrics without the refresh status which changes with every refresh"""
+    return metrics.decode('utf-8').split('# HELP kubecargoload_refresh_failures_total')[0]
+
+
+class _WaitingFuture(Future):
+    """Signal each caller which waits for the result of a refresh"""
+
+    waiting = None
+
+    def result(self, timeout=None):
+        self.waiting.release()
+        return super().result(timeout)
+
+
+@ddt
+class ExporterTest(unittest.TestCase):
+
+    def _factor_exporter(self, provider, **kwargs):  # pylint: disable=no-self-use
+        return KubernetesCargoLoadExporter(
+            provider, ('127.0.0.1', 0), output=io.StringIO(), **kwargs)
+
+    def test_get_metrics(self):
+        provider = _factor_provider()
+        exporter = self._factor_exporter(provider)
+        # test, the first scrape waits for the first refresh
+        result = exporter.get_metrics()
+        # check
+        provider.provide.assert_called_once_with()
+        provider.watch.assert_called_once_with()
+        self.assertEqual(_get_pod_metrics(result), '\n'.join((
+            '# HELP kubecargoload_pod_requests Requests of the pod',
+            '# TYPE kubecargoload_pod_requests gauge',
+            'kubecargoload_pod_requests{namespace="default",pod="web",resource="memory",unit="byte"} 104857600',  # noqa: E501 pylint: disable=line-too-long
+            'kubecargoload_pod_requests{namespace="default",pod="web",resource="cpu",unit="core"} 0.1',  # noqa: E501 pylint: disable=line-too-long
+            '# HELP kubecargoload_pod_limits Limits of the pod',
+            '# TYPE kubecargoload_pod_limits gauge',
+            'kubecargoload_pod_limits{namespace="default",pod="web",resource="memory",unit="byte"} 209715200',  # noqa: E501 pylint: disable=line-too-long
+            'kubecargoload_pod_limits{namespace="default",pod="db",resource="cpu",unit="core"} 0.5',
+            '# HELP kubecargoload_pod_usage Usage of the pod',
+            '# TYPE kubecargoload_pod_usage gauge',
+            'kubecargoload_pod_usage{namespace="default",pod="web",resource="memory",unit="byte"} 52428800',  # noqa: E501 pylint: disable=line-too-long
+            'kubecargoload_pod_usage{namespace="default",pod="db",resource="memory",unit="byte"} 10485760',  # noqa: E501 pylint: disable=line-too-long
+            'kubecargoload_pod_usage{namespace="default",pod="web",resource="cpu",unit="core"} 0.005',  # noqa: E501 pylint: disable=line-too-long
+            'kubecargoload_pod_usage{namespace="default",pod="db",resource="cpu",unit="core"} 0.25',
+            '# HELP kubecargoload_pod_usage_ratio Usage in relation to the limits of the pod',
+            '# TYPE kubecargoload_pod_usage_ratio gauge',
+            'kubecargoload_pod_usage_ratio{namespace="default",pod="web",resource="memory",unit="byte"} 0.25',  # noqa: E501 pylint: disable=line-too-long
+            'kubecargoload_pod_usage_ratio{namespace="default",pod="db",resource="cpu",unit="core"} 0.5',  # noqa: E501 pylint: disable=line-too-long
+            '# HELP kubecargoload_namespace_requests Requests of the namespace',
+            '# TYPE kubecargoload_namespace_requests gauge',
+            'kubecargoload_namespace_requests{namespace="default",resource="memory",unit="byte"} 104857600',  # noqa: E501 pylint: disable=line-too-long
+            'kubecargoload_namespace_requests{namespace="default",resource="cpu",unit="core"} 0.1',
+            '# HELP kubecargoload_namespace_limits Limits of the namespace',
+            '# TYPE kubecargoload_namespace_limits gauge',
+            'kubecargoload_namespace_limits{namespace="default",resource="memory",unit="byte"} 209715200',  # noqa: E501 pylint: disable=line-too-long
+            'kubecargoload_namespace_limits{namespace="default",resource="cpu",unit="core"} 0.5',
+            '# HELP kubecargoload_namespace_usage Usage of the namespace',
+            '# TYPE kubecargoload_namespace_usage gauge',
+            'kubecargoload_namespace_usage{namespace="default",resource="memory",unit="byte"} 62914560',  # noqa: E501 pylint: disable=line-too-long
+            'kubecargoload_namespace_usage{namespace="default",resource="cpu",unit="core"} 0.255',
+            '# HELP kubecargoload_namespace_usage_ratio Usage in relation to the limits of the namespace',  # noqa: E501 pylint: disable=line-too-long
+            '# TYPE kubecargoload_namespace_usage_ratio gauge',
+            'kubecargoload_namespace_usage_ratio{namespace="default",resource="memory",unit="byte"} 0.25',  # noqa: E501 pylint: disable=line-too-long
+            'kubecargoload_namespace_usage_ratio{namespace="default",resource="cpu",unit="core"} 0.5',  # noqa: E501 pylint: disable=line-too-long
+            '# HELP kubecargoload_namespace_pods Number of pods of the namespace',
+            '# TYPE kubecargoload_namespace_pods gauge',
+            'kubecargoload_namespace_pods{namespace="default"} 2',
+            '# HELP kubecargoload_usage_timestamp_seconds Time the usage was measured',
+            '# TYPE kubecargoload_usage_timestamp_seconds gauge',
+            'kubecargoload_usage_timestamp_seconds 1589544060.0',
+            '',
+        )))
+        self.assertIn(b'\nkubecargoload_refresh_failures_total 0\n', result)
+
+    def test_get_metrics_does_not_refresh(self):
+        provider = _factor_provider()
+        exporter = self._factor_exporter(provider)
+        exporter.refresh()
+        # test
+        exporter.get_metrics()
+        exporter.get_metrics()
+        # check, scrapes are answered from the latest refresh
+        provider.provide.assert_called_once_with()
+        provider.refresh_usage.assert_not_called()
+
+    def test_refresh_coalesces_concurrent_calls(self):
+        provider = _factor_provider()
+        exporter = self._factor_exporter(provider)
+        exporter.refresh()
+        refreshing = threading.Event()
+        release = threading.Event()
+
+        def refresh_usage():
+            refreshing.set()
+            release.wait(5)
+
+        provider.refresh_usage.side_effect = refresh_usage
+        waiting = threading.Semaphore(0)
+        results = []
+        # test, the first call refreshes, the others wait for its result
+        with mock.patch('kubecargoload.Future', _WaitingFuture), \
+                mock.patch.object(_WaitingFuture, 'waiting', waiting):
+            threads = [
+                threading.Thread(target=lambda: results.append(exporter.refresh()))
+                for _ in range(5)]
+            threads[0].start()
+            refreshing.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            for _ in threads[1:]:
+                waiting.acquire(timeout=5)  # pylint: disable=consider-using-with
+            release.set()
+            for thread in threads:
+                thread.join(5)
+        # check
+        self.assertEqual(provider.refresh_usage.call_count, 1)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(len(set(results)), 1)
+
+    def test_refresh_failure_keeps_metrics(self):
+        provider = _factor_provider()
+        exporter = self._factor_exporter(provider)
+        metrics = exporter.get_metrics()
+        provider.refresh_usage.side_effect = subprocess.CalledProcessError(1, ['kubectl'])
+        # test
+        with self.assertRaises(subprocess.CalledProcessError):
+            exporter.refresh()
+        result = exporter.get_metrics()
+        # check
+        self.assertEqual(_get_pod_metrics(result), _get_pod_metrics(metrics))
+        self.assertIn(b'\nkubecargoload_refresh_failures_total 1\n', result)
+
+    def test_get_metrics_retries_first_refresh(self):
+        provider = _factor_provider()
+        provider.provide.side_effect = [subprocess.CalledProcessError(1, ['kubectl']), None]
+        exporter = self._factor_exporter(provider)
+        # test
+        with self.assertRaises(subprocess.CalledProcessError):
+            exporter.get_metrics()
+        result = exporter.get_metrics()
+        # check, the pods are listed again
+        self.assertEqual(provider.provide.call_count, 2)
+        provider.watch.assert_called_once_with()
+        self.assertIn(b'\nkubecargoload_refresh_failures_total 1\n', result)
+
+    def test_refresh_periodically(self):
+        provider = _factor_provider()
+        provider.refresh_usage.side_effect = [subprocess.CalledProcessError(1, ['kubectl'])]
+        exporter = self._factor_exporter(provider, interval=30)
+        # test, the second sleep ends the refreshes
+        with mock.patch('time.sleep', side_effect=[None, KeyboardInterrupt]) as sleep, \
+                mock.patch('random.uniform', return_value=0.1):
+            with self.assertRaises(KeyboardInterrupt):
+                exporter._refresh_periodically()
+        # check, the failed refresh is skipped and the interval varies by the jitter
+        provider.provide.assert_called_once_with()
+        self.assertEqual(provider.refresh_usage.call_count, 1)
+        self.assertAlmostEqual(sleep.call_args[0][0], 33)
+        self.assertIn('Refreshing failed', exporter._output.getvalue())
+
+    def test_refresh_periodically_unexpected_error(self):
+        provider = _factor_provider()
+        exporter = self._factor_exporter(provider, interval=30)
+        with mock.patch('time.time', return_value=1000):
+            exporter.refresh()
+        provider.refresh_usage.side_effect = [KeyError('containers'), None]
+        # test, the second sleep ends the refreshes
+        with mock.patch('time.sleep', side_effect=[None, KeyboardInterrupt]), \
+                mock.patch('time.time', return_value=1100):
+            with self.assertRaises(KeyboardInterrupt):
+                exporter._refresh_periodically()
+            result = exporter.get_metrics()
+        # check, the refreshes go on and the failure is counted
+        self.assertEqual(provider.refresh_usage.call_count, 2)
+        self.assertIn("Refreshing failed: KeyError('containers')", exporter._output.getvalue())
+        self.assertIn(b'\nkubecargoload_refresh_failures_total 1\n', result)
+        self.assertIn(b'\nkubecargoload_refresh_age_seconds 0\n', result)
+
+    def test_refresh_age(self):
+        provider = _factor_provider()
+        exporter = self._factor_exporter(provider)
+        with mock.patch('time.time', return_value=1000):
+            exporter.refresh()
+        # test
+        with mock.patch('time.time', return_value=1090):
+            result = exporter.get_metrics()
+        # check, stale metrics show up by their age
+        self.assertIn(b'\nkubecargoload_refresh_age_seconds 90\n', result)
+
+    def test_serve_metrics(self):
+        provider = _factor_provider()
+        exporter = self._factor_exporter(provider)
+        server = exporter._factor_server(('127.0.0.1', 0))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+        try:
+            # test, at a fixed time for the same age of the refresh
+            with mock.patch('time.time', return_value=1000):
+                with urlopen(f'{url}/metrics', timeout=5) as response:  # noqa: S310
+                    body = response.read()
+                    content_type = response.headers['Content-Type']
+                metrics = exporter.get_metrics()
+            with self.assertRaises(HTTPError) as context:
+                urlopen(f'{url}/', timeout=5)  # noqa: S310 pylint: disable=consider-using-with
+        finally:
+            server.shutdown()
+            server.server_close()
+        # check
+        self.assertEqual(body, metrics)
+        self.assertTrue(content_type.startswith('text/plain; version=0.0.4'))
+        self.assertEqual(context.exception.code, 404)
+
+    def test_serve_metrics_unavailable(self):
+        provider = _factor_provider()
+        provider.provide.side_effect = subprocess.CalledProcessError(1, ['kubectl'])
+        exporter = self._factor_exporter(provider)
+        server = exporter._factor_server(('127.0.0.1', 0))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            # test
+            with self.assertRaises(HTTPError) as context, mock.patch('sys.stderr'):
+                urlopen(  # noqa: S310 pylint: disable=consider-using-with
+                    f'http://127.0.0.1:{server.server_address[1]}/metrics', timeout=5)
+        finally:
+            server.shutdown()
+            server.server_close()
+        # check
+        self.assertEqual(context.exception.code, 503)
+
+    def test_format_prometheus_labels(self):
+        result = _format_prometheus_labels(namespace='default', pod='a"b\\c\nd')
+        self.assertEqual(result, 'namespace="default",pod="a\\"b\\\\c\\nd"')
+
+    @data(('localhost:9723', ('localhost', 9723)), (':9100', ('', 9100)))
+    @unpack
+    def test_parse_address(self, value, expected_address):
+        self.assertEqual(_parse_address(value), expected_address)
+
+    @data('', 'localhost', 'localhost:http')
+    def test_parse_address_invalid(self, value):
+        with self.assertRaises(ArgumentTypeError):
+            _parse_address(value)
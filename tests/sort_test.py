@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+import io
+import random
+import unittest
+
+from ddt import data, ddt
+
+from kubecargoload import KubernetesCargoLoadOverviewPrinter, Pod
+
+
+# pylint: disable=protected-access
+
+
+def _factor_overview(count):
+    rng = random.Random(42)  # noqa: S311
+    overview = {}
+    for index in range(count):
+        namespace = f'namespace-{rng.randrange(5)}'
+        name = f'pod-{index}'
+        limits = rng.choice((0, 100, 200))
+        overview[(namespace, name)] = Pod(
+            namespace, name, limits, rng.randrange(100), rng.randrange(300))
+    return overview
+
+
+@ddt
+class SortTest(unittest.TestCase):
+
+    def _factor_printer(self, sort, top=None, overview=None):  # pylint: disable=no-self-use
+        return KubernetesCargoLoadOverviewPrinter(
+            overview if overview is not None else _factor_overview(200),
+            sort=sort,
+            output=io.StringIO(),
+            top=top)
+
+    def _get_printed_names(self, printer):  # pylint: disable=no-self-use
+        lines = printer._output.getvalue().splitlines()
+        return [line.split()[1] for line in lines[2:-2]]
+
+    @data(
+        'ratio:desc,name',
+        'namespace:desc,usage:asc,name',
+        'limits,name:desc',
+        'usage:desc,namespace,name',
+    )
+    def test_top_equals_sorted(self, sort):
+        printer = self._factor_printer(sort, top=10)
+        sorting_printer = self._factor_printer(sort)
+        # test
+        printer.print()
+        sorting_printer.print()
+        # check
+        result = self._get_printed_names(printer)
+        expected_result = self._get_printed_names(sorting_printer)[:10]
+        self.assertEqual(result, expected_result)
+        # the summary covers all pods
+        self.assertEqual(printer._sums, sorting_printer._sums)
+
+    def test_sort_descending(self):
+        overview = {
+            ('a', 'pod-1'): Pod('a', 'pod-1', 100, 1, 10),
+            ('b', 'pod-2'): Pod('b', 'pod-2', 100, 1, 90),
+            ('b', 'pod-3'): Pod('b', 'pod-3', 100, 1, 50),
+        }
+        printer = self._factor_printer('namespace:desc,ratio:desc', overview=overview)
+        # test
+        printer.print()
+        # check
+        self.assertEqual(self._get_printed_names(printer), ['pod-2', 'pod-3', 'pod-1'])
+
+    def test_top_larger_than_pods(self):
+        printer = self._factor_printer('name', top=500)
+        # test
+        printer.print()
+        # check
+        self.assertEqual(len(self._get_printed_names(printer)), 200)
+
+    @data('name:down', 'size')
+    def test_unsupported_sort(self, sort):
+        printer = self._factor_printer(sort, overview={})
+        # test
+        with self.assertRaises(ValueError):
+            printer.print()
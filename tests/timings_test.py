@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from unittest import mock
+import io
+import json
+import tempfile
+import time
+import unittest
+
+from kubecargoload import (
+    KubernetesCargoLoadOverviewPrinter,
+    KubernetesCargoLoadOverviewProvider,
+    Timings,
+)
+
+
+class TimingsTest(unittest.TestCase):
+
+    def test_phase_nested(self):
+        timings = Timings()
+        # test
+        with timings.phase('outer'):
+            with timings.phase('inner'):
+                time.sleep(0.05)
+        # check, the time of the inner phase is not counted for the outer one
+        phases = timings.get_report()['phases']
+        self.assertGreaterEqual(phases['inner']['wall'], 0.05)
+        self.assertLess(phases['outer']['wall'], 0.05)
+        self.assertEqual(phases['outer']['count'], 1)
+
+    def test_iter_timed(self):
+        timings = Timings()
+        # test
+        result = list(timings.iter_timed('items', iter('abc')))
+        # check, the end of the iteration is counted as well
+        self.assertEqual(result, ['a', 'b', 'c'])
+        self.assertEqual(timings.get_report()['phases']['items']['count'], 4)
+
+    def test_iter_output(self):
+        timings = Timings()
+        # test
+        result = list(timings.iter_output('kubectl get pods', ['Ünicode', ' output']))
+        # check
+        self.assertEqual(result, ['Ünicode', ' output'])
+        call = timings.get_report()['calls']['kubectl get pods']
+        self.assertEqual(call['count'], 1)
+        self.assertEqual(call['bytes'], 15)
+        self.assertLessEqual(call['first_output'], call['wall'])
+
+    def test_count(self):
+        timings = Timings()
+        # test
+        timings.count('pods', 3)
+        timings.count('pods')
+        # check
+        self.assertEqual(timings.get_report()['counters'], {'pods': 4})
+
+    def test_print_report(self):
+        timings = Timings()
+        with timings.phase('sort pods'):
+            pass
+        timings.add_call('kubectl top pods', 1234567, None, 0.5)
+        output = io.StringIO()
+        # test
+        timings.print_report(output)
+        # check
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), ['PHASE', 'WALL', 'CPU', 'COUNT'])
+        self.assertTrue(lines[1].startswith('sort pods '))
+        self.assertEqual(
+            lines[3].split(),
+            ['kubectl', 'top', 'pods', '0.500s', '0.500s', '1', '1,234,567'])
+        self.assertTrue(lines[-1].startswith('total: wall '))
+
+    def test_write_report(self):
+        timings = Timings()
+        timings.count('pods', 2)
+        # test
+        with tempfile.NamedTemporaryFile(suffix='.json') as report_file:
+            timings.write_report(report_file.name)
+            report = json.load(report_file)
+        # check
+        self.assertEqual(report['counters'], {'pods': 2})
+        self.assertEqual(report['phases'], {})
+        self.assertEqual(report['calls'], {})
+
+
+class TimingsProvideTest(unittest.TestCase):
+
+    def _read_file_contents(self, filename):  # pylint: disable=no-self-use
+        with open(f'tests/test_data/{filename}', encoding='utf-8') as file_h:
+            return file_h.read()
+
+    def test_provide_and_print(self):
+        timings = Timings()
+        provider = KubernetesCargoLoadOverviewProvider(
+            namespace='default',
+            context=None,
+            show_cpu_usage=False,
+            timings=timings)
+        get_pod_metrics = mock.Mock(
+            return_value=self._read_file_contents('pods_default_metrics.json'))
+        get_pods = mock.Mock(return_value=self._read_file_contents('pods_default.json'))
+        # test
+        with mock.patch.object(provider, '_execute_kubectl_get_pod_metrics', get_pod_metrics), \
+                mock.patch.object(provider, '_execute_kubectl_get_pods', get_pods):
+            overview = provider.provide()
+        printer = KubernetesCargoLoadOverviewPrinter(
+            overview,
+            output=io.StringIO(),
+            timings=timings)
+        printer.print()
+        # check, the job pods are counted as well as they are decoded
+        report = timings.get_report()
+        self.assertEqual(report['counters'], {'pods': 4, 'containers': 4})
+        self.assertEqual(
+            list(report['phases']),
+            ['parse usage', 'wait for usage', 'decode pods', 'factor pods', 'sort pods',
+             'write output', 'format rows'])
+
+    def test_get_kubectl_call_name(self):
+        provider = KubernetesCargoLoadOverviewProvider(namespace='default')
+        # test
+        get_pods = provider._get_kubectl_call_name(  # pylint: disable=protected-access
+            ('get', 'pods', '--output=json'))
+        get_raw = provider._get_kubectl_call_name(  # pylint: disable=protected-access
+            ('get', '--raw', '/apis/metrics.k8s.io/v1beta1/pods?limit=500'))
+        # check, the calls of the raw API are told apart by their path
+        self.assertEqual(get_pods, 'kubectl get pods')
+        self.assertEqual(get_raw, 'kubectl get --raw /apis/metrics.k8s.io/v1beta1/pods')
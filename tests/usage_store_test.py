@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from argparse import ArgumentTypeError
+from array import array
+from unittest import mock
+import io
+import os
+import subprocess
+import tempfile
+import unittest
+
+from ddt import data, ddt, unpack
+
+from kubecargoload import (
+    _compute_usage_statistics,
+    _parse_duration,
+    KubernetesCargoLoadUsageRecorder,
+    KubernetesCargoLoadUsageStatisticsPrinter,
+    Pod,
+    ResourceValues,
+    UsageStatistics,
+    UsageStore,
+)
+
+
+MIB = 1024 * 1024
+
+
+def _factor_pod(name, memory_usage, namespace='default', memory_limits=200 * MIB):
+    resources = {
+        'memory': ResourceValues(100 * MIB, memory_limits, memory_usage),
+        'cpu': ResourceValues(10 ** 8, 0, memory_usage // MIB * 10 ** 6),
+    }
+    return Pod(namespace, name, memory_limits, 100 * MIB, memory_usage, resources=resources)
+
+
+@ddt
+class UsageStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self._store = UsageStore(':memory:')
+
+    def tearDown(self):
+        self._store.close()
+        super().tearDown()
+
+    def test_query(self):
+        for timestamp in range(1, 21):
+            self._store.append('prod', timestamp, [
+                _factor_pod('web', timestamp * MIB),
+                _factor_pod('db', 50 * MIB, namespace='data')])
+        # test
+        result = self._store.query('prod', None, 1)
+        # check
+        self.assertEqual(result, {
+            ('default', 'web'): UsageStatistics(
+                'default', 'web', 100 * MIB, 200 * MIB, 20, MIB, 10.5 * MIB, 19 * MIB, 20 * MIB),
+            ('data', 'db'): UsageStatistics(
+                'data', 'db', 100 * MIB, 200 * MIB, 20, 50 * MIB, 50 * MIB, 50 * MIB, 50 * MIB),
+        })
+
+    def test_query_window_namespace_and_cpu(self):
+        for timestamp in range(1, 21):
+            self._store.append('prod', timestamp, [
+                _factor_pod('web', timestamp * MIB),
+                _factor_pod('db', 50 * MIB, namespace='data')])
+        # test
+        result = self._store.query('prod', 'default', 11, resource='cpu')
+        # check
+        self.assertEqual(result, {
+            ('default', 'web'): UsageStatistics(
+                'default', 'web', 10 ** 8, 0, 10, 11 * 10 ** 6, 15.5 * 10 ** 6, 20 * 10 ** 6,
+                20 * 10 ** 6),
+        })
+
+    def test_query_other_context(self):
+        self._store.append('prod', 1, [_factor_pod('web', MIB)])
+        # test
+        result = self._store.query('staging', None, 0)
+        # check
+        self.assertEqual(result, {})
+
+    def test_query_unsupported_resource(self):
+        with self.assertRaises(ValueError):
+            self._store.query('prod', None, 0, resource='nvidia.com/gpu')
+
+    def test_append_updates_changed_limits(self):
+        self._store.append('prod', 1, [_factor_pod('web', MIB)])
+        self._store.append('prod', 2, [_factor_pod('web', MIB, memory_limits=300 * MIB)])
+        # test
+        result = self._store.query('prod', None, 0)
+        # check
+        self.assertEqual(result[('default', 'web')].limits, 300 * MIB)
+        self.assertEqual(result[('default', 'web')].samples, 2)
+
+    def test_pods_are_interned_across_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'usage', 'usage.sqlite')
+            with UsageStore(filename) as store:
+                store.append('prod', 1, [_factor_pod('web', MIB)])
+            with UsageStore(filename) as store:
+                store.append('prod', 2, [_factor_pod('web', 3 * MIB)])
+                # test
+                result = store.query('prod', None, 0)
+                pod_count = store._connection.execute(  # pylint: disable=protected-access
+                    'SELECT COUNT(*) FROM pods').fetchone()[0]
+        # check
+        self.assertEqual(result[('default', 'web')].average, 2 * MIB)
+        self.assertEqual(pod_count, 1)
+
+    @data(True, False)
+    def test_compute_usage_statistics(self, use_numpy):
+        pod_ids = array('i', [1, 2] * 100)
+        values = array('q', [value for index in range(100) for value in (100 - index, 7)])
+        # test
+        if use_numpy:
+            result = _compute_usage_statistics(pod_ids, values)
+        else:
+            with mock.patch('kubecargoload.numpy', None):
+                result = _compute_usage_statistics(pod_ids, values)
+        # check
+        self.assertEqual(result, {1: (100, 1, 50, 95, 100), 2: (100, 7, 7, 7, 7)})
+
+    @data(('90s', 90), ('30m', 1800), ('12h', 43200), ('7d', 604800), ('2w', 1209600),
+          ('0.5h', 1800))
+    @unpack
+    def test_parse_duration(self, value, expected_seconds):
+        self.assertEqual(_parse_duration(value), expected_seconds)
+
+    @data('', '7', 'd', '7y')
+    def test_parse_duration_invalid(self, value):
+        with self.assertRaises(ArgumentTypeError):
+            _parse_duration(value)
+
+
+class UsageRecorderTest(unittest.TestCase):
+
+    def test_run(self):
+        provider = mock.Mock()
+        provider.get_overview.return_value = {('default', 'web'): _factor_pod('web', MIB)}
+        provider.get_usage_timestamp.return_value = None
+        provider.refresh_usage.side_effect = [
+            subprocess.CalledProcessError(1, ['kubectl', 'top', 'pods']), None]
+        store = mock.Mock()
+        recorder = KubernetesCargoLoadUsageRecorder(provider, store, 'prod', interval=30)
+        # test, the third sleep ends the recording
+        with mock.patch('time.sleep', side_effect=[None, None, KeyboardInterrupt]) as sleep, \
+                mock.patch('time.time', return_value=4711), \
+                mock.patch('sys.stderr', io.StringIO()):
+            with self.assertRaises(KeyboardInterrupt):
+                recorder.run()
+        # check, the failed refresh is skipped
+        provider.provide.assert_called_once_with()
+        provider.watch.assert_called_once_with()
+        self.assertEqual(provider.refresh_usage.call_count, 2)
+        self.assertEqual(store.append.call_count, 2)
+        store.append.assert_called_with('prod', 4711, mock.ANY)
+        sleep.assert_called_with(30)
+
+    def test_record_uses_usage_timestamp(self):
+        provider = mock.Mock()
+        provider.get_overview.return_value = {('default', 'web'): _factor_pod('web', MIB)}
+        provider.get_usage_timestamp.return_value = 1589544060.0
+        store = mock.Mock()
+        recorder = KubernetesCargoLoadUsageRecorder(provider, store, 'prod', interval=30)
+        # test
+        with mock.patch('time.sleep', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                recorder.run()
+        # check, the time of the measurement instead of the time of the sample
+        store.append.assert_called_once_with('prod', 1589544060.0, mock.ANY)
+
+    def test_record_skips_pods_without_usage(self):
+        provider = mock.Mock()
+        provider.get_overview.return_value = {
+            ('default', 'web'): _factor_pod('web', 2 * MIB),
+            ('default', 'new'): _factor_pod('new', 0),  # not scraped yet
+        }
+        provider.get_usage_timestamp.return_value = 1589544060.0
+        store = UsageStore(':memory:')
+        recorder = KubernetesCargoLoadUsageRecorder(provider, store, 'prod', interval=30)
+        # test
+        recorder._record()  # pylint: disable=protected-access
+        provider.get_overview.return_value = {('default', 'new'): _factor_pod('new', 4 * MIB)}
+        provider.get_usage_timestamp.return_value = 1589544120.0
+        recorder._record()  # pylint: disable=protected-access
+        result = store.query('prod', None, 0)
+        store.close()
+        # check, the missing usage is no sample of 0
+        self.assertEqual(result[('default', 'web')].samples, 1)
+        self.assertEqual(result[('default', 'new')].samples, 1)
+        self.assertEqual(result[('default', 'new')].minimum, 4 * MIB)
+
+
+class UsageStatisticsPrinterTest(unittest.TestCase):
+
+    def test_print(self):
+        statistics = {
+            ('default', 'web'): UsageStatistics(
+                'default', 'web', 100 * MIB, 200 * MIB, 20, MIB, 10.5 * MIB, 19 * MIB, 20 * MIB),
+            ('data', 'db'): UsageStatistics(
+                'data', 'db', 100 * MIB, 0, 20, 50 * MIB, 50 * MIB, 50 * MIB, 50 * MIB),
+        }
+        output = io.StringIO()
+        printer = KubernetesCargoLoadUsageStatisticsPrinter(
+            statistics,
+            sort='p95:desc',
+            output=output)
+        # test
+        printer.print()
+        # check
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), [
+            'Namespace', 'Name', 'Requests', 'Limits', 'Samples', 'Min', 'Avg', 'P95', 'Max'])
+        self.assertEqual(len(lines[1]), len(lines[2]))
+        self.assertEqual(lines[2].split(), [
+            'data', 'db', '100.0', 'Mi', '0.0', 'B', '20', '50.0', 'Mi', '50.0', 'Mi', '50.0',
+            'Mi', '50.0', 'Mi'])
+        self.assertEqual(lines[3].split()[:2], ['default', 'web'])
+        self.assertEqual(len(lines), 4)
+
+    def test_print_unsupported_sort_key(self):
+        printer = KubernetesCargoLoadUsageStatisticsPrinter({}, sort='ratio', output=io.StringIO())
+        with self.assertRaises(ValueError):
+            printer.print()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from unittest import mock
+import copy
+import functools
+import io
+import json
+import unittest
+
+from kubecargoload import (
+    KubernetesApiError,
+    KubernetesCargoLoadOverviewPrinter,
+    KubernetesCargoLoadOverviewProvider,
+    KubernetesCargoLoadOverviewWatcher,
+    PodListStreamParser,
+)
+
+
+# pylint: disable=protected-access
+
+
+POD_KEY = ('default', 'kube-web-view-7c67ddb647-pvjvs')
+
+
+class WatchProviderTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self._pod_metrics = self._read_file_contents('pods_default_metrics.json')
+        self._pods_json = self._read_file_contents('pods_default.json')
+        self._pod_data = json.loads(self._pods_json)['items'][3]
+        self._provider = KubernetesCargoLoadOverviewProvider(
+            namespace='default',
+            context=None,
+            show_cpu_usage=False)
+        with mock.patch.object(self._provider, '_execute_kubectl_get_pod_metrics',
+                               return_value=self._pod_metrics), \
+                mock.patch.object(self._provider, '_execute_kubectl_get_pods',
+                                  return_value=self._pods_json):
+            self._provider.provide()
+
+    def _read_file_contents(self, filename):  # pylint: disable=no-self-use
+        with open(f'tests/test_data/{filename}', encoding='utf-8') as file_h:
+            return file_h.read()
+
+    def _factor_event(self, event_type, name=None, memory_limits=None):
+        pod_data = copy.deepcopy(self._pod_data)
+        pod_data['metadata']['resourceVersion'] = '4711'
+        if name is not None:
+            pod_data['metadata']['name'] = name
+        if memory_limits is not None:
+            pod_data['spec']['containers'][0]['resources']['limits']['memory'] = memory_limits
+        return {'type': event_type, 'object': pod_data}
+
+    def test_apply_pod_event_modified(self):
+        event = self._factor_event('MODIFIED', memory_limits='1Gi')
+        # test
+        self._provider._apply_pod_event(event)
+        # check
+        pod = self._provider.get_overview()[POD_KEY]
+        self.assertEqual(pod.memory_limits, 1024 * 1024 * 1024)
+        self.assertEqual(pod.memory_usage, 34 * 1024 * 1024)  # usage is kept
+        self.assertEqual(self._provider._resource_version, '4711')
+
+    def test_apply_pod_event_added_and_deleted(self):
+        # test
+        self._provider._apply_pod_event(self._factor_event('ADDED', name='new-pod'))
+        self._provider._apply_pod_event(self._factor_event('DELETED'))
+        # check
+        overview = self._provider.get_overview()
+        self.assertEqual(list(overview), [('default', 'new-pod')])
+
+    def test_apply_pod_event_job(self):
+        event = self._factor_event('MODIFIED')
+        event['object']['metadata']['labels'] = {'job-name': 'job'}
+        event['object']['metadata']['ownerReferences'] = [{'kind': 'Job'}]
+        # test
+        self._provider._apply_pod_event(event)
+        # check
+        self.assertEqual(self._provider.get_overview(), {})
+
+    def test_apply_pod_event_error(self):
+        event = {'type': 'ERROR', 'object': {'kind': 'Status', 'code': 410, 'message': 'too old'}}
+        # test
+        with self.assertRaises(KubernetesApiError):
+            self._provider._apply_pod_event(event)
+        # check
+        self.assertIsNone(self._provider._resource_version)
+
+    def test_apply_kubectl_watch_output(self):
+        # kubectl prints the events as concatenated, indented JSON objects
+        watch_output = ''.join(
+            json.dumps(event, indent=4) + '\n'
+            for event in (
+                self._factor_event('ADDED', name='new-pod'),
+                self._factor_event('MODIFIED', name='new-pod', memory_limits='2Gi'),
+            ))
+        chunks = [watch_output[index:index + 100] for index in range(0, len(watch_output), 100)]
+        # test
+        for event in PodListStreamParser(chunks).iter_values():
+            self._provider._apply_pod_event(event)
+        # check
+        pod = self._provider.get_overview()[('default', 'new-pod')]
+        self.assertEqual(pod.memory_limits, 2 * 1024 * 1024 * 1024)
+
+    def test_execute_watch_pods_kubectl(self):
+        # test
+        with mock.patch.object(self._provider, '_execute_kubectl_streamed') as execute_streamed:
+            self._provider._execute_watch_pods()
+        # check, kubectl lists the pods first and ends the watch after a while to relist
+        execute_streamed.assert_called_once_with(
+            'get', 'pods', '-o', 'json', '--watch', '--output-watch-events',
+            '--request-timeout=1800s', timeout=False)
+
+    def test_watch_pods_relists_after_kubectl_watch_ended(self):
+        watch_outputs = [
+            json.dumps(self._factor_event('ADDED', name='new-pod')),
+            KeyboardInterrupt,  # ends the test
+        ]
+        # test
+        with mock.patch.object(self._provider, '_execute_watch_pods',
+                               side_effect=watch_outputs), \
+                mock.patch.object(self._provider, '_relist_pods') as relist_pods:
+            with self.assertRaises(KeyboardInterrupt):
+                self._provider._watch_pods()
+        # check, pods deleted while the pods were listed are not kept forever
+        relist_pods.assert_called_once_with()
+        self.assertIn(('default', 'new-pod'), self._provider.get_overview())
+
+    def test_refresh_usage(self):
+        pod_metrics = {
+            'metadata': {'namespace': 'default', 'name': 'kube-web-view-7c67ddb647-pvjvs'},
+            'containers': [{'name': 'kube-web-view', 'usage': {'cpu': '1m', 'memory': '40Mi'}}],
+        }
+        # test
+        with mock.patch.object(self._provider, '_execute_kubectl_get_pod_metrics',
+                               return_value=json.dumps({'items': [pod_metrics]})):
+            self._provider.refresh_usage()
+        # check
+        pod = self._provider.get_overview()[POD_KEY]
+        self.assertEqual(pod.memory_usage, 40 * 1024 * 1024)
+
+    def test_refresh_usage_failed(self):
+        def get_pod_metrics():
+            yield '{"items": ['
+            # the watch updates the pod while the usage is being refreshed
+            self._provider._apply_pod_event(self._factor_event('MODIFIED', memory_limits='1Gi'))
+            yield '{"broken'
+
+        # test
+        with mock.patch.object(self._provider, '_execute_kubectl_get_pod_metrics',
+                               get_pod_metrics):
+            with self.assertRaises(ValueError):
+                self._provider.refresh_usage()
+        # check, the usage of the previous refresh is kept
+        pod = self._provider.get_overview()[POD_KEY]
+        self.assertEqual(pod.memory_limits, 1024 * 1024 * 1024)
+        self.assertEqual(pod.memory_usage, 34 * 1024 * 1024)
+
+
+class WatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self._output = io.StringIO()
+        printer_factory = functools.partial(KubernetesCargoLoadOverviewPrinter, no_header=True)
+        self._watcher = KubernetesCargoLoadOverviewWatcher(
+            provider=None,
+            printer_factory=printer_factory,
+            output=self._output)
+
+    def test_write_changed_lines(self):
+        # test
+        self._watcher._write_changed_lines(['header', 'pod-a', 'pod-b'])
+        first_output = self._output.getvalue()
+        self._output.truncate(0)
+        self._output.seek(0)
+        self._watcher._write_changed_lines(['header', 'pod-a', 'pod-c'])
+        second_output = self._output.getvalue()
+        self._output.truncate(0)
+        self._output.seek(0)
+        self._watcher._write_changed_lines(['header'])
+        third_output = self._output.getvalue()
+        # check
+        self.assertEqual(
+            first_output,
+            '\x1b[H\x1b[2J\x1b[1;1Hheader\x1b[K\x1b[2;1Hpod-a\x1b[K\x1b[3;1Hpod-b\x1b[K')
+        self.assertEqual(second_output, '\x1b[3;1Hpod-c\x1b[K')
+        self.assertEqual(third_output, '\x1b[2;1H\x1b[J')
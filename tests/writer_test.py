@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# This software may be modified and distributed under the terms
+# of the Apache License, Version 2.0 license.  See the LICENSE file for details.
+
+from unittest import mock
+import io
+import json
+import sys
+import unittest
+
+from ddt import data, ddt
+
+from kubecargoload import (
+    KubernetesCargoLoadOverviewCsvWriter,
+    KubernetesCargoLoadOverviewJsonWriter,
+    KubernetesCargoLoadOverviewNdjsonWriter,
+    KubernetesCargoLoadOverviewWriter,
+)
+from kubecargoload import main as kubecargoload_main
+from kubecargoload import Pod, ResourceValues
+
+
+# pylint: disable=protected-access
+
+
+POD = Pod('default', 'web-1', 1500000000, 250000001, 0, context='cluster-a', group='Deployment/web')
+
+
+@ddt
+class WriterTest(unittest.TestCase):
+
+    @data(
+        KubernetesCargoLoadOverviewCsvWriter,
+        KubernetesCargoLoadOverviewJsonWriter,
+        KubernetesCargoLoadOverviewNdjsonWriter,
+    )
+    def test_write_while_pods_are_provided(self, writer_class):
+        output = io.StringIO()
+        written_lengths = []
+
+        def iter_pods():
+            for index in range(3):
+                written_lengths.append(len(output.getvalue()))
+                yield POD._replace(name=f'web-{index}')
+
+        writer = writer_class(iter_pods(), output=output)
+        # test
+        writer.write()
+        # check, the first pod is written before the second pod is requested
+        self.assertLess(written_lengths[1], written_lengths[2])
+        self.assertIn('web-2', output.getvalue())
+
+    def test_write_json(self):
+        output = io.StringIO()
+        writer = KubernetesCargoLoadOverviewJsonWriter(
+            [POD, POD], show_cpu_usage=True, output=output, show_context=True, show_group=True)
+        # test
+        writer.write()
+        # check
+        expected_record = {
+            'context': 'cluster-a',
+            'namespace': 'default',
+            'name': 'web-1',
+            'group': 'Deployment/web',
+            'cpu_requests': 251,  # rounded up to millicores
+            'cpu_limits': 1500,
+            'cpu_usage': 0,
+        }
+        self.assertEqual(json.loads(output.getvalue()), [expected_record, expected_record])
+
+    def test_write_json_empty(self):
+        output = io.StringIO()
+        # test
+        KubernetesCargoLoadOverviewJsonWriter([], output=output).write()
+        # check
+        self.assertEqual(json.loads(output.getvalue()), [])
+
+    def test_write_csv_resources(self):
+        output = io.StringIO()
+        resources = {
+            'cpu': ResourceValues(1000000, 0, 0),
+            'nvidia.com/gpu': ResourceValues(1, 2, 0),
+        }
+        pod = POD._replace(resources=resources)
+        writer = KubernetesCargoLoadOverviewCsvWriter(
+            [pod],
+            output=output,
+            resources=('cpu', 'memory', 'nvidia.com/gpu'))
+        # test
+        writer.write()
+        # check
+        expected_output = (
+            'namespace,name,cpu_requests,cpu_limits,cpu_usage,memory_requests,memory_limits,'
+            'memory_usage,nvidia.com/gpu_requests,nvidia.com/gpu_limits,nvidia.com/gpu_usage\n'
+            'default,web-1,1,0,0,0,0,0,1,2,0\n')
+        self.assertEqual(output.getvalue(), expected_output)
+
+    def test_writer_is_abstract(self):
+        # test
+        with self.assertRaises(TypeError):
+            KubernetesCargoLoadOverviewWriter(  # pylint: disable=abstract-class-instantiated
+                [], output=io.StringIO())
+
+    @data(
+        ['--output', 'json', '--sort', 'name'],
+        ['--output', 'ndjson', '--top', '3'],
+        ['--output', 'csv', '--sort', 'usage:desc'],
+        ['--output', 'json', '--group-by', 'owner'],
+    )
+    def test_unsupported_options(self, argv):
+        # test, the pods are written unsorted and ungrouped while they are listed
+        with mock.patch.object(sys, 'argv', ['kubecargoload.py', *argv]):
+            with self.assertRaises(SystemExit):
+                kubecargoload_main()
+        # check
+        error = sys.stderr.getvalue()  # pylint: disable=no-member
+        self.assertIn(argv[2], error)
+        self.assertIn('support only the table output', error)